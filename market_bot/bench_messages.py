@@ -0,0 +1,226 @@
+"""
+Message handling latency of the live bot without a network. Synthetic Kalshi websocket messages
+(orderbook snapshot, deltas and fills) and S&P 500 prices go through the same handlers the websocket and
+TD clients call, and the strategy runs as in production against an order manager that only records when
+it was asked to quote. Reports the handler time per message and the time from a message arriving to the
+strategy's orders reaching the order manager, and how much of each update goes on the fair value.
+
+With --exchange the strategy instead quotes through the real OrderManager against clients/local_exchange.py,
+once amending orders in place and once cancelling and replacing them. Other participants' volume joins the
+exchange's queues from the book deltas, and the fills come from trades against those queues, so the two runs
+show what keeping queue priority is worth in fills as well as in requests.
+
+Run from this directory: python bench_messages.py [n] [--json] [--exchange]
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+from types import SimpleNamespace
+import numpy as np
+from clients.kalshi_ws import KalshiClient
+from clients.td import TDClient
+from clients.local_exchange import LocalExchange
+from ordermanager import OrderManager
+from state import TradingState
+from strategy import Strategy
+
+class RecordingOrderManager():
+    """
+    Stands in for OrderManager: place_order only records when it was called
+    """
+
+    def __init__(self) -> None:
+        self.placed = asyncio.Event()
+        self.calls = 0
+
+    def update_resting(self, fill, side, count) -> None:
+        pass
+
+    async def place_order(self, bid_price, bid_count, ask_price, ask_count) -> None:
+        self.calls += 1
+        self.placed.set()
+
+# Position limit of the strategy in the --exchange runs
+POSITION_LIMIT = 12
+
+class ExchangeOrderManager(OrderManager):
+    """
+    OrderManager that also signals when a requote is done, including the requotes it caught up on
+    """
+
+    def __init__(self, kalshi, market: str) -> None:
+        super().__init__(kalshi, market)
+        self.requoted = asyncio.Event()
+
+    async def place_order(self, bid_price, bid_count, ask_price, ask_count) -> None:
+        await super().place_order(bid_price, bid_count, ask_price, ask_count)
+        await self.settle()
+        self.requoted.set()
+
+def messages(n: int, rng: random.Random):
+    """
+    ("kalshi", json message) and ("sp", price) updates: a snapshot, then book deltas with the odd fill,
+    interleaved with S&P 500 prices
+    """
+    book = {"yes": {}, "no": {}}
+    snapshot = {"yes": [[price, 100] for price in range(40, 48)], "no": [[price, 100] for price in range(45, 53)]}
+    for side in book:
+        book[side] = {price: volume for price, volume in snapshot[side]}
+    updates = [("sp", 4075.0), ("kalshi", json.dumps({"type": "orderbook_snapshot", "seq": 0, "msg": snapshot}))]
+
+    price = 4075.0
+    for seq in range(1, n):
+        kind = rng.random()
+        if kind < 0.45:
+            price = round(price + rng.gauss(0, 0.1), 2)
+            updates.append(("sp", price))
+        elif kind < 0.95:
+            side = rng.choice(("yes", "no"))
+            level = rng.randint(35, 55)
+            if level in book[side] and rng.random() < 0.5:
+                delta = -rng.randint(1, book[side][level])
+            else:
+                delta = rng.randint(1, 200)
+            book[side][level] = book[side].get(level, 0) + delta
+            if book[side][level] == 0:
+                del book[side][level]
+            updates.append(("kalshi", json.dumps({"type": "orderbook_delta", "seq": seq,
+                                                  "msg": {"market_ticker": "INXD-BENCH-B4075", "price": level, "delta": delta, "side": side}})))
+        else:
+            updates.append(("kalshi", json.dumps({"type": "fill", "msg": {"side": rng.choice(("yes", "no")), "count": 1}})))
+    return updates
+
+def percentiles(seconds) -> dict:
+    us = 1e6 * np.asarray(seconds)
+    return {
+        "p50_us": round(float(np.percentile(us, 50)), 2),
+        "p90_us": round(float(np.percentile(us, 90)), 2),
+        "p99_us": round(float(np.percentile(us, 99)), 2),
+        "max_us": round(float(us.max()), 2),
+    }
+
+async def bench(n: int, seed: int = 0) -> dict:
+    om = RecordingOrderManager()
+    update = asyncio.Event()
+    state = TradingState(om, None)
+    strategy = Strategy(om, "INXD-BENCH-B", update, state)
+    strategy.set_market(4075)
+    strategy.EOD = time.time() + 3 * 3600
+
+    # Fair value time of every strategy update
+    compute = strategy.fair_value
+    fairValue = []
+
+    def timed():
+        t0 = time.perf_counter()
+        p = compute()
+        fairValue.append(time.perf_counter() - t0)
+        return p
+    strategy.fair_value = timed
+
+    # The clients' own handlers, bound to just the state they update
+    kalshi = SimpleNamespace(state=state, update=update)
+    td = SimpleNamespace(state=state, update=update)
+    task = asyncio.create_task(strategy.run())
+
+    handler = []
+    toOrder = []
+    start = time.perf_counter()
+    for kind, message in messages(n, random.Random(seed)):
+        om.placed.clear()
+        t0 = time.perf_counter()
+        if kind == "sp":
+            TDClient.update_state(td, message)
+        else:
+            KalshiClient.update_state(kalshi, message)
+        t1 = time.perf_counter()
+        await asyncio.wait_for(om.placed.wait(), 1)
+        handler.append(t1 - t0)
+        toOrder.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    task.cancel()
+
+    return {
+        "messages": len(handler),
+        "messages_per_sec": round(len(handler) / elapsed),
+        "handler": percentiles(handler),
+        "message_to_order": percentiles(toOrder),
+        "fair_value": {**percentiles(fairValue), "mean_us": round(1e6 * float(np.mean(fairValue)), 3)},
+    }
+
+async def bench_exchange(n: int, amend: bool, seed: int = 0) -> dict:
+    market = "INXD-BENCH-B4075"
+    exchange = LocalExchange(amend=amend)
+    om = ExchangeOrderManager(exchange, market)
+    update = asyncio.Event()
+    state = TradingState(om, exchange)
+    strategy = Strategy(om, "INXD-BENCH-B", update, state)
+    strategy.set_market(4075)
+    strategy.EOD = time.time() + 3 * 3600
+    # A tight limit so order sizes shrink with the position as often as prices move
+    strategy.POSITION_LIMIT = POSITION_LIMIT
+    kalshi = SimpleNamespace(state=state, update=update)
+    td = SimpleNamespace(state=state, update=update)
+    task = asyncio.create_task(strategy.run())
+
+    rng = random.Random(seed + 1)
+    filled = 0
+    start = time.perf_counter()
+    for kind, message in messages(n, random.Random(seed)):
+        om.requoted.clear()
+        if kind == "sp":
+            TDClient.update_state(td, message)
+        else:
+            data = json.loads(message)
+            if data["type"] == "fill":
+                # A trade against the queue the bot rests in on one side, instead of a made up fill
+                side = data["msg"]["side"]
+                order = om.orders.current(side)
+                fills = exchange.trade(side, order.price, rng.randint(1, 400)) if order is not None else []
+                if not fills:
+                    continue
+                for fill in fills:
+                    filled += fill["count"]
+                    KalshiClient.update_state(kalshi, json.dumps({"type": "fill", "msg": fill}))
+            else:
+                if data["type"] == "orderbook_delta" and data["msg"]["delta"] > 0:
+                    exchange.add_volume(data["msg"]["side"], data["msg"]["price"], data["msg"]["delta"])
+                KalshiClient.update_state(kalshi, message)
+        await asyncio.wait_for(om.requoted.wait(), 1)
+    elapsed = time.perf_counter() - start
+    task.cancel()
+
+    return {
+        "amend": amend,
+        "messages_per_sec": round(n / elapsed),
+        "requests": sum(exchange.requests.values()),
+        "actions": {action: count for action, count in om.actions.items() if count},
+        "contracts_filled": filled,
+        "position": state.position,
+    }
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    n = int(args[0]) if args else 20000
+
+    if "--exchange" in sys.argv:
+        results = [asyncio.run(bench_exchange(n, amend)) for amend in (True, False)]
+        if "--json" in sys.argv:
+            print(json.dumps(results))
+        else:
+            for result in results:
+                print(f"{'amend/decrease' if result['amend'] else 'cancel/replace':<15} {result['requests']:>7} requests  "
+                      f"{result['contracts_filled']:>6} contracts filled  position {result['position']:>4}  {result['actions']}")
+        sys.exit()
+
+    result = asyncio.run(bench(n))
+
+    if "--json" in sys.argv:
+        print(json.dumps(result))
+    else:
+        print(f"{result['messages']} messages, {result['messages_per_sec']:,} messages/sec")
+        for name in ("handler", "message_to_order"):
+            print(f"  {name:<17} " + "  ".join(f"{key[:-3]} {value:>8.1f}us" for key, value in result[name].items()))
+        print(f"  {'fair_value':<17} " + "  ".join(f"{key[:-3]} {value:>8.2f}us" for key, value in result["fair_value"].items()))
@@ -5,24 +5,85 @@ import asyncio
 import aiohttp  
 import logging
 import sys
+import time
+from collections import deque
+import numpy as np
+
+# One session is kept for the life of the client so order placement and cancels reuse warm connections
+POOL_SIZE = 8                # connections kept to the API
+WARM_CONNECTIONS = 4         # opened at startup, enough for a requote of both sides in parallel
+KEEPALIVE_TIMEOUT = 60       # seconds an idle connection is kept open
+DNS_CACHE_TTL = 300          # seconds a resolved address is reused
+REQUEST_TIMEOUT = 5          # seconds before a request is abandoned
+TIMING_SAMPLES = 1000        # latest round trips kept per endpoint
+# Error code of an order request that got no answer (timeout, connection error), with a None status
+REQUEST_FAILED = "request_failed"
+
+class RequestTimer():
+    """
+    Round trip times of the latest requests per endpoint, in seconds
+    """
+
+    def __init__(self, samples: int = TIMING_SAMPLES) -> None:
+        self.samples = samples
+        self.times = {}
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, name: str, seconds: float, error: bool = False) -> None:
+        if name not in self.times:
+            self.times[name] = deque(maxlen=self.samples)
+            self.counts[name] = 0
+            self.errors[name] = 0
+        self.times[name].append(seconds)
+        self.counts[name] += 1
+        self.errors[name] += error
+
+    def stats(self) -> dict:
+        stats = {}
+        for name, times in self.times.items():
+            ms = 1000 * np.asarray(times)
+            stats[name] = {
+                "count": self.counts[name],
+                "errors": self.errors[name],
+                "last_ms": round(float(ms[-1]), 2),
+                "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                "p99_ms": round(float(np.percentile(ms, 99)), 2),
+                "max_ms": round(float(ms.max()), 2),
+            }
+        return stats
+
+    def summary(self, title: str = "Kalshi HTTP round trips") -> str:
+        lines = [f"{title} (latest samples):"]
+        for name, stat in self.stats().items():
+            lines.append(f"  {name:<40} {stat['count']:>7} calls {stat['errors']:>4} errors  "
+                         f"p50 {stat['p50_ms']:>8.2f}ms  p99 {stat['p99_ms']:>8.2f}ms  max {stat['max_ms']:>8.2f}ms")
+        return "\n".join(lines)
 
 class KalshiHTTPClient:
     """
     Client for the Kalshi HTTP API. Used to place, cancel, and manage orders. 
+
+    Requests share one aiohttp session with a pool of keep-alive connections and a DNS cache, created
+    on the first request or by open(); warm_up() opens connections ahead of the first order so it does
+    not pay for the TCP and TLS handshakes. Every request is timed per endpoint in self.timer. Call
+    close() (or use the client as an async context manager) when done.
     """
 
-    def __init__(self, email, password):
+    def __init__(self, email, password, api_base="https://trading-api.kalshi.com/trade-api/v2"):
         self.email = email
         self.password = password
-        self.api_base = "https://trading-api.kalshi.com/trade-api/v2"
+        self.api_base = api_base
         self.headers = {"Content-Type": "application/json"}
         self.token = None
         self.user_id = None
+        self.session = None
+        self.timer = RequestTimer()
 
         self.RETRY_LOGIN_DELAY = 1 # try again after 1 second
 
-        self.login()
         self.failure = 0 
+        self.login()
 
     def login(self):
         logging.info("Logging into Kalshi HTTP client")
@@ -50,30 +111,76 @@ class KalshiHTTPClient:
             # yield execution and try to login again after a delay
             asyncio.sleep(self.RETRY_LOGIN_DELAY)
             self.login()
-    
-    async def get(self, endpoint):
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(self.api_base + endpoint, headers=self.headers) as response:
-                return await response.json(), response.status
+    async def open(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=POOL_SIZE, ttl_dns_cache=DNS_CACHE_TTL, keepalive_timeout=KEEPALIVE_TIMEOUT)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+        return self.session
 
-    async def post(self, endpoint, data):
+    async def warm_up(self, connections=WARM_CONNECTIONS):
+        """
+        Open connections to the API ahead of the first order with concurrent exchange status requests
+        """
+        await self.open()
+        start = time.perf_counter()
+        results = await asyncio.gather(*[self.get("/exchange/status") for _ in range(connections)], return_exceptions=True)
+        failed = sum(isinstance(result, Exception) for result in results)
+        logging.info(f"Warmed up {connections - failed} of {connections} Kalshi HTTP connections in {1000 * (time.perf_counter() - start):.1f}ms")
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.api_base + endpoint, data=json.dumps(data), headers=self.headers) as response:
-                return await response.json(), response.status
-    
-    async def put(self, endpoint, data):
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        logging.info(self.timer.summary())
 
-        async with aiohttp.ClientSession() as session:
-            async with session.put(self.api_base + endpoint, data=json.dumps(data), headers=self.headers) as response:
-                return await response.json(), response.status
-    
-    async def delete(self, endpoint):
+    async def __aenter__(self):
+        await self.open()
+        return self
 
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(self.api_base + endpoint, headers=self.headers) as response:
-                return await response.json(), response.status
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def request(self, method, endpoint, data=None, name=None):
+        """
+        Send a request on the shared session and return (json, status). name groups the timing of
+        endpoints with ids in the path, it defaults to the endpoint without its query string.
+        """
+        session = self.session if self.session is not None and not self.session.closed else await self.open()
+        name = f"{method} {name or endpoint.split('?')[0]}"
+        body = None if data is None else json.dumps(data)
+        start = time.perf_counter()
+        try:
+            async with session.request(method, self.api_base + endpoint, data=body, headers=self.headers) as response:
+                res = await response.json()
+        except Exception:
+            self.timer.add(name, time.perf_counter() - start, error=True)
+            raise
+        self.timer.add(name, time.perf_counter() - start, error=response.status >= 400)
+        return res, response.status
+
+    async def order_request(self, method, endpoint, data=None, name=None):
+        """
+        request() for the order endpoints: a request that gets no answer returns an error body and a None
+        status instead of raising, so the caller can roll back what it expected the request to do
+        """
+        try:
+            return await self.request(method, endpoint, data, name)
+        except Exception as e:
+            logging.error(f"{method} {name or endpoint} failed: {e!r}")
+            return {"error": {"code": REQUEST_FAILED, "message": repr(e)}}, None
+
+    async def get(self, endpoint, name=None):
+        return await self.request("GET", endpoint, name=name)
+
+    async def post(self, endpoint, data, name=None):
+        return await self.request("POST", endpoint, data, name)
+    
+    async def put(self, endpoint, data, name=None):
+        return await self.request("PUT", endpoint, data, name)
+    
+    async def delete(self, endpoint, name=None, data=None):
+        return await self.request("DELETE", endpoint, data, name)
  
     async def get_events(self, ticker=None):
         params = {"ticker": ticker}
@@ -100,7 +207,7 @@ class KalshiHTTPClient:
         return res, code
 
     async def get_market_orderbook(self, ticker, depth=10):
-        res, code = await self.get(f"/markets/{ticker}/orderbook?depth={depth}")
+        res, code = await self.get(f"/markets/{ticker}/orderbook?depth={depth}", "/markets/{ticker}/orderbook")
         return res, code
     
     async def get_balance(self):
@@ -136,11 +243,11 @@ class KalshiHTTPClient:
         return res, code
     
     async def get_order(self, order_id: str): 
-        res, code = await self.get("/portfolio/orders/" + order_id)
+        res, code = await self.get("/portfolio/orders/" + order_id, "/portfolio/orders/{order_id}")
         return res, code
 
-    async def post_limit_order(self,
-                    action: str,
+    @staticmethod
+    def limit_order_data(action: str,
                     ticker: str,
                     side: str, 
                     count: int,
@@ -150,7 +257,7 @@ class KalshiHTTPClient:
                     expiration_ts: int = None,
                     buy_max_cost=None,
                     ):
-        data = {
+        return {
             "action": action,
             "ticker": ticker,
             "side": side,
@@ -162,13 +269,21 @@ class KalshiHTTPClient:
             "expiration_ts": expiration_ts,
             "buy_max_cost": buy_max_cost,
         }
-        try:
-            res, code = await self.post("/portfolio/orders", data)
-            # print("Order placed successfully!")
-            return res, code
-        except Exception as e:
-            # print("Error placing order:", e)
-            return None
+
+    async def post_limit_order(self,
+                    action: str,
+                    ticker: str,
+                    side: str, 
+                    count: int,
+                    order_id, 
+                    yes_price=None,
+                    no_price=None,
+                    expiration_ts: int = None,
+                    buy_max_cost=None,
+                    ):
+        data = self.limit_order_data(action, ticker, side, count, order_id, yes_price, no_price, expiration_ts, buy_max_cost)
+        res, code = await self.order_request("POST", "/portfolio/orders", data)
+        return res, code
 
     async def post_market_order(self,
                           action,
@@ -185,21 +300,64 @@ class KalshiHTTPClient:
             "client_order_id": order_id,
             "type": "market",
         }
-        try:
-            res, code = await self.post("/portfolio/orders", data)
-            return res, code
-        except Exception as e:
-            print("Error placing order:", e)
-            return False # failed order, don't handle error here
+        res, code = await self.order_request("POST", "/portfolio/orders", data)
+        return res, code
     
     async def cancel_limit_order(self, order_id):
-        
-        try:
-            resolve, code = await self.delete(f"/portfolio/orders/{order_id}")
-            return resolve, code
-        except Exception as e:
-            print("Error canceling order:", e)
-            return False # failed cancel, don't handle error here
+        res, code = await self.order_request("DELETE", f"/portfolio/orders/{order_id}", name="/portfolio/orders/{order_id}")
+        return res, code
+
+    async def decrease_order(self, order_id, reduce_to: int):
+        """
+        Reduce a resting order to reduce_to contracts. The order keeps its place in the queue.
+        """
+        res, code = await self.order_request("POST", f"/portfolio/orders/{order_id}/decrease", {"reduce_to": reduce_to},
+                                             "/portfolio/orders/{order_id}/decrease")
+        return res, code
+
+    async def amend_order(self,
+                    order_id,
+                    action: str,
+                    ticker: str,
+                    side: str,
+                    count: int,
+                    client_order_id,
+                    updated_client_order_id,
+                    yes_price=None,
+                    no_price=None,
+                    ):
+        """
+        Change the price and/or count of a resting order in one request. The amended order joins the
+        back of the queue at its price. The response has the "old_order" and the amended "order".
+        """
+        data = {
+            "action": action,
+            "ticker": ticker,
+            "side": side,
+            "count": count,
+            "client_order_id": client_order_id,
+            "updated_client_order_id": updated_client_order_id,
+            "yes_price": yes_price,
+            "no_price": no_price,
+        }
+        res, code = await self.order_request("POST", f"/portfolio/orders/{order_id}/amend", data, "/portfolio/orders/{order_id}/amend")
+        return res, code
+
+    async def batch_create_orders(self, orders):
+        """
+        Place several orders in one request; orders are post_limit_order style dicts. The response has
+        an "orders" list with an "order" or an "error" per order, in the order sent.
+        """
+        res, code = await self.order_request("POST", "/portfolio/orders/batched", {"orders": orders})
+        return res, code
+
+    async def batch_cancel_orders(self, order_ids):
+        """
+        Cancel several orders in one request. The response has an "orders" list with an "order" or an
+        "error" per id, in the order sent.
+        """
+        res, code = await self.order_request("DELETE", "/portfolio/orders/batched", {"ids": order_ids})
+        return res, code
 
     async def get_positions(self, market: str): 
         res, code = await self.get("/portfolio/positions/?ticker=" + market)
@@ -0,0 +1,193 @@
+import asyncio
+import uuid
+from collections import Counter
+from clients.kalshi_http import KalshiHTTPClient
+
+class LocalExchange():
+    """
+    In-process stand-in for the order endpoints of KalshiHTTPClient, to run OrderManager without the API.
+    Every price of each side has a FIFO queue of other participants' volume and the bot's orders. An
+    order joins the back of its queue when placed; a decrease keeps its place, while an amend to a new
+    price or a larger count and a cancel and new order both go to the back, as on Kalshi. trade() takes
+    volume from the front of a queue, so orders that kept their priority fill first.
+
+    batch and amend turn the batch and amend/decrease endpoints off, which answer 404 like an account
+    without access to them; their error code tells them apart from the "not_found" of an order that is no
+    longer resting. latency is slept before each answer.
+    """
+
+    limit_order_data = staticmethod(KalshiHTTPClient.limit_order_data)
+
+    def __init__(self, latency: float = 0, batch: bool = True, amend: bool = True) -> None:
+        self.latency = latency
+        self.batch = batch
+        self.amend = amend
+        self.orders = {}
+        # (side, price) -> [[order id or None for other participants, volume]] in time priority
+        self.queues = {}
+        self.requests = Counter()
+
+    def login(self) -> None:
+        pass
+
+    async def respond(self, endpoint: str, available: bool = True):
+        self.requests[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return available
+
+    @staticmethod
+    def unavailable():
+        return {"error": {"code": "unavailable", "message": "endpoint not available"}}, 404
+
+    @staticmethod
+    def not_found(order_id):
+        return {"error": {"code": "not_found", "message": f"order {order_id} not found"}}, 404
+
+    def queue(self, side: str, price: int):
+        return self.queues.setdefault((side, price), [])
+
+    def add_volume(self, side: str, price: int, volume: int) -> None:
+        """
+        Other participants' volume joining the back of a queue
+        """
+        self.queue(side, price).append([None, volume])
+
+    def enqueue(self, order) -> None:
+        self.queue(order["side"], order["price"]).append([order["order_id"], order["remaining_count"]])
+
+    def dequeue(self, order) -> None:
+        queue = self.queue(order["side"], order["price"])
+        queue[:] = [entry for entry in queue if entry[0] != order["order_id"]]
+
+    def queue_position(self, order_id) -> int:
+        """
+        Volume ahead of a resting order in its queue
+        """
+        order = self.orders[order_id]
+        ahead = 0
+        for owner, volume in self.queue(order["side"], order["price"]):
+            if owner == order_id:
+                return ahead
+            ahead += volume
+        raise KeyError(order_id)
+
+    def trade(self, side: str, price: int, count: int):
+        """
+        An incoming order takes up to count contracts from the front of a queue. Returns the fill
+        messages of the bot's orders it traded with, as the websocket sends them.
+        """
+        queue = self.queue(side, price)
+        fills = []
+        while count > 0 and queue:
+            entry = queue[0]
+            taken = min(count, entry[1])
+            entry[1] -= taken
+            count -= taken
+            if entry[0] is not None:
+                order = self.orders[entry[0]]
+                order["remaining_count"] -= taken
+                fills.append({"order_id": order["order_id"], "side": side, "count": taken, f"{side}_price": price})
+                if order["remaining_count"] == 0:
+                    order["status"] = "executed"
+                    del self.orders[order["order_id"]]
+            if entry[1] == 0:
+                queue.pop(0)
+        return fills
+
+    def create(self, data):
+        price = data["yes_price"] if data["side"] == "yes" else data["no_price"]
+        order = {
+            "order_id": str(uuid.uuid4()),
+            "client_order_id": data["client_order_id"],
+            "ticker": data["ticker"],
+            "side": data["side"],
+            "action": data["action"],
+            "price": price,
+            f"{data['side']}_price": price,
+            "remaining_count": data["count"],
+            "status": "resting",
+        }
+        self.orders[order["order_id"]] = order
+        self.enqueue(order)
+        return order
+
+    def cancel(self, order_id):
+        order = self.orders.pop(order_id)
+        self.dequeue(order)
+        reduced = order["remaining_count"]
+        order["remaining_count"] = 0
+        order["status"] = "canceled"
+        return order, reduced
+
+    async def post_limit_order(self, action, ticker, side, count, order_id, yes_price=None, no_price=None,
+                               expiration_ts=None, buy_max_cost=None):
+        await self.respond("POST /portfolio/orders")
+        order = self.create(self.limit_order_data(action, ticker, side, count, order_id, yes_price, no_price))
+        return {"order": dict(order)}, 201
+
+    async def cancel_limit_order(self, order_id):
+        await self.respond("DELETE /portfolio/orders/{order_id}")
+        if order_id not in self.orders:
+            return self.not_found(order_id)
+        order, reduced = self.cancel(order_id)
+        return {"order": order, "reduced_by": reduced}, 200
+
+    async def decrease_order(self, order_id, reduce_to: int):
+        if not await self.respond("POST /portfolio/orders/{order_id}/decrease", self.amend):
+            return self.unavailable()
+        if order_id not in self.orders:
+            return self.not_found(order_id)
+        order = self.orders[order_id]
+        if reduce_to <= 0:
+            order, _ = self.cancel(order_id)
+            return {"order": order}, 200
+        # Same place in the queue, less volume
+        for entry in self.queue(order["side"], order["price"]):
+            if entry[0] == order_id:
+                entry[1] = min(entry[1], reduce_to)
+        order["remaining_count"] = min(order["remaining_count"], reduce_to)
+        return {"order": dict(order)}, 200
+
+    async def amend_order(self, order_id, action, ticker, side, count, client_order_id, updated_client_order_id,
+                          yes_price=None, no_price=None):
+        if not await self.respond("POST /portfolio/orders/{order_id}/amend", self.amend):
+            return self.unavailable()
+        if order_id not in self.orders:
+            return self.not_found(order_id)
+        order = self.orders[order_id]
+        old = dict(order)
+        price = yes_price if side == "yes" else no_price
+        if price != order["price"] or count > order["remaining_count"]:
+            # Loses priority: back of the queue at the new price
+            self.dequeue(order)
+            order.update({"price": price, f"{side}_price": price, "remaining_count": count})
+            self.enqueue(order)
+        else:
+            for entry in self.queue(order["side"], order["price"]):
+                if entry[0] == order_id:
+                    entry[1] = count
+            order["remaining_count"] = count
+        order["client_order_id"] = updated_client_order_id
+        return {"old_order": old, "order": dict(order)}, 200
+
+    async def batch_create_orders(self, orders):
+        if not await self.respond("POST /portfolio/orders/batched", self.batch):
+            return self.unavailable()
+        return {"orders": [{"order": dict(self.create(data)), "error": None} for data in orders]}, 201
+
+    async def batch_cancel_orders(self, order_ids):
+        if not await self.respond("DELETE /portfolio/orders/batched", self.batch):
+            return self.unavailable()
+        results = []
+        for order_id in order_ids:
+            if order_id in self.orders:
+                order, reduced = self.cancel(order_id)
+                results.append({"order_id": order_id, "order": order, "reduced_by": reduced, "error": None})
+            else:
+                results.append({"order_id": order_id, "order": None, "error": self.not_found(order_id)[0]["error"]})
+        return {"orders": results}, 200
+
+    async def get_orders(self, market_ticker: str):
+        await self.respond("GET /portfolio/orders")
+        return {"orders": [dict(order) for order in self.orders.values() if order["ticker"] == market_ticker]}, 200
@@ -8,6 +8,7 @@ from ordermanager import OrderManager
 import config 
 from util.market_ticker import get_market_ticker, get_next_trading_day
 import logging
+import signal
 import sys
 import time
 import datetime
@@ -37,20 +38,43 @@ async def main():
 
     update = asyncio.Event()
     
-    kalshi_http_client = KalshiHTTPClient(email, password)
+    kalshi_http_client = KalshiHTTPClient(email, password, api_base)
+    # Connect ahead of the first order so it does not pay for the handshakes
+    await kalshi_http_client.warm_up()
     om = OrderManager(kalshi_http_client, MARKET)
     state = TradingState(om, kalshi_http_client)
     strategy = Strategy(om, MARKET, update, state)
     td_client = TDClient(update, state, om, strategy)
     kalshi_client = KalshiClient(api_base, ws_base, email, password, td_client, state, update, MARKET)
 
+    # Kill switch: kill -USR1 <pid> stops quoting and cancels every resting order, the feeds keep running.
+    # Its tasks are kept until they are done so they are not garbage collected and their errors are logged.
+    kill_tasks = set()
+
+    def killed(task): 
+        kill_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None: 
+            logging.critical(f"Kill switch failed: {task.exception()!r}")
+
+    def kill(): 
+        task = asyncio.create_task(om.kill_switch("SIGUSR1"))
+        kill_tasks.add(task)
+        task.add_done_callback(killed)
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, kill)
+
     td = asyncio.create_task(td_client.run())
     kalshi = asyncio.create_task(kalshi_client.run())
     strat = asyncio.create_task(strategy.run())
 
-    await td
-    await kalshi
-    await strat
+    try:
+        await td
+        await kalshi
+        await strat
+    finally:
+        if kill_tasks: 
+            await asyncio.gather(*kill_tasks, return_exceptions=True)
+        await kalshi_http_client.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
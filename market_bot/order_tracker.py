@@ -0,0 +1,247 @@
+import logging
+import time
+
+# Order lifecycle. Orders are tracked from the moment they are sent, before the exchange acknowledges them.
+PENDING_NEW = "pending_new"             # sent, not acknowledged yet
+RESTING = "resting"                     # acknowledged and resting in the book
+PARTIALLY_FILLED = "partially_filled"   # resting with some contracts filled
+PENDING_CANCEL = "pending_cancel"       # cancel (or amend away from it) sent, not acknowledged yet
+CANCELLED = "cancelled"                 # cancelled, rejected, amended into another order or gone from the book
+FILLED = "filled"                       # every contract filled
+
+LIVE = (PENDING_NEW, RESTING, PARTIALLY_FILLED, PENDING_CANCEL)
+DONE = (CANCELLED, FILLED)
+
+TRANSITIONS = {
+    PENDING_NEW: (RESTING, PARTIALLY_FILLED, FILLED, PENDING_CANCEL, CANCELLED),
+    RESTING: (PARTIALLY_FILLED, FILLED, PENDING_CANCEL, CANCELLED),
+    PARTIALLY_FILLED: (PARTIALLY_FILLED, FILLED, PENDING_CANCEL, CANCELLED),
+    PENDING_CANCEL: (RESTING, PARTIALLY_FILLED, FILLED, CANCELLED),
+    CANCELLED: (),
+    FILLED: (),
+}
+
+# Finished orders kept for reporting and late messages
+DONE_KEPT = 1000
+# Seconds a fill for an unknown order id waits for its acknowledgement, well past any request timeout
+EARLY_FILL_TIMEOUT = 60
+
+class TrackedOrder():
+
+    def __init__(self, client_id: str, side: str, price: int, count: int) -> None:
+        self.client_id = client_id
+        self.order_id = None
+        self.side = side
+        self.price = price
+        self.count = count
+        self.remaining = count
+        self.state = PENDING_NEW
+        # State to go back to if a cancel or amend is refused
+        self.previous = None
+        self.reason = None
+        self.sent = time.perf_counter()
+        self.updated = self.sent
+
+    def __repr__(self) -> str:
+        return f"TrackedOrder({self.side} {self.remaining}/{self.count} @ {self.price}, {self.state}, {self.client_id})"
+
+class OrderTracker():
+    """
+    Lifecycle of the bot's orders keyed by client order id. Changes are applied optimistically when a
+    request is sent (new orders are pending_new, cancels pending_cancel, decreases take effect at once) and
+    confirmed or rolled back from the REST response. Fills from the websocket are matched by order id;
+    fills for an order whose acknowledgement has not arrived yet are held until it does. reconcile()
+    brings the tracker in line with the resting orders the REST API lists.
+    """
+
+    def __init__(self) -> None:
+        self.orders = {}
+        # Live orders only, by client order id
+        self.active = {}
+        self.by_order_id = {}
+        # Fills received before the order they belong to was acknowledged, by order id, oldest first
+        self.early_fills = {}
+        self.done = []
+
+    def transition(self, order: TrackedOrder, state: str, reason: str = None) -> None:
+        if state not in TRANSITIONS[order.state]:
+            logging.warning(f"Ignoring {order.state} -> {state} for {order}")
+            return
+        order.state = state
+        order.updated = time.perf_counter()
+        if reason is not None:
+            order.reason = reason
+        if state in DONE:
+            self.active.pop(order.client_id, None)
+            self.done.append(order)
+            if len(self.done) > DONE_KEPT:
+                finished = self.done.pop(0)
+                self.orders.pop(finished.client_id, None)
+                # An amended order shares its order id with the one it replaced
+                if self.by_order_id.get(finished.order_id) == finished.client_id:
+                    del self.by_order_id[finished.order_id]
+
+    def get(self, client_id: str) -> TrackedOrder:
+        return self.orders.get(client_id)
+
+    def live(self, side: str = None):
+        return [order for order in self.active.values() if side is None or order.side == side]
+
+    def current(self, side: str) -> TrackedOrder:
+        """
+        The order quoting a side: the latest live order that is not being cancelled
+        """
+        orders = [order for order in self.live(side) if order.state != PENDING_CANCEL]
+        return orders[-1] if orders else None
+
+    def working(self, side: str) -> int:
+        """
+        Contracts that may still fill on a side, counting orders not yet acknowledged or being cancelled
+        """
+        return sum(order.remaining for order in self.live(side))
+
+    # Requests sent
+
+    def new(self, client_id: str, side: str, price: int, count: int) -> TrackedOrder:
+        order = TrackedOrder(client_id, side, price, count)
+        self.orders[client_id] = order
+        self.active[client_id] = order
+        return order
+
+    def cancel_sent(self, order: TrackedOrder) -> None:
+        order.previous = order.state
+        self.transition(order, PENDING_CANCEL)
+
+    def decrease_sent(self, order: TrackedOrder, count: int) -> int:
+        """
+        Returns the contracts taken off, to roll back if the decrease is refused
+        """
+        reduced = max(order.remaining - count, 0)
+        order.remaining -= reduced
+        return reduced
+
+    def amend_sent(self, order: TrackedOrder, client_id: str, price: int, count: int) -> TrackedOrder:
+        """
+        An amend replaces the order under a new client order id: the old one is pending_cancel and the
+        amended one pending_new until the exchange answers
+        """
+        self.cancel_sent(order)
+        amended = self.new(client_id, order.side, price, count)
+        amended.order_id = order.order_id
+        return amended
+
+    # Responses
+
+    def acknowledged(self, client_id: str, order_data: dict) -> None:
+        order = self.orders[client_id]
+        order.order_id = order_data["order_id"]
+        self.by_order_id[order.order_id] = client_id
+        if order.state == PENDING_NEW:
+            self.transition(order, RESTING)
+        # Fills may have come over the websocket before the acknowledgement
+        _, fills = self.early_fills.pop(order.order_id, (None, []))
+        for fill in fills:
+            self.apply_fill(order, fill["count"])
+
+    def rejected(self, client_id: str, reason: str) -> None:
+        self.transition(self.orders[client_id], CANCELLED, reason)
+
+    def cancelled(self, order: TrackedOrder, reason: str = "cancelled") -> None:
+        if order.state in LIVE:
+            self.transition(order, CANCELLED, reason)
+
+    def cancel_refused(self, order: TrackedOrder) -> None:
+        if order.state == PENDING_CANCEL:
+            self.transition(order, order.previous)
+
+    def decreased(self, order: TrackedOrder, order_data: dict) -> None:
+        if order.state in LIVE and "remaining_count" in order_data:
+            order.remaining = min(order.remaining, order_data["remaining_count"])
+
+    def decrease_refused(self, order: TrackedOrder, reduced: int) -> None:
+        if order.state in LIVE:
+            order.remaining += reduced
+
+    def amended(self, old: TrackedOrder, amended: TrackedOrder, order_data: dict) -> None:
+        self.transition(old, CANCELLED, f"amended into {amended.client_id}")
+        amended.order_id = order_data["order_id"]
+        # Fills of the old order while the amend was in flight come off the amended count
+        if "remaining_count" in order_data:
+            amended.remaining = min(amended.remaining, order_data["remaining_count"])
+        self.by_order_id[amended.order_id] = amended.client_id
+        self.transition(amended, RESTING if amended.remaining else FILLED)
+
+    def amend_refused(self, old: TrackedOrder, amended: TrackedOrder, reason: str) -> None:
+        self.transition(amended, CANCELLED, reason)
+        self.cancel_refused(old)
+
+    # Fills
+
+    def fill(self, fill: dict) -> TrackedOrder:
+        """
+        Apply a websocket fill. Fills without an order id go to the order quoting their side.
+        """
+        order_id = fill.get("order_id")
+        if order_id is None:
+            order = self.current(fill["side"])
+        elif order_id in self.by_order_id:
+            order = self.orders.get(self.by_order_id[order_id])
+        else:
+            self.expire_early_fills()
+            self.early_fills.setdefault(order_id, (time.perf_counter(), []))[1].append(fill)
+            return None
+        if order is None:
+            logging.warning(f"Fill for an order that is not tracked: {fill}")
+            return None
+        self.apply_fill(order, fill["count"])
+        return order
+
+    def expire_early_fills(self) -> None:
+        """
+        Drop held fills whose order was never acknowledged, such as late fills for an evicted order
+        """
+        now = time.perf_counter()
+        for order_id, (received, fills) in list(self.early_fills.items()):
+            if now - received < EARLY_FILL_TIMEOUT:
+                break
+            del self.early_fills[order_id]
+            logging.warning(f"Dropping {len(fills)} fills for untracked order {order_id}")
+
+    def apply_fill(self, order: TrackedOrder, count: int) -> None:
+        order.remaining = max(order.remaining - count, 0)
+        if order.remaining == 0:
+            self.transition(order, FILLED)
+        elif order.state != PENDING_CANCEL:
+            self.transition(order, PARTIALLY_FILLED)
+
+    # Reconciliation
+
+    def reconcile(self, resting: list) -> None:
+        """
+        Match the tracker to the orders the REST API lists as resting. Live acknowledged orders that are no
+        longer listed are gone (filled or cancelled elsewhere); listed orders that are not tracked, such as
+        those left by an earlier run, are adopted.
+        """
+        listed = {order["order_id"]: order for order in resting}
+        for order in self.live():
+            if order.order_id is None:
+                continue
+            data = listed.pop(order.order_id, None)
+            if data is None:
+                self.transition(order, CANCELLED, "not resting on the exchange")
+            elif "remaining_count" in data and data["remaining_count"] < order.remaining:
+                self.apply_fill(order, order.remaining - data["remaining_count"])
+
+        for data in listed.values():
+            side = data["side"]
+            price = data.get(f"{side}_price")
+            order = self.new(data.get("client_order_id") or data["order_id"], side, price, data.get("remaining_count", 0))
+            self.acknowledged(order.client_id, data)
+            logging.warning(f"Adopted untracked resting order {order}")
+        self.expire_early_fills()
+
+    def summary(self) -> str:
+        counts = {}
+        for order in self.orders.values():
+            counts[order.state] = counts.get(order.state, 0) + 1
+        return ", ".join(f"{count} {state}" for state, count in counts.items())
@@ -1,29 +1,63 @@
 import asyncio 
-from clients.kalshi_http import KalshiHTTPClient
+from clients.kalshi_http import KalshiHTTPClient, RequestTimer
+from order_tracker import OrderTracker
 import uuid 
 import sys
 import logging
+import time
+
+# Statuses the API answers with when the account does not have access to an endpoint
+UNAVAILABLE = (401, 403, 404, 405)
+# Error code of a request for an order that is no longer resting (filled or cancelled), also answered with 404
+NOT_FOUND = "not_found"
+
+# What a requote does to the resting order on a side, cheapest first
+DECREASE = "decrease"   # same price, fewer contracts: keeps queue priority, one request
+AMEND = "amend"         # new price or more contracts: joins the back of the queue, one request
+REPLACE = "replace"     # cancel and new order, when amending is not available: two requests
+NEW = "new"             # nothing resting
+CANCEL = "cancel"       # nothing wanted
+
+# Mass cancel: orders per batch cancel request, cancels in flight at once without batches, and retries of
+# the ones that failed with exponential backoff from CANCEL_BACKOFF seconds
+BATCH_CANCEL_SIZE = 20
+CANCEL_CONCURRENCY = 10
+CANCEL_RETRIES = 5
+CANCEL_BACKOFF = 0.05
+# Times handle_failure tries to get flat before giving up on the process
+MAX_FAILURES = 5
+
+def order_not_found(res, code): 
+    """
+    The request reached the endpoint but the order it was for is gone, as opposed to the endpoint not being available
+    """
+    return code == 404 and isinstance(res, dict) and (res.get("error") or {}).get("code") == NOT_FOUND
 
 class OrderManager(): 
     
     def __init__(self, kalshi: KalshiHTTPClient, market: str): 
         self.kalshi = kalshi
-        self.resting_orders = {
-            "yes": {
-                "id": None, 
-                "price": None,
-                "count": None
-            }, 
-            "no": {
-                "id": None,
-                "price": None,
-                "count": None
-            }
-        }
+        # Every order sent, by client order id, and what the strategy currently wants on each side
+        self.orders = OrderTracker()
+        self.wanted = {"yes": None, "no": None}
+        # When place_order first changed each side's quote since a requote last picked it up
+        self.quoted = {"yes": None, "no": None}
+        # Requote task working on each side, None when the side is idle
+        self.workers = {"yes": None, "no": None}
         self.market = market 
         self.failure_count = 0
         self.trading = True
-        self.interupted = False
+        # Set by the kill switch, trading never resumes after it
+        self.killed = False
+        # Running handle_failure recovery, shared by every requote that fails while it runs
+        self.recovery = None
+        # Batch and amend/decrease endpoints are tried until the API refuses them once
+        self.batch = True
+        self.amend = True
+        # Requote actions taken per side, by action
+        self.actions = {action: 0 for action in (DECREASE, AMEND, REPLACE, NEW, CANCEL)}
+        # End-to-end requote times, from place_order being called to every request answered
+        self.timer = RequestTimer()
 
     def set_market(self, price): 
         adj_price: int = 50 * int(price / 50) + 25
@@ -32,151 +66,455 @@ class OrderManager():
     
     async def handle_failure(self): 
         """
-        Cancel all orders and reboot system
+        Cancel all orders and reboot system. Both sides can fail at once; later callers wait for the
+        recovery already running instead of starting another.
+        """
+        if self.recovery is None: 
+            self.recovery = asyncio.create_task(self.recover())
+        await asyncio.shield(self.recovery)
+
+    async def recover(self): 
+        try: 
+            # Reload connection, prevent any new orders from being placed
+            logging.info("Reloading connection to Kalshi HTTP client")
+            self.trading = False
+            await asyncio.sleep(1)
+            self.kalshi.login()
+            logging.info("Cancelling all orders")
+            summary = await self.cancel_all_orders()
+            while not summary["flat"]: 
+                self.failure_count += 1 
+                if self.failure_count > MAX_FAILURES:
+                    logging.critical("FATAL ERROR: Failed to cancel all orders too many times. Exiting...")
+                    sys.exit(1)
+                logging.error("Failed to cancel all orders, retrying...")
+                await asyncio.sleep(CANCEL_BACKOFF * 2 ** self.failure_count)
+                summary = await self.cancel_all_orders()
+            logging.info("Successfully cancelled all orders")
+            self.trading = not self.killed
+        finally: 
+            self.recovery = None
+
+    async def kill_switch(self, reason="kill switch"): 
+        """
+        Stop quoting for good and cancel every resting order. Requotes in flight are waited for first, they
+        send nothing new once trading stops, so the final listing sees every order they placed.
         """
-        # Reload connection, prevent any new orders from being placed
-        logging.info("Reloading connection to Kalshi HTTP client")
+        logging.critical(f"Kill switch ({reason}): stopping trading and cancelling all orders")
+        self.killed = True
         self.trading = False
-        await asyncio.sleep(1)
-        self.kalshi.login()
-        logging.info("Cancelling all orders")
-        await self.cancel_all_orders()
-        logging.info("Successfully cancelled all orders")
-        self.trading = True
+        await self.settle()
+        summary = await self.cancel_all_orders()
+        if not summary["flat"]: 
+            logging.critical(f"Kill switch could not cancel every order: {summary}")
+        return summary
+
+    async def cancel_batch(self, order_ids): 
+        """
+        Cancel orders with batch requests, returns the ids that failed or None if batches are not available
+        """
+        failed = []
+        chunks = [order_ids[i:i + BATCH_CANCEL_SIZE] for i in range(0, len(order_ids), BATCH_CANCEL_SIZE)]
+        results = await asyncio.gather(*[self.kalshi.batch_cancel_orders(chunk) for chunk in chunks], return_exceptions=True)
+        for chunk, result in zip(chunks, results): 
+            if isinstance(result, Exception): 
+                failed += chunk
+                continue
+            res, code = result
+            if code in UNAVAILABLE: 
+                # Already cancelled orders answer 404 when cancelled again, so everything can be resent
+                logging.warning(f"Batch orders not available ({code}), cancelling one order at a time")
+                self.batch = False
+                return None
+            if code != 200: 
+                failed += chunk
+                continue
+            for order_id, cancelled in zip(chunk, res["orders"]): 
+                # An order that is already gone (filled or cancelled) is as good as cancelled
+                if cancelled.get("error") and cancelled["error"].get("code") != NOT_FOUND: 
+                    failed.append(order_id)
+        return failed
+
+    async def cancel_each(self, order_ids): 
+        """
+        Cancel orders with concurrent requests, at most CANCEL_CONCURRENCY in flight. Returns the ids that failed.
+        """
+        semaphore = asyncio.Semaphore(CANCEL_CONCURRENCY)
+
+        async def cancel(order_id): 
+            async with semaphore: 
+                try: 
+                    res, code = await self.kalshi.cancel_limit_order(order_id)
+                except Exception: 
+                    return False
+                return code == 200 or order_not_found(res, code)
+
+        results = await asyncio.gather(*[cancel(order_id) for order_id in order_ids])
+        return [order_id for order_id, ok in zip(order_ids, results) if not ok]
 
     async def cancel_all_orders(self): 
-        orders, code = await self.kalshi.get_orders(self.market)
+        """
+        Cancel every resting order in the market: batch cancels if available, otherwise concurrent single
+        cancels, with only the failed ones retried after a backoff. Orders are listed again once they are
+        all cancelled in case a requote in flight placed new ones. Returns a summary with the time to flat.
+        """
+        start = time.perf_counter()
+        flat = False
+        cancelled = 0
+        sent = 0
+        retries = 0
+        remaining = []
+        # Each pass lists or cancels; only failures back off and count as retries
+        for _ in range(2 * (CANCEL_RETRIES + 1)): 
+            if not remaining: 
+                try: 
+                    res, code = await self.kalshi.get_orders(self.market)
+                except Exception as e: 
+                    res, code = e, None
+                if code == 200: 
+                    self.orders.reconcile(res["orders"])
+                    remaining = [order["order_id"] for order in res["orders"]]
+                    if not remaining: 
+                        flat = True
+                        break
+                    continue
+                logging.error(f"Failed to list resting orders: {res}")
+            else: 
+                sent += len(remaining)
+                failed = await self.cancel_batch(remaining) if self.batch else None
+                if failed is None: 
+                    failed = await self.cancel_each(remaining)
+                cancelled += len(remaining) - len(failed)
+                remaining = failed
+                if not failed: 
+                    continue
 
-        if code != 200: 
-            logging.error("Failed to cancel all orders, retrying...")
-            self.failure_count += 1 
-            if self.failure_count > 5:
-                logging.critical("FATAL ERROR: Failed to cancel all orders too many times. Exiting...")
-                sys.exit(1)
+            retries += 1
+            if retries > CANCEL_RETRIES: 
+                break
+            await asyncio.sleep(CANCEL_BACKOFF * 2 ** (retries - 1))
+
+        summary = {
+            "flat": flat,
+            "cancelled": cancelled,
+            "failed": len(remaining),
+            "retries": retries,
+            "cancels_sent": sent,
+            "seconds_to_flat": round(time.perf_counter() - start, 4) if flat else None,
+        }
+        self.timer.add("cancel all", time.perf_counter() - start, error=not flat)
+        logging.info(f"Cancel all orders: {summary}")
+        return summary
+
+    def plan(self, side, price, count): 
+        """
+        Cheapest action that turns the order quoting a side into the quote, None if it already is
+        """
+        order = self.orders.current(side)
+        valid = 1 <= price <= 99 and count > 0
+        if order is None: 
+            return NEW if valid else None
+        if not valid: 
+            return CANCEL
+        if price == order.price: 
+            if count == order.remaining: 
+                return None
+            if count < order.remaining: 
+                return DECREASE if self.amend else REPLACE
+        return AMEND if self.amend else REPLACE
 
-            await self.handle_failure()
+    async def cancel_side(self, side): 
+        """
+        Cancel the order quoting a side, returns an error message or None
+        """
+        order = self.orders.current(side)
+        logging.info(f"Cancelling existing {side} order")
+        self.orders.cancel_sent(order)
+        try: 
+            res, code = await self.kalshi.cancel_limit_order(order.order_id)
+        except Exception: 
+            self.orders.cancel_refused(order)
+            raise
 
-        for order in orders['orders']: 
-            await self.kalshi.cancel_limit_order(order['client_order_id'])
+        if order_not_found(res, code): 
+            # Already gone: filled, or cancelled by an earlier request
+            self.orders.cancelled(order, "not found")
+        elif code != 200:
+            self.orders.cancel_refused(order)
+            return f"failed to cancel {side} order: {res}"
+        else: 
+            self.orders.cancelled(order)
+        return None
 
-    async def cancelYes(self): 
-        logging.info("Cancelling existing yes order")
-        res, code = await self.kalshi.cancel_limit_order(self.resting_orders["yes"]["id"])
-        print(res)
+    def limit_order(self, side, price, count): 
+        """
+        Track a new order as pending and return the request for it
+        """
+        client_id = str(uuid.uuid4())
+        self.orders.new(client_id, side, price, count)
+        logging.info(f"Placing new {side} order: {price} at {count}")
+        prices = {"yes_price": price} if side == "yes" else {"no_price": price}
+        return self.kalshi.limit_order_data("buy", self.market, side, count, client_id, **prices)
 
-        if code != 200:
-            logging.error("Failed to cancel yes order, reloading Order Manager")
-            await self.handle_failure() 
-            return
+    async def post_side(self, side, price, count): 
+        """
+        Place a new order on a side, returns an error message or None. Insufficient balance is logged but
+        not an error, the other side is still quoted.
+        """
+        if not self.trading: 
+            return None
+        data = self.limit_order(side, price, count)
+        try: 
+            res, code = await self.kalshi.post_limit_order(data["action"], data["ticker"], side, count, data["client_order_id"],
+                                                           data["yes_price"], data["no_price"])
+        except Exception as e: 
+            self.orders.rejected(data["client_order_id"], repr(e))
+            raise
+        return self.placed(side, data["client_order_id"], res.get("order"), res.get("error"), code == 201)
 
-        self.resting_orders["yes"]["id"] = None
+    def placed(self, side, client_id, order, error, ok): 
+        if not ok or order is None: 
+            self.orders.rejected(client_id, error["message"] if error else "no order returned")
+            if error is not None and error.get("code") == "insufficient_balance": 
+                logging.error(f"Failed to place {side} order, {error['message']}.")
+                return None
+            return f"failed to place {side} order: {error['message'] if error else 'no order returned'}"
 
-    async def cancelNo(self):
-        logging.info("Cancelling existing no order")
-        res, code = await self.kalshi.cancel_limit_order(self.resting_orders["no"]["id"])
-        print(res)
+        self.orders.acknowledged(client_id, order)
+        logging.info(f"Successfully placed order, orders: {self.orders.summary()}")
+        return None
 
+    async def decrease_side(self, side, count): 
+        logging.info(f"Decreasing {side} order to {count}")
+        order = self.orders.current(side)
+        reduced = self.orders.decrease_sent(order, count)
+        try: 
+            res, code = await self.kalshi.decrease_order(order.order_id, count)
+        except Exception: 
+            self.orders.decrease_refused(order, reduced)
+            raise
+        if order_not_found(res, code): 
+            self.orders.decrease_refused(order, reduced)
+            return await self.order_gone(side, order, DECREASE)
+        if code in UNAVAILABLE: 
+            self.orders.decrease_refused(order, reduced)
+            logging.warning(f"Decreasing orders not available ({code}), cancelling and replacing instead")
+            self.amend = False
+            self.actions[DECREASE] -= 1
+            self.actions[REPLACE] += 1
+            return await self.replace_side(side)
         if code != 200: 
-            logging.error("Failed to cancel no order, reloading Order Manager")
-            await self.handle_failure() 
-            return
-        
-        self.resting_orders["no"]["id"] = None
+            self.orders.decrease_refused(order, reduced)
+            return f"failed to decrease {side} order: {res}"
+        self.orders.decreased(order, res.get("order", {}))
+        return None
 
-    def update_resting(self, fill, side, count): 
+    async def amend_side(self, side, price, count): 
+        if not self.trading: 
+            return None
+        logging.info(f"Amending {side} order to {price} at {count}")
+        order = self.orders.current(side)
+        client_id = str(uuid.uuid4())
+        amended = self.orders.amend_sent(order, client_id, price, count)
+        prices = {"yes_price": price} if side == "yes" else {"no_price": price}
+        try: 
+            res, code = await self.kalshi.amend_order(order.order_id, "buy", self.market, side, count, order.client_id, client_id, **prices)
+        except Exception as e: 
+            self.orders.amend_refused(order, amended, repr(e))
+            raise
+        if order_not_found(res, code): 
+            self.orders.amend_refused(order, amended, "order not found")
+            return await self.order_gone(side, order, AMEND)
+        if code in UNAVAILABLE: 
+            self.orders.amend_refused(order, amended, "amend not available")
+            logging.warning(f"Amending orders not available ({code}), cancelling and replacing instead")
+            self.amend = False
+            self.actions[AMEND] -= 1
+            self.actions[REPLACE] += 1
+            return await self.replace_side(side)
+        if code != 200: 
+            self.orders.amend_refused(order, amended, str(res))
+            return f"failed to amend {side} order: {res}"
+        self.orders.amended(order, amended, res["order"])
+        return None
+
+    async def order_gone(self, side, order, action): 
+        """
+        The order was filled or cancelled before a decrease or amend reached it: mark it done and place a
+        new order at the wanted quote. Fills for it still arrive over the websocket.
+        """
+        logging.info(f"{side} order {order.order_id} is no longer resting, placing a new order")
+        self.orders.cancelled(order, "not found")
+        self.actions[action] -= 1
+        self.actions[NEW] += 1
+        return await self.replace_side(side)
+
+    async def replace_side(self, side): 
+        # Cancel before placing on the same side so both orders can never rest at once
+        if self.orders.current(side) is not None: 
+            error = await self.cancel_side(side)
+            if error is not None: 
+                return error
+
+        # Quote with whatever the strategy wants by now
+        price, count = self.wanted[side]
+        if 1 <= price <= 99 and count > 0: 
+            return await self.post_side(side, price, count)
+        return None
+
+    async def requote_side(self, side, action, price, count): 
+        self.actions[action] += 1
+        if action == DECREASE: 
+            return await self.decrease_side(side, count)
+        if action == AMEND: 
+            return await self.amend_side(side, price, count)
+        if action == CANCEL: 
+            return await self.cancel_side(side)
+        return await self.replace_side(side)
+
+    async def requote_batched(self, sides): 
+        """
+        Replace both sides with one batch cancel and one batch create. Returns the error messages, or
+        None if the batch endpoints are not available and nothing was sent.
+        """
+        errors = []
+        cancels = [self.orders.current(side) for side in sides if self.orders.current(side) is not None]
+        if cancels: 
+            logging.info(f"Cancelling existing {' and '.join(order.side for order in cancels)} orders")
+            for order in cancels: 
+                self.orders.cancel_sent(order)
+            try: 
+                res, code = await self.kalshi.batch_cancel_orders([order.order_id for order in cancels])
+            except Exception: 
+                for order in cancels: 
+                    self.orders.cancel_refused(order)
+                raise
+            if code in UNAVAILABLE or code != 200: 
+                for order in cancels: 
+                    self.orders.cancel_refused(order)
+                if code in UNAVAILABLE: 
+                    logging.warning(f"Batch orders not available ({code}), requoting each side separately")
+                    self.batch = False
+                    return None
+                return [f"failed to cancel {' and '.join(order.side for order in cancels)} orders: {res}"]
+
+            for order, result in zip(cancels, res["orders"]): 
+                if result.get("error") and result["error"].get("code") != NOT_FOUND: 
+                    self.orders.cancel_refused(order)
+                    errors.append(f"failed to cancel {order.side} order: {result['error']}")
+                else: 
+                    self.orders.cancelled(order)
+
+        # Quote with whatever the strategy wants by now
+        sides = [side for side in sides if self.orders.current(side) is None
+                 and 1 <= self.wanted[side][0] <= 99 and self.wanted[side][1] > 0]
+        if not sides or not self.trading: 
+            return errors
+        orders = [self.limit_order(side, *self.wanted[side]) for side in sides]
+
+        try: 
+            res, code = await self.kalshi.batch_create_orders(orders)
+        except Exception as e: 
+            for data in orders: 
+                self.orders.rejected(data["client_order_id"], repr(e))
+            raise
+        if code not in (200, 201): 
+            for data in orders: 
+                self.orders.rejected(data["client_order_id"], str(res))
+            if code in UNAVAILABLE and not cancels: 
+                logging.warning(f"Batch orders not available ({code}), requoting each side separately")
+                self.batch = False
+                return None
+            return errors + [f"failed to place {' and '.join(sides)} orders: {res}"]
+
+        for side, data, result in zip(sides, orders, res["orders"]): 
+            error = self.placed(side, data["client_order_id"], result.get("order"), result.get("error"), not result.get("error"))
+            if error is not None: 
+                errors.append(error)
+        return errors
 
-        if side == "yes": 
-            self.resting_orders["yes"]["count"] -= count
-            if self.resting_orders["yes"]["count"] == 0: 
-                self.resting_orders["yes"]["id"] = None
-                self.resting_orders["yes"]["price"] = None
-        elif side == "no": 
-            self.resting_orders["no"]["count"] -= count
-            if self.resting_orders["no"]["count"] == 0: 
-                self.resting_orders["no"]["id"] = None
-                self.resting_orders["no"]["price"] = None
+    def update_resting(self, fill, side, count): 
+        self.orders.fill(fill)
 
     async def place_order(self, bid_price, bid_count, ask_price, ask_count): 
-        
+        """
+        Set the quote on both sides and return without waiting for the exchange. An idle side gets a
+        requote task straight away; a side with requests in flight picks up the latest quote once they
+        are answered, so requests on the same order never overlap and stale quotes are skipped.
+        """
         if not self.trading: 
             return
-        self.interupted = False 
-
-        yes_price = bid_price
-        yes_count = bid_count
-
-        no_price = 100 - ask_price
-        no_count = ask_count
-
-        if (yes_price != self.resting_orders["yes"]["price"] or yes_count != self.resting_orders["yes"]["count"]) and yes_count > 0: 
-            # Cancel old order if it exists
-            if self.resting_orders["yes"]["id"] is not None or yes_price > 99: 
-                await self.cancelYes()
-            
-            if self.interupted:
-                self.interupted = False 
-                logging.info("New information received, cancelling orders")
-                self.cancel_all_orders()
-                return
-
-            if yes_price <= 99 and yes_price >= 1: 
-                logging.info(f"Placing new yes order: {yes_price} at {yes_count}")
-                id = str(uuid.uuid4())
-
-                res, code = await self.kalshi.post_limit_order("buy", self.market, "yes", yes_count, id, yes_price=yes_price)
-
-                if code != 201 and res['error']['code'] != "insufficient_balance": 
-                    logging.error(f"Failed to place yes order, {res['error']['message']}, reloading Order Manager")
-                    await self.handle_failure() 
-                    return 
-                elif code != 201: 
-                    # Insufficient balance, only place no order 
-                    logging.error(f"Failed to place yes order, {res['error']['message']}.") 
-                else: 
-                    self.resting_orders["yes"]["id"] = res["order"]["order_id"]
-                    self.resting_orders["yes"]["price"] = yes_price
-                    self.resting_orders["yes"]["count"] = yes_count
+        now = time.perf_counter()
+        for side, quote in (("yes", (bid_price, bid_count)), ("no", (100 - ask_price, ask_count))): 
+            if quote != self.wanted[side]: 
+                self.wanted[side] = quote
+                if self.quoted[side] is None: 
+                    self.quoted[side] = now
 
-                    if self.interupted:
-                        self.interupted = False 
-                        logging.info("New information received, cancelling orders")
-                        self.cancel_all_orders()
-                        return
+        idle = [side for side, worker in self.workers.items() if worker is None]
+        if idle: 
+            task = asyncio.create_task(self.requote(idle))
+            for side in idle: 
+                self.workers[side] = task
 
-                    logging.info(f"Successfully placed order, current resting orders: {self.resting_orders}")
-
-    
-        if (no_price != self.resting_orders["no"]["price"] or no_count != self.resting_orders["no"]["count"]) and no_count > 0:
-            if self.resting_orders["no"]["id"] is not None or no_price > 99: 
-                await self.cancelNo()
+    async def settle(self): 
+        """
+        Wait until no requote is in flight, other than the one calling
+        """
+        current = asyncio.current_task()
+        workers = {worker for worker in self.workers.values() if worker is not None and worker is not current}
+        while workers: 
+            await asyncio.gather(*workers, return_exceptions=True)
+            workers = {worker for worker in self.workers.values() if worker is not None and worker is not current}
 
-            if self.interupted:
-                self.interupted = False 
-                logging.info("New information received, cancelling orders")
-                self.cancel_all_orders()
-                return
+    async def requote(self, sides): 
+        """
+        Bring sides to their wanted quote until no newer quote arrived while requests were in flight.
+        Each side's order is changed with the cheapest action (see plan): left alone, decreased in place,
+        amended, or cancelled and replaced; sides go at the same time, or through the batch endpoints when
+        both need a new order. Failures from either side are collected and handled once.
+        """
+        owned = list(sides)
+        # Quote each side was last brought to
+        done = {}
+        try: 
+            while sides and self.trading: 
+                # Timed from place_order, or from now when the quote did not change (e.g. after a fill)
+                start = time.perf_counter()
+                quotes = {side: self.wanted[side] for side in sides}
+                asked = {side: self.quoted[side] or start for side in sides}
+                self.quoted.update({side: None for side in sides})
+                done.update(quotes)
+                actions = {side: self.plan(side, *quotes[side]) for side in sides}
+                actions = {side: action for side, action in actions.items() if action is not None}
+                if not actions: 
+                    sides = [side for side in owned if self.wanted[side] != done[side]]
+                    continue
 
-            if no_price <= 99 and no_price >= 1:
-                logging.info(f"Placing new no order: {no_price} at {no_count}")
-                id = str(uuid.uuid4())
+                errors = None
+                if self.batch and len(actions) == 2 and all(action in (REPLACE, NEW) for action in actions.values()): 
+                    errors = await self.requote_batched(list(actions))
+                    if errors is not None: 
+                        for action in actions.values(): 
+                            self.actions[action] += 1
+                if errors is None: 
+                    results = await asyncio.gather(*[self.requote_side(side, action, *quotes[side]) for side, action in actions.items()],
+                                                   return_exceptions=True)
+                    errors = [f"{side}: {result!r}" if isinstance(result, Exception) else result
+                              for side, result in zip(actions, results) if result is not None]
 
-                res, code = await self.kalshi.post_limit_order("buy", self.market, "no", no_count, id, no_price=no_price)
+                elapsed = time.perf_counter() - min(asked[side] for side in actions)
+                name = " and ".join(f"{side} {action}" for side, action in actions.items())
+                self.timer.add("requote " + name, elapsed, error=bool(errors))
+                logging.info(f"Requoted {name} in {1000 * elapsed:.1f}ms")
 
-                if code != 201 and res['error']['code'] != "insufficient_balance":
-                    logging.error(f"Failed to place no order, {res['error']['message']}, reloading Order Manager")
-                    self.handle_failure()
+                if errors: 
+                    logging.error(f"Requote failed, {'; '.join(errors)}, reloading Order Manager")
+                    await self.handle_failure()
                     return
-                elif code != 201: 
-                    logging.error(f"Failed to place no order, {res['error']['message']}.")
-                else: 
-                    self.resting_orders["no"]["id"] = res["order"]["order_id"]
-                    self.resting_orders["no"]["price"] = no_price
-                    self.resting_orders["no"]["count"] = no_count
-
-                    if self.interupted:
-                        self.interupted = False 
-                        logging.info("New information received, cancelling orders")
-                        self.cancel_all_orders()
-                        return
 
-                    logging.info(f"Successfully placed order, current resting orders: {self.resting_orders}")
\ No newline at end of file
+                # Go again for any side of this task whose quote moved on while the requests were in flight
+                sides = [side for side in owned if self.wanted[side] != done[side]]
+        finally: 
+            for side in owned: 
+                self.workers[side] = None
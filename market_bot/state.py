@@ -38,7 +38,6 @@ class TradingState():
 
         self.last_update = "kalshi"
         logging.info(f"Received Kalshi orderbook snapshot: {self.orderbook_ba}")
-        self.om.interupted = True
     
     def update_orderbook(self, delta): 
         price = delta["price"]
@@ -65,7 +64,6 @@ class TradingState():
         
         self.last_update = "kalshi"
         logging.info(f"Received Kalshi orderbook delta: {self.orderbook_ba}")
-        self.om.interupted = True
 
     def update_position(self, fill):
         side = fill["side"]
@@ -3,8 +3,9 @@ from ordermanager import OrderManager
 from state import TradingState
 import logging
 import time
-from scipy.stats import cauchy
 from util.market_ticker import get_next_trading_day
+from pricing.fair_value import fair_value
+from pricing.calibration import load_params
 
 class Strategy(): 
 
@@ -20,9 +21,12 @@ class Strategy():
         self.EOD = 1682452800
         self.POSITION_LIMIT = 30 
 
-        # Paramaters for Cauchy distribution
-        self.x0 = 0
-        self.gamma = 0.000005
+        # Paramaters for Cauchy distribution, fitted by the simulator's calibrate.py if available
+        params = load_params()
+        self.x0 = params["x0"]
+        self.gamma = params["gamma"]
+        self.exponent = params["exponent"]
+        logging.info(f"Strategy model parameters: gamma={self.gamma}, x0={self.x0}, exponent={self.exponent}")
 
     def set_eod(self): 
         day = get_next_trading_day()
@@ -36,17 +40,17 @@ class Strategy():
         self.LOWER = adj_price - 25
         logging.info("Strategy set market to: " + self.market)
 
+    def fair_value(self): 
+        offset = self.EOD - time.time()
+        return fair_value(self.state.sp_price, offset, self.LOWER, self.UPPER, self.gamma, self.x0, self.exponent)
+
     async def run(self): 
         while True: 
             await self.update.wait()
             self.update.clear()
 
-            curr_time = time.time()
-            offset = self.EOD - curr_time
-            curr_gamma = self.gamma*(offset)**(3/5)
-
             try: 
-                p = cauchy.cdf((self.UPPER-self.state.sp_price)/self.state.sp_price, self.x0, curr_gamma) - cauchy.cdf((self.LOWER-self.state.sp_price)/self.state.sp_price, self.x0, curr_gamma)
+                p = self.fair_value()
                 bid = round(p * 100) - 1
                 ask = round(p * 100) + 2
 
@@ -0,0 +1,4 @@
+"""
+S&P 500 bracket pricing model shared by the live bot, the simulator and the analysis notebooks. Install
+the repository (pip install -e .) to import it from any of them.
+"""
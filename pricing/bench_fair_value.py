@@ -0,0 +1,60 @@
+"""
+Micro-benchmark for the closed-form fair value kernel. Checks the closed forms against scipy.stats and
+reports scalar and batched throughput. Run from the repository root: python -m pricing.bench_fair_value [n]
+"""
+import time
+import numpy as np
+from scipy.stats import cauchy, norm
+from pricing.fair_value import normal_probability, fair_value, decayed_gamma, normal_probability_array, fair_value_array, X0
+
+LOWER = 4050
+UPPER = 4100
+TOLERANCE = 1e-12
+
+def scipy_cauchy(sp_price, offset):
+    gamma = decayed_gamma(offset)
+    return cauchy.cdf((UPPER - sp_price) / sp_price, X0, gamma) - cauchy.cdf((LOWER - sp_price) / sp_price, X0, gamma)
+
+def scipy_normal(sp_price, sigma):
+    return norm.cdf((UPPER - sp_price) / sp_price, 0, sigma) - norm.cdf((LOWER - sp_price) / sp_price, 0, sigma)
+
+def timeit(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    import sys
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    # A trading day worth of prices around the bracket and seconds until close
+    rng = np.random.default_rng(0)
+    sp = 4075 + np.cumsum(rng.normal(0, 0.5, n))
+    offset = np.linspace(23400, 1, n)
+    sigma = 0.0001 * np.sqrt(offset)
+
+    # Accuracy against scipy
+    cauchy_err = np.max(np.abs(fair_value_array(sp, offset, LOWER, UPPER) - scipy_cauchy(sp, offset)))
+    normal_err = np.max(np.abs(normal_probability_array(sp, LOWER, UPPER, sigma) - scipy_normal(sp, sigma)))
+    scalar_err = max(abs(fair_value(s, o, LOWER, UPPER) - scipy_cauchy(s, o)) for s, o in zip(sp[:1000].tolist(), offset[:1000].tolist()))
+    scalar_normal_err = max(abs(normal_probability(s, LOWER, UPPER, g) - scipy_normal(s, g)) for s, g in zip(sp[:1000].tolist(), sigma[:1000].tolist()))
+    print(f"Max abs error vs scipy: cauchy {cauchy_err:.2e}, normal {normal_err:.2e}, scalar cauchy {scalar_err:.2e}, scalar normal {scalar_normal_err:.2e}")
+    assert max(cauchy_err, normal_err, scalar_err, scalar_normal_err) < TOLERANCE
+
+    # Scalar throughput (one call per strategy update)
+    m = min(n, 20000)
+    sp_list = sp[:m].tolist()
+    offset_list = offset[:m].tolist()
+    scipy_scalar = timeit(lambda: [scipy_cauchy(s, o) for s, o in zip(sp_list, offset_list)], repeat=1)
+    closed_scalar = timeit(lambda: [fair_value(s, o, LOWER, UPPER) for s, o in zip(sp_list, offset_list)])
+    print(f"Scalar  scipy.stats: {m / scipy_scalar:>14,.0f} evals/sec")
+    print(f"Scalar  closed form: {m / closed_scalar:>14,.0f} evals/sec ({scipy_scalar / closed_scalar:.0f}x)")
+
+    # Batched throughput (whole-day curves)
+    scipy_batch = timeit(lambda: scipy_cauchy(sp, offset))
+    closed_batch = timeit(lambda: fair_value_array(sp, offset, LOWER, UPPER))
+    print(f"Batched scipy.stats: {n / scipy_batch:>14,.0f} evals/sec")
+    print(f"Batched closed form: {n / closed_batch:>14,.0f} evals/sec ({scipy_batch / closed_batch:.1f}x)")
@@ -0,0 +1,151 @@
+"""
+Calibration of the fair value model against recorded days.
+
+An observation is one S&P 500 price with the seconds left until close, the bracket of the day, the
+closing price it settled on and, where the book was two-sided, the Kalshi mid as a probability. Fits are
+vectorized over all observations at once and minimize one of:
+
+    mle       negative log likelihood of the realized return to close (settlement only)
+    brier     mean squared error of the bracket probability
+    log_loss  cross-entropy of the bracket probability
+
+against either the realized settlement (0 or 1) or the market mid. The Cauchy model fits gamma and the
+decay exponent (x0 stays fixed), the normal model fits sigma with a square root of time decay.
+
+Fitted parameters are written to fitted_params.json next to this file; load_params() is what the
+strategies use for their defaults and falls back to the constants in fair_value when nothing was fitted.
+"""
+import json
+import math
+import os
+import numpy as np
+from scipy.optimize import minimize
+from pricing.fair_value import cauchy_probability_array, normal_probability_array, decayed_gamma, X0, GAMMA, DECAY
+
+MODELS = ("cauchy", "normal")
+LOSSES = ("mle", "brier", "log_loss")
+TARGETS = ("settlement", "market")
+
+# Arrays every observation set carries, all of the same length
+FIELDS = ("sp_price", "offset", "lower", "upper", "close", "resolved", "market")
+
+# Starting point of the normal fit: roughly a 0.2% daily move spread over a 6.5 hour session
+SIGMA = 0.000013
+NORMAL_DECAY = 1 / 2
+
+# Search bounds: log scales and the decay exponent. One day's settlement is a single outcome, so a
+# per-day settlement fit can otherwise run off towards a degenerate scale.
+LOG_SCALE_BOUNDS = (math.log(1e-10), math.log(1e-1))
+EXPONENT_BOUNDS = (0.0, 2.0)
+
+# Probabilities are clipped this far from 0 and 1 before taking logs
+EPSILON = 1e-6
+
+PARAMS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fitted_params.json")
+
+def default_params() -> dict:
+    return {"gamma": GAMMA, "x0": X0, "exponent": DECAY, "sigma": SIGMA}
+
+def load_params(path: str = PARAMS_FILE) -> dict:
+    """
+    Fitted model parameters, with the fair_value constants for anything that has not been fitted
+    """
+    params = default_params()
+    if os.path.exists(path):
+        with open(path) as f:
+            fitted = json.load(f)
+        params.update({name: fitted[name] for name in params if name in fitted})
+    return params
+
+def save_params(params: dict, path: str = PARAMS_FILE) -> None:
+    with open(path, "w") as f:
+        json.dump(params, f, indent=4)
+        f.write("\n")
+
+def concat_observations(observations) -> dict:
+    # Pool the observations of several days into one set
+    observations = list(observations)
+    return {field: np.concatenate([obs[field] for obs in observations]) for field in FIELDS}
+
+def decayed_sigma(offset, sigma=SIGMA):
+    # Normal scale for a given number of seconds until close
+    return sigma * np.asarray(offset, dtype=np.float64) ** NORMAL_DECAY
+
+def probability(obs: dict, model: str, params: dict) -> np.ndarray:
+    """
+    Model probability of a YES resolution for every observation
+    """
+    if model == "cauchy":
+        gamma = decayed_gamma(obs["offset"], params["gamma"], params["exponent"])
+        return cauchy_probability_array(obs["sp_price"], obs["lower"], obs["upper"], gamma, params["x0"])
+    return normal_probability_array(obs["sp_price"], obs["lower"], obs["upper"], decayed_sigma(obs["offset"], params["sigma"]))
+
+def negative_log_likelihood(obs: dict, model: str, params: dict) -> float:
+    """
+    Mean negative log density of the realized return from each observation to the close
+    """
+    returns = (obs["close"] - obs["sp_price"]) / obs["sp_price"]
+    if model == "cauchy":
+        scale = decayed_gamma(obs["offset"], params["gamma"], params["exponent"])
+        z = (returns - params["x0"]) / scale
+        return float(np.mean(np.log(math.pi * scale) + np.log1p(z * z)))
+    scale = decayed_sigma(obs["offset"], params["sigma"])
+    z = returns / scale
+    return float(np.mean(np.log(scale) + 0.5 * math.log(2 * math.pi) + 0.5 * z * z))
+
+def target_values(obs: dict, target: str) -> np.ndarray:
+    return obs["resolved"].astype(np.float64) if target == "settlement" else obs["market"]
+
+def loss(obs: dict, model: str, params: dict, kind: str = "mle", target: str = "settlement") -> float:
+    if kind == "mle":
+        if target != "settlement":
+            raise ValueError("mle is a likelihood of the settlement price, use brier or log_loss against the market")
+        return negative_log_likelihood(obs, model, params)
+
+    y = target_values(obs, target)
+    p = probability(obs, model, params)
+    # Market targets only exist where the book was two-sided
+    known = np.isfinite(y) & np.isfinite(p)
+    y, p = y[known], p[known]
+    if kind == "brier":
+        return float(np.mean((p - y) ** 2))
+    p = np.clip(p, EPSILON, 1 - EPSILON)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+def fit(obs: dict, model: str = "cauchy", kind: str = "mle", target: str = "settlement", start: dict = None) -> dict:
+    """
+    Fit a model to a set of observations. Scales are searched in log space so they stay positive.
+    Returns the fitted parameters (the others taken from start) with the loss before and after.
+    """
+    if model not in MODELS or kind not in LOSSES or target not in TARGETS:
+        raise ValueError(f"Unknown fit {model}/{kind}/{target}, expected a model in {MODELS}, a loss in {LOSSES} and a target in {TARGETS}")
+
+    start = {**default_params(), **(start or {})}
+    keep = obs["offset"] > 0
+    obs = {field: values[keep] for field, values in obs.items()}
+
+    if model == "cauchy":
+        names = ("gamma", "exponent")
+        x = np.array([math.log(start["gamma"]), start["exponent"]])
+        bounds = [LOG_SCALE_BOUNDS, EXPONENT_BOUNDS]
+        unpack = lambda x: {**start, "gamma": math.exp(x[0]), "exponent": x[1]}
+    else:
+        names = ("sigma",)
+        x = np.array([math.log(start["sigma"])])
+        bounds = [LOG_SCALE_BOUNDS]
+        unpack = lambda x: {**start, "sigma": math.exp(x[0])}
+
+    objective = lambda x: loss(obs, model, unpack(x), kind, target)
+    result = minimize(objective, x, method="Nelder-Mead", bounds=bounds, options={"xatol": 1e-6, "fatol": 1e-10, "maxiter": 2000})
+    params = unpack(result.x)
+
+    return {
+        "model": model,
+        "loss": kind,
+        "target": target,
+        **{name: float(params[name]) for name in names},
+        "observations": int(len(obs["offset"])),
+        "initial_loss": objective(x),
+        "final_loss": float(result.fun),
+        "converged": bool(result.success),
+    }
@@ -0,0 +1,75 @@
+"""
+Closed-form fair value of an S&P 500 bracket contract.
+
+The probability that the S&P 500 closes inside [lower, upper] is modelled on the return needed to reach
+each bracket bound from the current price. The Cauchy model uses arctan directly and the normal model
+uses erfc, so neither goes through scipy.stats' generic distribution machinery. The scalar functions use
+the math module and are what the strategies call on every update; the *_array variants take NumPy arrays
+of S&P 500 prices and times to close to build whole-day probability curves in one pass.
+"""
+import math
+import numpy as np
+from scipy.special import erfc
+
+# MLE estimates for Cauchy parameters based on historical daily returns
+X0 = 0
+GAMMA = 0.000005
+# Scale decays with time to close as offset ** DECAY
+DECAY = 3 / 5
+
+SQRT2 = math.sqrt(2)
+
+def decayed_gamma(offset, gamma=GAMMA, exponent=DECAY):
+    """
+    Cauchy scale for a given number of seconds until close
+    """
+    return gamma * offset ** exponent
+
+def cauchy_probability(sp_price: float, lower: float, upper: float, gamma: float, x0: float = X0) -> float:
+    """
+    Probability of closing in [lower, upper] under a Cauchy(x0, gamma) model of returns
+    """
+    upper_z = ((upper - sp_price) / sp_price - x0) / gamma
+    lower_z = ((lower - sp_price) / sp_price - x0) / gamma
+    return (math.atan(upper_z) - math.atan(lower_z)) / math.pi
+
+def normal_probability(sp_price: float, lower: float, upper: float, sigma: float, mu: float = 0) -> float:
+    """
+    Probability of closing in [lower, upper] under a Normal(mu, sigma) model of returns
+    """
+    upper_z = ((upper - sp_price) / sp_price - mu) / (sigma * SQRT2)
+    lower_z = ((lower - sp_price) / sp_price - mu) / (sigma * SQRT2)
+    return 0.5 * (math.erfc(-upper_z) - math.erfc(-lower_z))
+
+def fair_value(sp_price: float, offset: float, lower: float, upper: float,
+               gamma: float = GAMMA, x0: float = X0, exponent: float = DECAY) -> float:
+    """
+    Cauchy bracket probability for an S&P 500 price with offset seconds until close
+    """
+    return cauchy_probability(sp_price, lower, upper, decayed_gamma(offset, gamma, exponent), x0)
+
+def cauchy_probability_array(sp_price, lower, upper, gamma, x0=X0) -> np.ndarray:
+    """
+    Vectorized cauchy_probability; all arguments broadcast against each other
+    """
+    sp_price = np.asarray(sp_price, dtype=np.float64)
+    upper_z = ((upper - sp_price) / sp_price - x0) / gamma
+    lower_z = ((lower - sp_price) / sp_price - x0) / gamma
+    return (np.arctan(upper_z) - np.arctan(lower_z)) / np.pi
+
+def normal_probability_array(sp_price, lower, upper, sigma, mu=0) -> np.ndarray:
+    """
+    Vectorized normal_probability; all arguments broadcast against each other
+    """
+    sp_price = np.asarray(sp_price, dtype=np.float64)
+    scale = np.asarray(sigma, dtype=np.float64) * SQRT2
+    upper_z = ((upper - sp_price) / sp_price - mu) / scale
+    lower_z = ((lower - sp_price) / sp_price - mu) / scale
+    return 0.5 * (erfc(-upper_z) - erfc(-lower_z))
+
+def fair_value_array(sp_price, offset, lower, upper, gamma=GAMMA, x0=X0, exponent=DECAY) -> np.ndarray:
+    """
+    Vectorized fair_value over arrays of S&P 500 prices and seconds until close
+    """
+    offset = np.asarray(offset, dtype=np.float64)
+    return cauchy_probability_array(sp_price, lower, upper, decayed_gamma(offset, gamma, exponent), x0)
@@ -1,125 +1,439 @@
 import dateparser
 import pandas as pd
 import json
+import math
+import argparse
+import csv
+import heapq
+import os
+import pickle
+import tempfile
+import time
+from collections import deque
+from operator import itemgetter
+from datetime import datetime, timezone
 
 """
-Parse historical data from the PostgreSQL database into a csv file that can be used to simulate trading. 
+Parse historical data from the PostgreSQL database into a csv file that can be used to simulate trading.
+
+The raw kalshi.csv and sp.csv dumps are read in chunks and every message is decoded exactly once. Output is
+grouped by trading day and market, so one invocation can convert several days/markets at once. Rows are spooled
+to disk as they are produced and merged into the output files at the end, so memory does not grow with the dump.
 """
 
+COLUMNS = ['Time','Competitor','Operation','OrderId','Instrument','Side','Volume','Price','Lifespan','Fee']
+# Rows a spooled stream may be out of time order by and still be written in order
+REORDER_WINDOW = 10000
+# Rows a spool keeps in memory before appending them to its file
+SPOOL_BATCH = 10000
+
+# Parse date, fast path for ISO-8601 timestamps, dateparser is only used for odd formats
+def parseDate(date) -> datetime:
+    try:
+        return datetime.fromisoformat(date)
+    except ValueError:
+        return dateparser.parse(date)
+
 # Convert date to unix timestamp
 def convertDate(date) -> float:
-    return dateparser.parse(date).timestamp()
+    return parseDate(date).timestamp()
+
+# UTC trading day of a timestamp, used to group output files
+def tradingDay(date: datetime) -> str:
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc)
+    return date.strftime("%Y-%m-%d")
+
+def readMessages(fileName: str, chunkSize: int, columns, replacements):
+    """
+    Yield the given columns plus the cleaned message for every row of a dump, reading chunkSize rows at a time
+    """
+    for chunk in pd.read_csv(fileName, chunksize=chunkSize):
+        messages = chunk['message']
+        for old, new in replacements:
+            messages = messages.str.replace(old, new, regex=False)
+        yield from zip(*[chunk[column].tolist() for column in columns], messages.tolist())
 
 """
 Step 1: Group delta messages into fills or cancellations
-Approach: 
-1. Iterate through trades to make an ordered list of all trades; store quantity, taker side, timestamp and taker price
-2. Iterate through deltas. If delta is negative, check if quantity matches next trade and timestamp is equal to.
-3. If so, set fill to true.
+Approach:
+1. Index trades by (timestamp, quantity, maker side, maker price); the maker side is the opposite of the
+   taker side and the maker price is the complement of the taker price.
+2. For every negative delta, look up the buckets within the tolerance window and take the nearest
+   unconsumed trade (earliest first on ties). Each lookup is O(1).
+3. If one is found, the delta is a fill, otherwise it is a cancel.
+
+A trade can be recorded slightly after the delta it belongs to, so negative deltas wait until the input has
+moved lookahead seconds past them before they are matched. Trades older than the tolerance window are expired.
+"""
+class Trade():
+
+    def __init__(self, ts: int, key) -> None:
+        self.ts = ts
+        self.key = key
+        self.consumed = False
+
+class FillMatcher():
+
+    def __init__(self, tolerance: int = 1, lookahead: float = 2) -> None:
+        self.tolerance = tolerance
+        self.lookahead = lookahead
+
+        # (ts, quantity, side, price) -> unconsumed trades in arrival order
+        self.index = {}
+        # All live trades in arrival order, used to expire old ones
+        self.trades = deque()
+        # Snapshots and deltas waiting to be classified: (timestamp, epoch, data)
+        self.pending = deque()
+        self.latest = float("-inf")
+
+        # Match statistics
+        self.totalTrades = 0
+        self.fills = 0
+        self.cancels = 0
+        self.unmatchedTrades = 0
+
+    def addTrade(self, epoch: float, msg) -> None:
+        self.latest = max(self.latest, epoch)
+        side = msg['taker_side']
+        taker_price = msg['no_price'] if side == 'no' else msg['yes_price']
+
+        # Key the trade the way the resting (maker) delta will look it up
+        makerSide = 'yes' if side == 'no' else 'no'
+        key = (msg['ts'], msg['count'], makerSide, 100 - taker_price)
+        trade = Trade(msg['ts'], key)
+        self.index.setdefault(key, deque()).append(trade)
+        self.trades.append(trade)
+        self.totalTrades += 1
+
+    def addMessage(self, timestamp: str, epoch: float, data) -> None:
+        self.latest = max(self.latest, epoch)
+        self.pending.append((timestamp, epoch, data))
+
+    def expire(self, ts: int) -> None:
+        # Trades this far behind can no longer match any delta
+        while self.trades and self.trades[0].ts < ts - self.tolerance:
+            trade = self.trades.popleft()
+            if trade.consumed:
+                continue
+            self.unmatchedTrades += 1
+            bucket = self.index[trade.key]
+            bucket.popleft()
+            if not bucket:
+                del self.index[trade.key]
+
+    def match(self, ts: int, quantity: int, side: str, price: int) -> bool:
+        # Nearest bucket first: ts, ts - 1, ts + 1, ts - 2, ...
+        for distance in range(self.tolerance + 1):
+            for bucketTs in ((ts,) if distance == 0 else (ts - distance, ts + distance)):
+                key = (bucketTs, quantity, side, price)
+                bucket = self.index.get(key)
+                if bucket:
+                    trade = bucket.popleft()
+                    trade.consumed = True
+                    if not bucket:
+                        del self.index[key]
+                    return True
+        return False
+
+    def resolve(self, final: bool = False):
+        """
+        Yield (timestamp, epoch, data, fill) for every pending message that can be classified
+        """
+        while self.pending:
+            timestamp, epoch, data = self.pending[0]
+            fill = False
+
+            if data['type'] == 'orderbook_delta' and data['msg']['delta'] < 0:
+                # A later trade may still match this delta
+                if not final and self.latest < epoch + self.lookahead:
+                    return
+
+                msg = data['msg']
+                ts = int(epoch)
+                self.expire(ts)
+                fill = self.match(ts, -msg['delta'], msg['side'], msg['price'])
+                if fill:
+                    self.fills += 1
+                else:
+                    self.cancels += 1
+
+            self.pending.popleft()
+            yield timestamp, epoch, data, fill
+
+        if final:
+            # Anything left over was never matched
+            self.unmatchedTrades += sum(not trade.consumed for trade in self.trades)
+            self.trades.clear()
+            self.index.clear()
+
+    def summary(self) -> str:
+        matched = self.fills / self.totalTrades if self.totalTrades > 0 else 0
+        return f"{self.fills} fills, {self.cancels} cancels, {self.unmatchedTrades} unmatched trades ({matched:.1%} of {self.totalTrades} trades matched)"
+
+"""
+Step 2: Parse message and make structured rows of market events
+"""
+class Spool():
+    """
+    Rows of one stream (a market's events or a day's S&P 500 prices) written to disk in batches as they are
+    produced, and read back in time order. Inputs are already (nearly) in time order, so a bounded reorder buffer
+    is enough; rows that arrive more than REORDER_WINDOW rows late are written where they are and counted in late.
+    """
+
+    def __init__(self, fileName: str) -> None:
+        self.fileName = fileName
+        self.batch = []
+        self.rows = 0
+        self.late = 0
+
+    def add(self, epoch: float, row) -> None:
+        self.batch.append((epoch, row))
+        self.rows += 1
+        if len(self.batch) >= SPOOL_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.batch:
+            with open(self.fileName, 'ab') as f:
+                pickle.dump(self.batch, f, pickle.HIGHEST_PROTOCOL)
+            self.batch = []
+
+    def batches(self):
+        self.flush()
+        if self.rows == 0:
+            return
+        with open(self.fileName, 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def read(self, instrument: int = None, window: int = REORDER_WINDOW):
+        """
+        Yield (epoch, row) in time order, ties in the order they were added. instrument overrides the rows' instrument.
+        Each batch is sorted together with the last window rows of the one before, which are held back in case
+        later rows belong ahead of them.
+        """
+        held = []
+        last = float("-inf")
+        for batch in self.batches():
+            if instrument is not None:
+                for _, row in batch:
+                    row[4] = instrument
+            rows = held + batch
+            # Stable and linear on nearly sorted rows
+            rows.sort(key=itemgetter(0))
+            cut = max(len(rows) - window, 0)
+            ready, held = rows[:cut], rows[cut:]
+            if ready:
+                self.countLate(ready, last)
+                last = max(last, ready[-1][0])
+                yield from ready
+        if held:
+            self.countLate(held, last)
+            yield from held
+
+    def countLate(self, rows, last: float) -> None:
+        # Sorted rows ahead of the last one already written
+        late = 0
+        while late < len(rows) and rows[late][0] < last:
+            late += 1
+        self.late += late
+
+class EventWriter():
+
+    def __init__(self, spool: Spool) -> None:
+        self.orderId = 0
+        # Rows of one day/market
+        self.spool = spool
+
+    def addKalshi(self, timestamp: str, epoch: float, data, fill: bool) -> None:
+        msg = data['msg']
+        if data["type"] == "orderbook_snapshot":
+
+            for order in msg["yes"]:
+                self.spool.add(epoch, [timestamp, "", "Insert", self.orderId, 1, "B", order[1], order[0] * 100.0, "G", 0])
+                self.orderId += 1
+
+            for order in msg["no"]:
+                self.spool.add(epoch, [timestamp, "", "Insert", self.orderId, 1, "A", order[1], (100 - order[0]) * 100.0, "G", 0])
+                self.orderId += 1
+
+        elif data['type'] == 'orderbook_delta':
+            side = msg["side"]
+            delta = msg["delta"]
+            price = msg["price"]
+
+            if side == "yes":
+                if delta > 0:
+                    newRow = [timestamp, "", "Insert", self.orderId, 1, "B", delta, price * 100.0, "G", 0]
+                elif fill:
+                    newRow = [timestamp, "", "Insert", self.orderId, 1, "A", -delta, price * 100.0, "G", 0]
+                else:
+                    newRow = [timestamp, "", "Cancel", self.orderId, 1, "B", -delta, price * 100.0, "G", 0]
+            else:
+                if delta > 0:
+                    newRow = [timestamp, "", "Insert", self.orderId, 1, "A", delta, (100 - price) * 100.0, "G", 0]
+                elif fill:
+                    newRow = [timestamp, "", "Insert", self.orderId, 1, "B", -delta, (100 - price) * 100.0, "G", 0]
+                else:
+                    # Implicit cancel
+                    newRow = [timestamp, "", "Cancel", self.orderId, 1, "A", -delta, (100 - price) * 100.0, "G", 0]
+            self.spool.add(epoch, newRow)
+            self.orderId += 1
+
+    def write(self, fileName: str, spSpool: Spool) -> int:
+        return writeRows(fileName, [self.spool.read(), spSpool.read()])
+
+def writeRows(fileName: str, streams) -> int:
+    # Merge time ordered streams of Kalshi events and S&P 500 events. Ties go to the earlier stream,
+    # so Kalshi events stay ahead of S&P 500 ticks.
+    rows = 0
+    with open(fileName, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for _, row in heapq.merge(*streams, key=itemgetter(0)):
+            writer.writerow(row)
+            rows += 1
+    return rows
+
 """
+Whole events: every bracket market of a day's event (e.g. INXD-23APR10-B4075, INXD-23APR10-B4125, ...) in
+one file, bracket i as instrument i in strike order, so the simulator can replay them all in one pass.
+"""
+def eventTicker(ticker: str) -> str:
+    return ticker.rsplit('-', 1)[0]
+
+def eventBrackets(tickers, width: int):
+    """
+    (lower, upper) of every market of an event, None for the open end of a tail. B<strike> brackets are
+    width wide around the strike; T<strike> tails lie below the lowest or above the highest bracket.
+    """
+    strikes = {ticker: float(ticker.rsplit('-', 1)[1][1:]) for ticker in tickers}
+    centers = [strike for ticker, strike in strikes.items() if ticker.rsplit('-', 1)[1].startswith('B')]
+    bounds = {}
+    for ticker, strike in strikes.items():
+        if ticker.rsplit('-', 1)[1].startswith('B'):
+            bounds[ticker] = (strike - width / 2, strike + width / 2)
+        elif centers and strike < min(centers):
+            bounds[ticker] = (None, min(centers) - width / 2)
+        elif centers:
+            bounds[ticker] = (max(centers) + width / 2, None)
+        else:
+            raise ValueError(f"Cannot place tail market {ticker} without any bracket markets in its event")
+    return bounds
 
-# Read in data
-df = pd.read_csv("kalshi.csv")
-df['message'] = df['message'].str.replace("'", '\"')
-
-trades = []
-
-# Make list of trades 
-for index, row in df.iterrows():
-    data = json.loads(row['message'])
-    if data['type'] == 'trade':
-        timestamp = data['msg']['ts']
-        side = data['msg']['taker_side']
-        quantity = data['msg']['count']
-        taker_price = data['msg']['no_price'] if side == 'no' else data['msg']['yes_price']
-        trades.append((timestamp, side, quantity, taker_price))
-
-print(trades[0])
-df_fills = pd.DataFrame(columns=['timestamp', 'ticker', 'message', 'fill'])
-
-count = 0
-
-# Create dataframe of all trades 
-for index, row in df.iterrows():
-    data = json.loads(row['message'])
-    if data['type'] == 'orderbook_delta':
-        timestamp = row['timestamp']
-        ts = int(convertDate(timestamp))
-        ticker = row['market_ticker']
-        side = data['msg']['side']
-        quantity = data['msg']['delta']
-        price = data['msg']['price']
-        if (quantity < 0) and count < len(trades) and (-quantity == trades[count][2]) and (abs(ts - trades[count][0]) <= 1) and side != trades[count][1] and price == (100 - trades[count][3]): 
-            count += 1
-            print(count)
-            df_fills = pd.concat([df_fills, pd.DataFrame({'timestamp': timestamp, 'ticker': ticker, 'message': json.dumps(data), 'fill': True}, index=[0])], ignore_index=True)
+def writeEvent(fileName: str, bracketsFile: str, writers, spSpool: Spool, width: int) -> int:
+    """
+    Write the markets of one event (ticker -> EventWriter) as instruments 1..N plus their brackets file
+    """
+    bounds = eventBrackets(writers, width)
+    tickers = sorted(writers, key=lambda ticker: -math.inf if bounds[ticker][0] is None else bounds[ticker][0])
+    streams = []
+    brackets = []
+    for instrument, ticker in enumerate(tickers, start=1):
+        streams.append(writers[ticker].spool.read(instrument))
+        lower, upper = bounds[ticker]
+        brackets.append({"instrument": instrument, "ticker": ticker, "lower": lower, "upper": upper})
+
+    with open(bracketsFile, 'w') as f:
+        json.dump({"width": width, "brackets": brackets}, f, indent=4)
+    return writeRows(fileName, streams + [spSpool.read()])
+
+def convert(kalshiFiles, spFiles, outDir: str, chunkSize: int, markets=None, tolerance: int = 1, lookahead: float = 2,
+            events: bool = False, width: int = 50) -> None:
+    start = time.perf_counter()
+    inputRows = 0
+    os.makedirs(outDir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=outDir) as spoolDir:
+        matchers = {}
+        writers = {}
+
+        # Kalshi order book messages, trades are only used to classify negative deltas
+        for fileName in kalshiFiles:
+            for timestamp, ticker, message in readMessages(fileName, chunkSize, ['timestamp', 'market_ticker'], [("'", '"')]):
+                inputRows += 1
+                if markets is not None and ticker not in markets:
+                    continue
+
+                data = json.loads(message)
+                if data['type'] not in ('trade', 'orderbook_delta', 'orderbook_snapshot'):
+                    continue
+
+                date = parseDate(timestamp)
+                key = (tradingDay(date), ticker)
+                if key not in matchers:
+                    matchers[key] = FillMatcher(tolerance, lookahead)
+                    writers[key] = EventWriter(Spool(os.path.join(spoolDir, f"kalshi-{len(writers)}.spool")))
+                matcher = matchers[key]
+
+                if data['type'] == 'trade':
+                    matcher.addTrade(date.timestamp(), data['msg'])
+                else:
+                    matcher.addMessage(timestamp, date.timestamp(), data)
+
+                for resolved in matcher.resolve():
+                    writers[key].addKalshi(*resolved)
+
+        for key, matcher in matchers.items():
+            for timestamp, epoch, data, fill in matcher.resolve(final=True):
+                writers[key].addKalshi(timestamp, epoch, data, fill)
+
+        # Read in S&P 500
+        spSpools = {}
+        for fileName in spFiles:
+            for timestamp, message in readMessages(fileName, chunkSize, ['timestamp'], [("'", '"'), ("True", '"True"'), ("False", '"false"')]):
+                inputRows += 1
+                data = json.loads(message)
+                price = data['$SPX.X']['lastPrice']
+                date = parseDate(timestamp)
+                day = tradingDay(date)
+                if day not in spSpools:
+                    spSpools[day] = Spool(os.path.join(spoolDir, f"sp-{day}.spool"))
+                spSpools[day].add(date.timestamp(), [timestamp, "", "", "", 0, "", "", price, "", ""])
+        noPrices = Spool(os.devnull)
+
+        outputRows = 0
+        if events:
+            # One file per day and event with every bracket market in it
+            grouped = {}
+            for day, ticker in writers:
+                grouped.setdefault((day, eventTicker(ticker)), {})[ticker] = writers[(day, ticker)]
+            for (day, event), eventWriters in sorted(grouped.items()):
+                fileName = os.path.join(outDir, f"{day}-{event}-combined.csv")
+                bracketsFile = os.path.join(outDir, f"{day}-{event}-brackets.json")
+                outputRows += writeEvent(fileName, bracketsFile, eventWriters, spSpools.get(day, noPrices), width)
+                for ticker in sorted(eventWriters):
+                    print(f"{fileName} {ticker}: {matchers[(day, ticker)].summary()}")
         else:
-            df_fills = pd.concat([df_fills, pd.DataFrame({'timestamp': timestamp, 'ticker': ticker, 'message': json.dumps(data), 'fill': False}, index=[0])], ignore_index=True)
-            if (quantity < 0) and count >= len(trades): 
-                print("burn")
-    elif data['type'] == 'orderbook_snapshot': 
-        df_fills = pd.concat([df_fills, pd.DataFrame({'timestamp': row['timestamp'], 'ticker': row['market_ticker'], 'message': json.dumps(data), 'fill': False}, index=[0])], ignore_index=True)
-
-events = pd.DataFrame(columns=['Time','Competitor','Operation','OrderId','Instrument','Side','Volume','Price','Lifespan','Fee'])
-orderId = 0
-# Parse message and make structured Dataframe of market events 
-for index, row in df_fills.iterrows():
-    print(index)
-    newRow = []
-    data = json.loads(row['message'])
-    msg = data['msg']
-    if data["type"] == "orderbook_snapshot": 
-
-        for order in msg["yes"]: 
-            newRow = [row['timestamp'], "", "Insert", orderId, 1, "B", order[1], order[0] * 100, "G", 0]
-            events.loc[len(events)] = newRow
-            orderId += 1
-        
-        for order in msg["no"]:
-            newRow = [row['timestamp'], "", "Insert", orderId, 1, "A", order[1], (100 - order[0]) * 100, "G", 0]
-            events.loc[len(events)] = newRow
-            orderId += 1
-        
-    elif data['type'] == 'orderbook_delta': 
-        side = msg["side"]
-        delta = msg["delta"]
-        price = msg["price"]
-
-        if side == "yes": 
-            if delta > 0: 
-                newRow = [row['timestamp'], "", "Insert", orderId, 1, "B", delta, price * 100, "G", 0]
-            elif row['fill'] == True:
-                newRow = [row['timestamp'], "", "Insert", orderId, 1, "A", -delta, price * 100, "G", 0]
-            else: 
-                newRow = [row['timestamp'], "", "Cancel", orderId, 1, "B", -delta, price * 100, "G", 0]
-        else: 
-            if delta > 0: 
-                newRow = [row['timestamp'], "", "Insert", orderId, 1, "A", delta, (100 - price) * 100, "G", 0]
-            elif row['fill'] == True: 
-                newRow = [row['timestamp'], "", "Insert", orderId, 1, "B", -delta, (100 - price) * 100, "G", 0]
-            else: 
-                # Implicit cancel
-                newRow = [row['timestamp'], "", "Cancel", orderId, 1, "A", -delta, (100 - price) * 100, "G", 0]
-        events.loc[len(events)] = newRow
-        orderId += 1
-        
-# Read in S&P 500 
-df_sp = pd.read_csv("sp.csv")
-df_sp['message'] = df_sp['message'].str.replace("'", '\"')
-df_sp['message'] = df_sp['message'].str.replace("True", '\"True\"')
-df_sp['message'] = df_sp['message'].str.replace("False", '\"false\"')
-
-sp_events = pd.DataFrame(columns=['Time','Competitor','Operation','OrderId','Instrument','Side','Volume','Price','Lifespan','Fee'])
-
-# Parse message and make structured Dataframe of market events
-for index, row in df_sp.iterrows():
-    newRow = []
-    data = json.loads(row['message'])
-    price = data['$SPX.X']['lastPrice']
-    newRow = [row['timestamp'], "", "", "", 0, "", "", price, "", ""]
-    sp_events.loc[len(sp_events)] = newRow
-
-# Combine Kalshi events and S&P 500 events
-df_combined = pd.concat([events, sp_events], ignore_index=True)
-df_combined = df_combined.sort_values(by=['Time'])
-df_combined.to_csv('combined.csv', index=False)
\ No newline at end of file
+            for key in sorted(writers):
+                day, ticker = key
+                fileName = os.path.join(outDir, "combined.csv" if len(writers) == 1 else f"{day}-{ticker}-combined.csv")
+                outputRows += writers[key].write(fileName, spSpools.get(day, noPrices))
+                print(f"{fileName}: {matchers[key].summary()}")
+
+        late = sum(spool.late for spool in [writer.spool for writer in writers.values()] + list(spSpools.values()))
+        if late:
+            print(f"Warning: {late} rows were more than {REORDER_WINDOW} rows out of time order and are written out of order")
+
+    elapsed = time.perf_counter() - start
+    print(f"Converted {inputRows} rows into {outputRows} events in {elapsed:.2f}s ({inputRows / elapsed:.0f} rows/sec)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert Kalshi and S&P 500 database dumps into combined simulator csv files")
+    parser.add_argument("--kalshi", nargs="+", default=["kalshi.csv"], help="Kalshi websocket message dumps")
+    parser.add_argument("--sp", nargs="+", default=["sp.csv"], help="S&P 500 quote dumps")
+    parser.add_argument("--out", default=".", help="Output directory, one file per day and market")
+    parser.add_argument("--markets", nargs="+", default=None, help="Only convert these market tickers")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Rows read from each dump at a time")
+    parser.add_argument("--tolerance", type=int, default=1, help="Max seconds between a trade and the delta it fills")
+    parser.add_argument("--lookahead", type=float, default=2, help="Seconds to wait for a late trade before labelling a delta")
+    parser.add_argument("--events", action="store_true", help="Write every bracket of an event into one file (for eventsim.py) instead of one file per market")
+    parser.add_argument("--width", type=int, default=50, help="Bracket width of the event markets, used with --events")
+    args = parser.parse_args()
+
+    convert(args.kalshi, args.sp, args.out, args.chunksize, None if args.markets is None else set(args.markets), args.tolerance, args.lookahead,
+            args.events, args.width)
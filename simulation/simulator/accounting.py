@@ -0,0 +1,153 @@
+"""
+Inventory and PnL accounting for one binary market. Buying yes at p cents costs p, selling yes at p is
+buying no at 100 - p, and at settlement every yes contract pays $1 if the market resolves YES and every
+no contract pays $1 otherwise.
+
+Ledger keeps the cost basis in integer cents and updates both settlement scenarios on every fill, so
+reading the PnL on an S&P 500 tick is O(1) and exact. pnlCurve rebuilds the same numbers for a whole fill
+log in one NumPy pass. EventLedger combines the ledgers of every bracket of an event, of which exactly one
+(or none, if the close falls outside all of them) settles YES.
+"""
+from array import array
+import numpy as np
+import pandas as pd
+
+class Ledger():
+
+    def __init__(self) -> None:
+        # Contracts held and what they cost, in cents
+        self.yes: int = 0
+        self.no: int = 0
+        self.yesCost: int = 0
+        self.noCost: int = 0
+
+        # PnL in dollars if the market settles YES / NO
+        self.settleYes: float = 0
+        self.settleNo: float = 0
+
+        # Fill log: time, +1 for bought (bid filled) / -1 for sold (ask filled), quantity, price in cents
+        self.times = array("d")
+        self.sides = array("b")
+        self.quantities = array("q")
+        self.prices = array("q")
+
+    @property
+    def position(self) -> int:
+        return self.yes - self.no
+
+    def fill(self, bought: bool, quantity: int, price: int, time: float = 0) -> None:
+        if bought:
+            self.yes += quantity
+            self.yesCost += quantity * price
+        else:
+            self.no += quantity
+            self.noCost += quantity * (100 - price)
+
+        cost = self.yesCost + self.noCost
+        self.settleYes = (100 * self.yes - cost) / 100
+        self.settleNo = (100 * self.no - cost) / 100
+
+        self.times.append(time)
+        self.sides.append(1 if bought else -1)
+        self.quantities.append(quantity)
+        self.prices.append(price)
+
+    def pnl(self, yesResolution: bool) -> float:
+        return self.settleYes if yesResolution else self.settleNo
+
+    def markToMarket(self, price: float) -> float:
+        """
+        PnL with yes contracts valued at price cents and no contracts at 100 - price (e.g. the mid)
+        """
+        return (self.yes * price + self.no * (100 - price) - self.yesCost - self.noCost) / 100
+
+    def markToFair(self, probability: float) -> float:
+        # Mark at the model's probability of a YES resolution
+        return self.markToMarket(100 * probability)
+
+    def realized(self) -> float:
+        """
+        Locked-in PnL of the offsetting yes/no pairs (each pays $1 whatever happens), at average cost
+        """
+        pairs = min(self.yes, self.no)
+        if pairs == 0:
+            return 0.0
+        return pairs * (100 - self.yesCost / self.yes - self.noCost / self.no) / 100
+
+    def fillLog(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "time": np.frombuffer(self.times, dtype=np.float64),
+            "side": np.frombuffer(self.sides, dtype=np.int8),
+            "quantity": np.frombuffer(self.quantities, dtype=np.int64),
+            "price": np.frombuffer(self.prices, dtype=np.int64),
+        })
+
+class EventLedger():
+
+    def __init__(self, ledgers) -> None:
+        # Ledger of every bracket by instrument
+        self.ledgers = ledgers
+
+    def positions(self):
+        return {instrument: ledger.position for instrument, ledger in self.ledgers.items()}
+
+    def pnl(self, winner: int = None) -> float:
+        """
+        Event PnL if the bracket winner settles YES and every other bracket NO
+        """
+        pnl = sum(ledger.settleNo for ledger in self.ledgers.values())
+        if winner is not None:
+            ledger = self.ledgers[winner]
+            pnl += ledger.settleYes - ledger.settleNo
+        return pnl
+
+    def outcomes(self):
+        # Event PnL for each bracket the close could land in
+        allNo = self.pnl()
+        return {instrument: allNo + ledger.settleYes - ledger.settleNo for instrument, ledger in self.ledgers.items()}
+
+    def worstCase(self) -> float:
+        # Lowest event PnL over the brackets the close could land in
+        return min(self.outcomes().values(), default=0.0)
+
+    def markToMarket(self, mids) -> float:
+        # Every bracket marked at its mid in cents, brackets without a mid at their settlement value if NO
+        return sum(ledger.markToMarket(mids[instrument]) if mids.get(instrument) is not None else ledger.settleNo
+                   for instrument, ledger in self.ledgers.items())
+
+def pnlCurve(fills: pd.DataFrame, times: np.ndarray = None, marks: np.ndarray = None) -> pd.DataFrame:
+    """
+    Position and PnL after every fill of a fill log (Ledger.fillLog()), or as of each of times if given.
+    marks (cents, same length as the output) adds a mark-to-market column, e.g. the mid at each time.
+    """
+    bought = fills["side"].to_numpy() > 0
+    quantity = fills["quantity"].to_numpy(dtype=np.int64)
+    price = fills["price"].to_numpy(dtype=np.int64)
+    fillTimes = fills["time"].to_numpy(dtype=np.float64)
+
+    yes = np.cumsum(np.where(bought, quantity, 0))
+    no = np.cumsum(np.where(bought, 0, quantity))
+    cost = np.cumsum(np.where(bought, quantity * price, quantity * (100 - price)))
+
+    if times is not None:
+        # As-of lookup: the last fill at or before each time, nothing held before the first fill
+        last = np.searchsorted(fillTimes, times, side="right") - 1
+        held = last >= 0
+        last = np.maximum(last, 0)
+        yes = np.where(held, yes[last] if len(yes) else 0, 0)
+        no = np.where(held, no[last] if len(no) else 0, 0)
+        cost = np.where(held, cost[last] if len(cost) else 0, 0)
+        fillTimes = np.asarray(times, dtype=np.float64)
+
+    curve = pd.DataFrame({
+        "time": fillTimes,
+        "position": yes - no,
+        "yes": yes,
+        "no": no,
+        "settleYes": (100 * yes - cost) / 100,
+        "settleNo": (100 * no - cost) / 100,
+    })
+    if marks is not None:
+        marks = np.asarray(marks, dtype=np.float64)
+        curve["markToMarket"] = (yes * marks + no * (100 - marks) - cost) / 100
+    return curve
@@ -0,0 +1,236 @@
+"""
+Benchmark suite on synthetic market data (see synthetic.py) at a multiple of recorded volume:
+
+    parse       raw dump rows/sec through parse.py
+    load        combined csv rows/sec into MarketData
+    orderbook   OrderBook insert/cancel/match ops/sec, and the same stream through TradingState's FIFO queues
+    simulator   replayed events/sec of the default strategy
+    strategy    latency per strategy callback
+    livebot     market_bot message handling latency (market_bot/bench_messages.py, in its own process)
+
+Every run appends one JSON line (machine, git commit, settings, results) to --out and is compared with the
+last run at the same scale in that file.
+
+Example: python bench.py --scale 10 --only simulator strategy
+"""
+from state import TradingState
+from strategy import Strategy
+from simulator import Simulator
+from marketdata import loadMarketData, INSTRUMENT_KALSHI, OP_INSERT, SIDE_BID, SIDE_NAMES
+from orderbook import OrderBook
+from bench_orderbook import replay
+from synthetic import SyntheticDay, writeCombined, writeDumps
+from datetime import datetime, timezone
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+SIMULATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MARKET_BOT_DIR = os.path.join(SIMULATION_DIR, "..", "market_bot")
+sys.path.append(SIMULATION_DIR)
+import parse
+
+BENCHMARKS = ("parse", "load", "orderbook", "simulator", "strategy", "livebot")
+
+def benchParse(day: SyntheticDay, directory: str) -> dict:
+    rows = writeDumps(day, os.path.join(directory, "raw"))
+    start = time.perf_counter()
+    # parse.py reports as it goes, keep that out of the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        parse.convert([os.path.join(directory, "raw", "kalshi.csv")], [os.path.join(directory, "raw", "sp.csv")],
+                      os.path.join(directory, "parsed"), 100000)
+    elapsed = time.perf_counter() - start
+    return {"rows": rows, "seconds": round(elapsed, 3), "rows_per_sec": round(rows / elapsed)}
+
+def benchLoad(fileName: str) -> dict:
+    start = time.perf_counter()
+    data = loadMarketData(fileName)
+    elapsed = time.perf_counter() - start
+    return {"rows": len(data), "seconds": round(elapsed, 3), "rows_per_sec": round(len(data) / elapsed)}
+
+def benchOrderbook(data) -> dict:
+    kalshi = np.asarray(data.instrument) == INSTRUMENT_KALSHI
+    sides = data.side[kalshi].tolist()
+    prices = data.price[kalshi].tolist()
+    volumes = data.volume[kalshi].tolist()
+    operations = data.operation[kalshi].tolist()
+    ops = [("bids" if side == SIDE_BID else "asks", price, volume, operation == OP_INSERT)
+           for side, price, volume, operation in zip(sides, prices, volumes, operations)]
+
+    start = time.perf_counter()
+    replay(OrderBook(), ops)
+    book = time.perf_counter() - start
+
+    # Same stream through the simulator's state, which also keeps the FIFO queue of every level
+    state = TradingState(0)
+    start = time.perf_counter()
+    for side, price, volume, operation in zip(sides, prices, volumes, operations):
+        state.updateOrderbook(SIDE_NAMES[side], price, volume, "Insert" if operation == OP_INSERT else "Cancel")
+    queued = time.perf_counter() - start
+
+    return {
+        "ops": len(ops),
+        "book_ops_per_sec": round(len(ops) / book),
+        "state_ops_per_sec": round(len(ops) / queued),
+    }
+
+def replayDay(day: SyntheticDay, data, strategyWrapper=None):
+    state = TradingState(day.sod)
+    strategy = Strategy(state, day.lower, day.upper, day.eod)
+    if strategyWrapper is not None:
+        strategyWrapper(strategy)
+    simulator = Simulator("synthetic", state, strategy, (day.lower, day.upper), eventsFile=os.devnull, data=data)
+    simulator.simulate()
+    return simulator, state
+
+def benchSimulator(day: SyntheticDay, data) -> dict:
+    simulator, state = replayDay(day, data)
+    timer = simulator.timer
+    return {
+        "events": simulator.replayed,
+        "seconds": round(simulator.elapsed, 3),
+        "events_per_sec": round(simulator.replayed / simulator.elapsed),
+        "fills": state.fills,
+        "phase_seconds": {phase: round(seconds, 3) for phase, seconds in timer.seconds.items() if timer.calls[phase]},
+    }
+
+def benchStrategy(day: SyntheticDay, data) -> dict:
+    timings = {"spUpdate": [], "kalshiUpdate": []}
+
+    def timed(strategy: Strategy) -> None:
+        # Wrap both callbacks to time every call
+        for name, samples in timings.items():
+            callback = getattr(strategy, name)
+            def wrapper(callback=callback, samples=samples):
+                t0 = time.perf_counter()
+                callback()
+                samples.append(time.perf_counter() - t0)
+            setattr(strategy, name, wrapper)
+
+    replayDay(day, data, timed)
+    results = {}
+    for name, samples in timings.items():
+        us = 1e6 * np.asarray(samples)
+        results[name] = {
+            "calls": len(samples),
+            "p50_us": round(float(np.percentile(us, 50)), 2),
+            "p90_us": round(float(np.percentile(us, 90)), 2),
+            "p99_us": round(float(np.percentile(us, 99)), 2),
+            "max_us": round(float(us.max()), 2),
+        }
+    return results
+
+def benchLivebot(messages: int) -> dict:
+    # market_bot's modules share names with the simulator's, so it runs in its own interpreter
+    result = subprocess.run([sys.executable, "bench_messages.py", str(messages), "--json"], cwd=MARKET_BOT_DIR,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit code {result.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def gitCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SIMULATION_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def headline(name: str, result: dict):
+    # The one number per benchmark that is compared between runs (higher is better for rates)
+    if "error" in result:
+        return None
+    if name in ("parse", "load"):
+        return "rows_per_sec", result["rows_per_sec"]
+    if name == "orderbook":
+        return "state_ops_per_sec", result["state_ops_per_sec"]
+    if name == "simulator":
+        return "events_per_sec", result["events_per_sec"]
+    if name == "strategy":
+        return "spUpdate p50_us", result["spUpdate"]["p50_us"]
+    return "message_to_order p50_us", result["message_to_order"]["p50_us"]
+
+def previousRun(fileName: str, scale: float):
+    if not os.path.exists(fileName):
+        return None
+    previous = None
+    with open(fileName) as f:
+        for line in f:
+            if line.strip():
+                run = json.loads(line)
+                if run.get("scale") == scale:
+                    previous = run
+    return previous
+
+def runBenchmarks(scale: float, seed: int, only, messages: int) -> dict:
+    results = {}
+    started = time.perf_counter()
+    day = SyntheticDay("2023-04-10", scale, seed)
+    generated = time.perf_counter() - started
+    print(f"Generated {len(day)} synthetic events ({scale:g}x recorded volume) in {generated:.2f}s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        fileName = os.path.join(directory, "synthetic-combined.csv")
+        writeCombined(day, fileName)
+        data = loadMarketData(fileName)
+
+        for name in only:
+            start = time.perf_counter()
+            if name == "parse":
+                results[name] = benchParse(day, directory)
+            elif name == "load":
+                results[name] = benchLoad(fileName)
+            elif name == "orderbook":
+                results[name] = benchOrderbook(data)
+            elif name == "simulator":
+                results[name] = benchSimulator(day, data)
+            elif name == "strategy":
+                results[name] = benchStrategy(day, data)
+            elif name == "livebot":
+                results[name] = benchLivebot(messages)
+            print(f"  {name:<10} done in {time.perf_counter() - start:.2f}s")
+
+    return {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": gitCommit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "scale": scale,
+        "seed": seed,
+        "events": len(day),
+        "results": results,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parsing, replay, order book, strategy and live bot on synthetic data")
+    parser.add_argument("--scale", type=float, default=10, help="Multiple of a recorded day's volume")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--messages", type=int, default=20000, help="Messages for the live bot benchmark")
+    parser.add_argument("--out", default="bench-results.jsonl", help="Append the run to this JSON lines file")
+    args = parser.parse_args()
+
+    previous = previousRun(args.out, args.scale)
+    run = runBenchmarks(args.scale, args.seed, args.only, args.messages)
+    with open(args.out, "a") as f:
+        f.write(json.dumps(run) + "\n")
+
+    print(f"Results appended to {args.out}" + (f", compared with {previous['commit']} ({previous['time']})" if previous else ""))
+    for name, result in run["results"].items():
+        if "error" in result:
+            print(f"  {name:<10} skipped: {result['error']}")
+            continue
+        metric, value = headline(name, result)
+        change = ""
+        before = previous["results"].get(name) if previous else None
+        if before is not None and headline(name, before) is not None:
+            old = headline(name, before)[1]
+            change = f"  ({value / old:.2f}x previous)" if old else ""
+        print(f"  {name:<10} {metric:<24} {value:>14,}{change}")
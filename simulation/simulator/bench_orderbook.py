@@ -0,0 +1,111 @@
+"""
+Benchmark the array order book against the dict book the simulator used before. Both books replay the
+same stream of inserts, cancels and book walks, with a best bid/ask query after every operation (as
+checkFill and the strategy do), and must agree on every quote.
+
+Run from this directory: python bench_orderbook.py [day index or name]
+"""
+from orderbook import OrderBook, SIDES
+from catalog import loadCatalog, findDay
+from marketdata import cachedMarketData, INSTRUMENT_KALSHI, OP_INSERT, SIDE_BID
+import random
+import sys
+import time
+
+class DictOrderBook():
+    """
+    The previous {"bids": {}, "asks": {}} book behind the same interface
+    """
+
+    def __init__(self) -> None:
+        self.orderbook = {side: {} for side in SIDES}
+
+    def contains(self, side: str, price: int) -> bool:
+        return price in self.orderbook[side]
+
+    def get(self, side: str, price: int) -> int:
+        return self.orderbook[side][price]
+
+    def add(self, side: str, price: int, vol: int) -> None:
+        if price in self.orderbook[side]:
+            self.orderbook[side][price] += vol
+        else:
+            self.orderbook[side][price] = vol
+
+    def remove(self, side: str, price: int, vol: int) -> None:
+        self.orderbook[side][price] -= vol
+        if self.orderbook[side][price] == 0:
+            del self.orderbook[side][price]
+
+    def isEmpty(self, side: str) -> bool:
+        return len(self.orderbook[side]) == 0
+
+    def bestBid(self) -> int:
+        return max(self.orderbook["bids"]) if self.orderbook["bids"] else None
+
+    def bestAsk(self) -> int:
+        return min(self.orderbook["asks"]) if self.orderbook["asks"] else None
+
+def replay(book, ops):
+    """
+    Apply (side, price, volume, insert) operations, walking the book when an insert crosses
+    """
+    quotes = []
+    for side, price, vol, insert in ops:
+        if not insert:
+            if book.contains(side, price):
+                book.remove(side, price, min(vol, book.get(side, price)))
+        else:
+            other = "asks" if side == "bids" else "bids"
+            best = book.bestAsk() if side == "bids" else book.bestBid()
+            remVol = vol
+            while remVol > 0 and best is not None and (best <= price if side == "bids" else best >= price):
+                fillVolume = min(remVol, book.get(other, best))
+                book.remove(other, best, fillVolume)
+                remVol -= fillVolume
+                best = book.bestAsk() if side == "bids" else book.bestBid()
+            if remVol > 0:
+                book.add(side, price, remVol)
+        quotes.append((book.bestBid(), book.bestAsk()))
+    return quotes
+
+def recordedOps(day):
+    data = cachedMarketData(day.file)
+    kalshi = data.instrument == INSTRUMENT_KALSHI
+    return [("bids" if side == SIDE_BID else "asks", price, volume, operation == OP_INSERT)
+            for side, price, volume, operation in zip(data.side[kalshi].tolist(), data.price[kalshi].tolist(),
+                                                      data.volume[kalshi].tolist(), data.operation[kalshi].tolist())]
+
+def syntheticOps(n: int, rng: random.Random):
+    # Deep book: resting orders on every price from 1 to 99 with occasional crossing orders
+    ops = []
+    for price in range(1, 50):
+        ops.append(("bids", price, 10, True))
+    for price in range(51, 100):
+        ops.append(("asks", price, 10, True))
+    for _ in range(n):
+        side = rng.choice(SIDES)
+        if rng.random() < 0.5:
+            price = rng.randint(1, 55) if side == "bids" else rng.randint(45, 99)
+            ops.append((side, price, rng.randint(1, 30), True))
+        else:
+            ops.append((side, rng.randint(1, 99), rng.randint(1, 30), False))
+    return ops
+
+def bench(name: str, ops) -> None:
+    timings = {}
+    results = {}
+    for cls in (DictOrderBook, OrderBook):
+        start = time.perf_counter()
+        results[cls] = replay(cls(), ops)
+        timings[cls] = time.perf_counter() - start
+    assert results[DictOrderBook] == results[OrderBook], f"{name}: books disagree"
+
+    print(f"{name}: {len(ops)} ops")
+    for cls, elapsed in timings.items():
+        print(f"  {cls.__name__:<14} {len(ops) / elapsed:>12,.0f} ops/sec")
+
+if __name__ == "__main__":
+    day = findDay(loadCatalog(), sys.argv[1] if len(sys.argv) > 1 else "0")
+    bench(f"Recorded day {day.name}", recordedOps(day))
+    bench("Synthetic deep book", syntheticOps(200000, random.Random(0)))
@@ -0,0 +1,124 @@
+"""
+Fit the fair value model to the recorded days with pricing/calibration.py.
+
+Every S&P 500 tick before the close is an observation, with the Kalshi mid as of that tick from a replay of
+the market's own orders. Observations and per-day fits are cached in each day's market data cache
+directory, so they are rebuilt only when the csv changes. Days are fitted in a process pool; the pooled
+fit over all of them is what --save writes to pricing/fitted_params.json for the strategies to load.
+
+Example: python calibrate.py --loss log_loss --target market --save
+"""
+from marketdata import MarketData, marketDataCache, openMarketData, INSTRUMENT_SP
+from catalog import Day, loadCatalog, findDay
+from screen import DayTape, NEVER
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from pricing.calibration import MODELS, LOSSES, TARGETS, FIELDS, PARAMS_FILE, fit, concat_observations, load_params, save_params
+
+# Bump whenever the observations or the fits change so cached ones are rebuilt
+CALIBRATION_VERSION = 1
+
+def dayObservations(day: Day, data: MarketData):
+    """
+    One observation per S&P 500 tick before the close
+    """
+    tape = DayTape(day, data)
+    ticks = np.flatnonzero((np.asarray(data.instrument) == INSTRUMENT_SP) & (tape.seconds < day.eod))
+    n = len(ticks)
+    sp = tape.spPrice[ticks]
+
+    bid, ask = tape.bestBid[ticks], tape.bestAsk[ticks]
+    twoSided = (bid != NEVER) & (ask != -NEVER)
+    market = np.where(twoSided, (bid + ask) / 200, np.nan)
+
+    return {
+        "sp_price": sp,
+        "offset": day.eod - tape.seconds[ticks],
+        "lower": np.full(n, day.min, dtype=np.float64),
+        "upper": np.full(n, day.max, dtype=np.float64),
+        "close": np.full(n, np.asarray(data.spPrice)[ticks[-1]] if n else np.nan),
+        "resolved": np.full(n, tape.resolvesYes),
+        "market": market,
+    }
+
+def cachedObservations(day: Day, cacheDir: str):
+    path = os.path.join(cacheDir, f"observations-v{CALIBRATION_VERSION}.npz")
+    if not os.path.exists(path):
+        obs = dayObservations(day, openMarketData(cacheDir))
+        # Written under a scratch name first so a half-written file is never picked up
+        scratch = f"{path}.{os.getpid()}.npz"
+        np.savez(scratch, **obs)
+        os.replace(scratch, path)
+    with np.load(path) as f:
+        return {field: f[field] for field in FIELDS}
+
+def cachedFit(day: Day, cacheDir: str, obs, model: str, kind: str, target: str) -> dict:
+    path = os.path.join(cacheDir, f"fit-{model}-{kind}-{target}-v{CALIBRATION_VERSION}.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    result = fit(obs, model, kind, target)
+    scratch = f"{path}.{os.getpid()}"
+    with open(scratch, "w") as f:
+        json.dump(result, f)
+    os.replace(scratch, path)
+    return result
+
+def fitDay(day: Day, cacheDir: str, kind: str, target: str):
+    """
+    Observations of a day and its fit of every model, from the cache when possible
+    """
+    obs = cachedObservations(day, cacheDir)
+    fits = [{"day": day.name, **cachedFit(day, cacheDir, obs, model, kind, target)} for model in MODELS]
+    return obs, fits
+
+def calibrate(days, kind: str = "mle", target: str = "settlement", workers: int = None):
+    """
+    Per-day fits of every model, in parallel, and the pooled fit over all days. Returns
+    (fits DataFrame, fitted parameters)
+    """
+    cacheDirs = {day.name: marketDataCache(day.file) for day in days}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(fitDay, days, [cacheDirs[day.name] for day in days], [kind] * len(days), [target] * len(days)))
+
+    fits = [dayFit for _, dayFits in results for dayFit in dayFits]
+    pooled = concat_observations(obs for obs, _ in results)
+    params = {**load_params(), "loss": kind, "target": target, "days": [day.name for day in days]}
+    for model in MODELS:
+        result = fit(pooled, model, kind, target)
+        fits.append({"day": "all", **result})
+        params.update({name: result[name] for name in ("gamma", "exponent", "sigma") if name in result})
+    return pd.DataFrame(fits), params
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the fair value model to recorded days")
+    parser.add_argument("--days", nargs="+", default=None, help="Catalog indices or names of the days to fit (default: all)")
+    parser.add_argument("--loss", choices=LOSSES, default="mle")
+    parser.add_argument("--target", choices=TARGETS, default="settlement", help="Fit to the realized settlement or the market mid")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--save", action="store_true", help=f"Write the pooled fit to {os.path.relpath(PARAMS_FILE)}")
+    args = parser.parse_args()
+
+    if args.loss == "mle" and args.target != "settlement":
+        parser.error("mle fits the settlement price, use --loss brier or log_loss with --target market")
+
+    catalog = loadCatalog()
+    try:
+        days = catalog if args.days is None else [findDay(catalog, key) for key in args.days]
+    except KeyError as e:
+        print(e.args[0])
+        exit()
+
+    start = time.perf_counter()
+    fits, params = calibrate(days, args.loss, args.target, args.workers)
+    print(f"Fitted {len(days)} days in {time.perf_counter() - start:.2f}s")
+    print(fits.to_string(index=False))
+
+    if args.save:
+        save_params(params)
+        print(f"Saved {', '.join(f'{name}={params[name]:.6g}' for name in ('gamma', 'exponent', 'x0', 'sigma'))} to {PARAMS_FILE}")
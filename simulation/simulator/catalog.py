@@ -0,0 +1,152 @@
+"""
+Catalog of recorded trading days. Every *-combined.csv file in the data directory is a day; its session
+open/close and bracket bounds are derived from the file and can be overridden in catalog.json:
+
+{
+    "width": 50,
+    "days": {"apr-10": {"min": 4050, "max": 4100}}
+}
+
+Adding a new trading day only means dropping its combined csv (and any overrides) into the directory.
+
+Whole-event files written by parse.py --events hold every bracket of the day as instruments 1..N and come
+with a <name>-brackets.json listing each instrument's ticker and bounds (null for an open tail):
+
+{
+    "width": 50,
+    "brackets": [{"instrument": 1, "ticker": "INXD-23APR10-B4075", "lower": 4050, "upper": 4100}, ...]
+}
+"""
+import csv
+import glob
+import json
+import math
+import os
+from datetime import datetime, time
+from zoneinfo import ZoneInfo
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+CATALOG_FILE = "catalog.json"
+SUFFIX = "-combined.csv"
+BRACKETS_SUFFIX = "-brackets.json"
+
+# Bracket width of the S&P 500 markets (changed from 50 to 25 after the April 2023 recordings)
+DEFAULT_WIDTH = 50
+EXCHANGE_TZ = ZoneInfo("America/New_York")
+SESSION_OPEN = time(9, 30)
+SESSION_CLOSE = time(16, 0)
+
+class Bracket():
+
+    def __init__(self, instrument: int, ticker: str, lower: float, upper: float) -> None:
+        # Instrument code of the bracket in the combined csv
+        self.instrument = instrument
+        self.ticker = ticker
+        # Settles YES if the close is in [lower, upper), -inf/inf for the tails
+        self.lower = lower
+        self.upper = upper
+
+    def __repr__(self) -> str:
+        return f"Bracket({self.instrument}, {self.ticker}, {self.lower}-{self.upper})"
+
+class Day():
+
+    def __init__(self, name: str, file: str, date: str, min: float, max: float, width: int, sod: int, eod: int, brackets=None) -> None:
+        self.name = name
+        self.file = file
+        self.date = date
+        # Bracket bounds and width
+        self.min = min
+        self.max = max
+        self.width = width
+        # Session open and close as unix timestamps
+        self.sod = sod
+        self.eod = eod
+        # Every bracket of the event for whole-event files, None for single-market files
+        self.brackets = brackets
+
+    def __repr__(self) -> str:
+        return f"Day({self.name}, {self.date}, {self.min}-{self.max})"
+
+def bracketBounds(price: float, width: int):
+    # The bracket containing the opening S&P 500 price
+    lower = int(price / width) * width
+    return lower, lower + width
+
+def loadBrackets(fileName: str):
+    """
+    Brackets of a whole-event brackets.json, by instrument
+    """
+    with open(fileName) as f:
+        spec = json.load(f)
+    brackets = []
+    for bracket in spec["brackets"]:
+        lower = -math.inf if bracket["lower"] is None else bracket["lower"]
+        upper = math.inf if bracket["upper"] is None else bracket["upper"]
+        brackets.append(Bracket(bracket["instrument"], bracket["ticker"], lower, upper))
+    return sorted(brackets, key=lambda bracket: bracket.instrument)
+
+def sessionBounds(date: str):
+    day = datetime.strptime(date, "%Y-%m-%d").date()
+    sod = datetime.combine(day, SESSION_OPEN, EXCHANGE_TZ)
+    eod = datetime.combine(day, SESSION_CLOSE, EXCHANGE_TZ)
+    return int(sod.timestamp()), int(eod.timestamp())
+
+def scanFile(fileName: str):
+    """
+    Trading date and first S&P 500 price of a combined csv, reading only as far as needed
+    """
+    date = None
+    with open(fileName, newline="") as f:
+        for row in csv.DictReader(f):
+            if date is None:
+                date = datetime.fromisoformat(row["Time"]).astimezone(EXCHANGE_TZ).strftime("%Y-%m-%d")
+            if row["Instrument"] == "0":
+                return date, float(row["Price"])
+    raise ValueError(f"{fileName} has no S&P 500 prices")
+
+def loadCatalog(directory: str = DATA_DIR):
+    """
+    All recorded days in directory, sorted by date
+    """
+    overrides = {}
+    path = os.path.join(directory, CATALOG_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            overrides = json.load(f)
+    defaultWidth = overrides.get("width", DEFAULT_WIDTH)
+
+    days = []
+    for fileName in glob.glob(os.path.join(directory, "*" + SUFFIX)):
+        name = os.path.basename(fileName)[:-len(SUFFIX)]
+        config = overrides.get("days", {}).get(name, {})
+
+        width = config.get("width", defaultWidth)
+        date, lower, upper = config.get("date"), config.get("min"), config.get("max")
+        if date is None or lower is None or upper is None:
+            scannedDate, price = scanFile(fileName)
+            scannedLower, scannedUpper = bracketBounds(price, width)
+            date = date or scannedDate
+            lower = scannedLower if lower is None else lower
+            upper = scannedUpper if upper is None else upper
+        sod, eod = sessionBounds(date)
+
+        bracketsFile = os.path.join(directory, name + BRACKETS_SUFFIX)
+        brackets = loadBrackets(bracketsFile) if os.path.exists(bracketsFile) else None
+
+        days.append(Day(name, fileName, date, lower, upper, width, config.get("sod", sod), config.get("eod", eod), brackets))
+
+    return sorted(days, key=lambda day: (day.date, day.name))
+
+def findDay(days, key: str) -> Day:
+    """
+    Look a day up by catalog index or name
+    """
+    if key.isdigit():
+        index = int(key)
+        if index < len(days):
+            return days[index]
+    for day in days:
+        if day.name == key or day.date == key:
+            return day
+    raise KeyError(f"Unknown day {key}, expected an index below {len(days)} or one of {', '.join(day.name for day in days)}")
@@ -0,0 +1,156 @@
+"""
+Mid-day checkpoints. A Checkpoint is the full simulator state after some event (book, level queues, bot
+orders, position, yes/no cost basis, PnL, and any latency gateway with its in-flight orders) pickled into
+one bytes blob, so copying it in memory or writing it to disk is cheap.
+
+Strategy variants can then be forked from a checkpoint in parallel, each replaying only the rest of the day.
+
+Example: python checkpoint.py apr-13 --at 14:30 --param skew=5,10,20 --param bidOffset=1,2
+"""
+from state import TradingState
+from strategy import Strategy
+from simulator import Simulator
+from latency import OrderGateway
+from marketdata import MarketData, cachedMarketData, marketDataCache
+from catalog import Day, EXCHANGE_TZ, loadCatalog, findDay
+from sweep import initWorker, workerData, parseParam, gridConfigs
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, time as clock
+import argparse
+import os
+import pickle
+import time
+import numpy as np
+import pandas as pd
+
+class Checkpoint():
+
+    def __init__(self, index: int, source: str, payload: bytes) -> None:
+        # Next event to replay
+        self.index = index
+        # Market data file the checkpoint belongs to
+        self.source = os.path.basename(source)
+        self.payload = payload
+
+    @classmethod
+    def capture(cls, simulator: Simulator, index: int) -> "Checkpoint":
+        # State and gateway are pickled together so the gateway's fill hook stays attached to the state
+        payload = pickle.dumps((simulator.state, simulator.gateway), protocol=pickle.HIGHEST_PROTOCOL)
+        return cls(index, simulator.fileName, payload)
+
+    def restore(self):
+        """
+        Fresh, independent (state, gateway) pair, gateway is None for instant-order runs
+        """
+        return pickle.loads(self.payload)
+
+    def save(self, fileName: str) -> None:
+        with open(fileName, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, fileName: str) -> "Checkpoint":
+        with open(fileName, "rb") as f:
+            return pickle.load(f)
+
+    def __repr__(self) -> str:
+        return f"Checkpoint({self.source}, event {self.index}, {len(self.payload)} bytes)"
+
+def eventIndex(data: MarketData, day: Day, at: str) -> int:
+    """
+    Event index for an event number or an HH:MM[:SS] exchange time (first event at or after that time)
+    """
+    if at.isdigit():
+        return min(int(at), len(data))
+    when = datetime.combine(datetime.strptime(day.date, "%Y-%m-%d").date(), clock.fromisoformat(at), EXCHANGE_TZ)
+    return int(np.searchsorted(data.seconds, when.timestamp(), side="left"))
+
+def checkpointAt(day: Day, index: int, latency: str = None, **params) -> Checkpoint:
+    """
+    Replay day up to (not including) event index with the given strategy and checkpoint it
+    """
+    state = TradingState(day.sod)
+    gateway = OrderGateway(state, latency) if latency is not None else None
+    strategy = Strategy(gateway if gateway is not None else state, day.min, day.max, day.eod, **params)
+    simulator = Simulator(day.file, state, strategy, (day.min, day.max), eventsFile=os.devnull, gateway=gateway)
+    simulator.simulate(stop=index)
+    return Checkpoint.capture(simulator, index)
+
+def runFrom(checkpoint: Checkpoint, day: Day, params, eventsFile: str = os.devnull, data: MarketData = None) -> dict:
+    """
+    Replay the rest of the day from a checkpoint with the given Strategy parameters
+    """
+    start = time.perf_counter()
+    state, gateway = checkpoint.restore()
+    strategy = Strategy(gateway if gateway is not None else state, day.min, day.max, day.eod, **params)
+    simulator = Simulator(day.file, state, strategy, (day.min, day.max), eventsFile=eventsFile, data=data, gateway=gateway)
+    simulator.simulate(start=checkpoint.index)
+
+    return {
+        **params,
+        "pnl": round(state.pnl, 2),
+        "position": state.position,
+        "maxPosition": state.maxPosition,
+        "fills": state.fills,
+        "runtime": round(time.perf_counter() - start, 3),
+    }
+
+def runVariant(configId: int, checkpoint: Checkpoint, day: Day, params) -> dict:
+    return {"config": configId, **runFrom(checkpoint, day, params, data=workerData[day.name])}
+
+def forkVariants(checkpoint: Checkpoint, day: Day, configs, workers: int = None) -> pd.DataFrame:
+    """
+    Replay every configuration from the same checkpoint in a process pool
+    """
+    cacheDirs = {day.name: marketDataCache(day.file)}
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(cacheDirs,)) as pool:
+        futures = [pool.submit(runVariant, configId, checkpoint, day, config) for configId, config in enumerate(configs)]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return pd.DataFrame(results).sort_values("config").reset_index(drop=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checkpoint a day mid-replay and fork strategy variants from it")
+    parser.add_argument("day", help="Catalog index or name of the day")
+    parser.add_argument("--at", default=None, help="Event index or HH:MM[:SS] exchange time to fork at")
+    parser.add_argument("--latency", default=None, help="Order latency of the run up to the checkpoint (kept by the forks)")
+    parser.add_argument("--save", default=None, help="Write the checkpoint to this file")
+    parser.add_argument("--load", default=None, help="Fork from a saved checkpoint instead of replaying up to --at")
+    parser.add_argument("--param", action="append", default=[], help="Strategy parameter grid for the forks, name=a,b,c")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=None, help="Write the fork results to this csv")
+    args = parser.parse_args()
+
+    try:
+        day = findDay(loadCatalog(), args.day)
+    except KeyError as e:
+        print(e.args[0])
+        exit()
+
+    start = time.perf_counter()
+    if args.load is not None:
+        checkpoint = Checkpoint.load(args.load)
+        if checkpoint.source != os.path.basename(day.file):
+            print(f"{args.load} was taken on {checkpoint.source}, not {os.path.basename(day.file)}")
+            exit()
+    elif args.at is not None:
+        checkpoint = checkpointAt(day, eventIndex(cachedMarketData(day.file), day, args.at), args.latency)
+    else:
+        parser.error("one of --at or --load is required")
+    print(f"{checkpoint} ready in {time.perf_counter() - start:.2f}s")
+
+    if args.save is not None:
+        checkpoint.save(args.save)
+
+    params = dict(parseParam(spec) for spec in args.param)
+    if "latency" in params:
+        parser.error("latency is fixed at the checkpoint, fork Strategy parameters only")
+    configs = gridConfigs(params)
+
+    start = time.perf_counter()
+    results = forkVariants(checkpoint, day, configs, args.workers)
+    print(f"Forked {len(results)} variants from event {checkpoint.index} in {time.perf_counter() - start:.2f}s")
+    print(results.sort_values("pnl", ascending=False).to_string(index=False))
+    if args.out is not None:
+        results.to_csv(args.out, index=False)
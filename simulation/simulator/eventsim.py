@@ -0,0 +1,231 @@
+"""
+Whole-event simulation: every bracket of an S&P 500 event replayed in one pass over a file written by
+parse.py --events. Each bracket (instrument 1..N) has its own book, TradingState and Strategy; S&P 500
+ticks are read once and fanned out to every bracket, Kalshi events only touch the bracket they belong to.
+
+The event is settled as a whole: the bracket containing the close settles YES and every other bracket
+NO, so the recorded PnL is the event PnL if the S&P 500 closed at its current price. Mids across brackets
+should sum to about 100; their sum is reported as a check on the data and the books.
+
+Example: python eventsim.py apr-10-INXD-23APR10
+"""
+from state import TradingState
+from strategy import Strategy
+from marketdata import MarketData, cachedMarketData, INSTRUMENT_SP, OP_INSERT, OP_CANCEL, SIDE_NAMES
+from catalog import Day, loadCatalog, findDay
+from recorder import Recorder
+from accounting import EventLedger
+from instrumentation import PhaseTimer, configureLogging, log
+from bisect import bisect_right
+import argparse
+import logging
+import time
+
+class EventSimulator():
+
+    def __init__(self,
+                 day: Day,
+                 params=None,
+                 eventsFile: str = "events.csv",
+                 data: MarketData = None) -> None:
+        if not day.brackets:
+            raise ValueError(f"{day.name} is a single-market day, replay it with Simulator")
+
+        self.day = day
+        self.timer = PhaseTimer()
+        if data is None:
+            start = time.perf_counter()
+            data = cachedMarketData(day.file)
+            self.timer.add("load", time.perf_counter() - start)
+        self.data = data
+        self.eventsFile = eventsFile
+        self.events = Recorder(self.data.timeStr)
+
+        # Per-bracket state and strategy by instrument, all with the same strategy parameters
+        self.brackets = {bracket.instrument: bracket for bracket in day.brackets}
+        self.states = {}
+        self.strategies = {}
+        for bracket in day.brackets:
+            state = TradingState(day.sod)
+            # Same inclusive bounds as the single-market simulator
+            state.min = bracket.lower
+            state.max = bracket.upper - 0.01
+            self.states[bracket.instrument] = state
+            self.strategies[bracket.instrument] = Strategy(state, bracket.lower, bracket.upper, day.eod, **(params or {}))
+        self.ledger = EventLedger({instrument: state.ledger for instrument, state in self.states.items()})
+
+        # Brackets by lower bound, to find the one the S&P 500 is in
+        ordered = sorted(day.brackets, key=lambda bracket: bracket.lower)
+        self.lowers = [bracket.lower for bracket in ordered]
+        self.ordered = ordered
+
+        self.spPrice = None
+        self.pnl = 0.0
+        self.replayed = 0
+        self.elapsed = 0.0
+
+    def winner(self, price: float) -> int:
+        """
+        Instrument of the bracket that settles YES at this S&P 500 price, None if no bracket covers it
+        """
+        i = bisect_right(self.lowers, price) - 1
+        if i >= 0 and price < self.ordered[i].upper:
+            return self.ordered[i].instrument
+        return None
+
+    def mids(self):
+        mids = {}
+        for instrument, state in self.states.items():
+            book = state.book
+            mids[instrument] = None if book.isEmpty("bids") or book.isEmpty("asks") else (book.bestBid() + book.bestAsk()) / 2
+        return mids
+
+    def position(self) -> int:
+        # Net yes contracts over all brackets
+        return sum(state.position for state in self.states.values())
+
+    def simulate(self) -> None:
+        data = self.data
+        seconds = data.seconds.tolist()
+        instruments = data.instrument.tolist()
+        sides = data.side.tolist()
+        operations = data.operation.tolist()
+        volumes = data.volume.tolist()
+        prices = data.price.tolist()
+        spPrices = data.spPrice.tolist()
+        groupEnds = data.groupEnd.tolist()
+
+        states = self.states
+        strategies = list(self.strategies.values())
+        allStates = list(states.values())
+        ledger = self.ledger
+        winner = None
+        # Brackets with market events in the current same-timestamp group, updated once the group is complete
+        touched = {}
+
+        perf = time.perf_counter
+        bookTime = strategyTime = recordTime = 0.0
+        bookCalls = strategyCalls = recordCalls = 0
+        began = perf()
+
+        for index in range(len(data)):
+            instrument = instruments[index]
+            now = seconds[index]
+
+            if instrument == INSTRUMENT_SP:
+                price = spPrices[index]
+                self.spPrice = price
+                winner = self.winner(price)
+                for state in allStates:
+                    state.time = now
+                    state.updateSP(price)
+
+                pnl = ledger.pnl(winner)
+                if pnl != self.pnl:
+                    t0 = perf()
+                    self.pnl = pnl
+                    self.events.record(index, round(pnl, 2), self.position(), round(pnl, 2), price)
+                    recordTime += perf() - t0
+                    recordCalls += 1
+                    log.debug("Event PnL update. Current PnL: %s", pnl)
+
+                t0 = perf()
+                for strategy in strategies:
+                    strategy.spUpdate()
+                strategyTime += perf() - t0
+                strategyCalls += len(strategies)
+                # Every bracket has just been requoted, including any touched earlier in this group
+                if groupEnds[index]:
+                    touched.clear()
+            else:
+                state = states.get(instrument)
+                if state is not None:
+                    t0 = perf()
+                    state.time = now
+                    operation = operations[index]
+                    if operation == OP_INSERT:
+                        state.updateOrderbook(SIDE_NAMES[sides[index]], prices[index], volumes[index], "Insert")
+                    elif operation == OP_CANCEL:
+                        state.updateOrderbook(SIDE_NAMES[sides[index]], prices[index], volumes[index], "Cancel")
+                    bookTime += perf() - t0
+                    bookCalls += 1
+                    touched[instrument] = True
+
+                # Only act once all events sharing this timestamp have been applied
+                if not groupEnds[index] or not touched:
+                    continue
+
+                t0 = perf()
+                self.pnl = ledger.pnl(winner)
+                self.events.record(index, round(self.pnl, 2), self.position(), round(self.pnl, 2), -1 if self.spPrice is None else self.spPrice)
+                recordTime += perf() - t0
+                recordCalls += 1
+
+                t0 = perf()
+                for updated in touched:
+                    self.strategies[updated].kalshiUpdate()
+                strategyTime += perf() - t0
+                strategyCalls += len(touched)
+                touched.clear()
+
+        self.replayed += len(data)
+        self.elapsed += perf() - began
+        self.timer.add("book", bookTime, bookCalls)
+        self.timer.add("strategy", strategyTime, strategyCalls)
+        self.timer.add("recording", recordTime, recordCalls)
+        self.settle()
+
+    def settle(self) -> None:
+        winner = None if self.spPrice is None else self.winner(self.spPrice)
+        self.pnl = self.ledger.pnl(winner)
+        mids = self.mids()
+
+        log.info(f"Event complete with the S&P 500 at {self.spPrice}, {'no bracket' if winner is None else self.brackets[winner].ticker} settles YES")
+        for instrument, bracket in self.brackets.items():
+            state = self.states[instrument]
+            mid = "-" if mids[instrument] is None else f"{mids[instrument]:.1f}"
+            log.info(f"  {bracket.ticker:<24} {bracket.lower:>8}-{bracket.upper:<8} mid {mid:>5}  position {state.position:>4}  "
+                     f"fills {state.fills:>5}  PnL {state.ledger.pnl(instrument == winner):>8.2f}")
+        quoted = [mid for mid in mids.values() if mid is not None]
+        log.info(f"Mids sum to {sum(quoted):.1f} over {len(quoted)} of {len(mids)} brackets")
+        log.info(f"Event PnL: ${self.pnl:.2f}, worst case over brackets: ${self.ledger.worstCase():.2f}, "
+                 f"mark to market: ${self.ledger.markToMarket(mids):.2f}")
+
+        t0 = time.perf_counter()
+        self.events.save(self.eventsFile)
+        self.timer.add("recording", time.perf_counter() - t0, 0)
+        self.elapsed += time.perf_counter() - t0
+        log.info(self.timer.summary(self.replayed, self.elapsed))
+
+def runEvent(day: Day, eventsFile: str = "events.csv", params=None) -> dict:
+    start = time.perf_counter()
+    simulator = EventSimulator(day, params, eventsFile)
+    simulator.simulate()
+    states = simulator.states.values()
+    return {
+        "day": day.name,
+        "date": day.date,
+        "pnl": round(simulator.pnl, 2),
+        "position": simulator.position(),
+        "maxPosition": max(state.maxPosition for state in states),
+        "fills": sum(state.fills for state in states),
+        "runtime": round(time.perf_counter() - start, 2),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay every bracket of a whole-event day in one pass")
+    parser.add_argument("day", help="Catalog index or name of a day converted with parse.py --events")
+    parser.add_argument("--out", default="events.csv")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Report every fill and PnL change")
+    args = parser.parse_args()
+
+    configureLogging(logging.DEBUG if args.verbose else logging.INFO)
+    try:
+        day = findDay(loadCatalog(), args.day)
+    except KeyError as e:
+        print(e.args[0])
+        exit()
+    if not day.brackets:
+        print(f"{day.name} has no brackets file, convert it with parse.py --events")
+        exit()
+    runEvent(day, args.out)
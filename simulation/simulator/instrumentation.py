@@ -0,0 +1,163 @@
+"""
+Reporting and instrumentation for the simulator.
+
+All simulator output goes through the "simulator" logger, which is silent (WARNING) until a caller asks
+for more, so batch runs and sweep workers print nothing. main.py turns on INFO (run summary, settlement)
+by default and DEBUG (every fill and PnL change) with -v.
+
+PhaseTimer accumulates where replay time goes, and profiled() wraps a run in cProfile or a signal-based
+sampling profiler.
+"""
+import cProfile
+import contextlib
+import io
+import logging
+import os
+import pstats
+import signal
+import sys
+from collections import Counter
+
+log = logging.getLogger("simulator")
+log.setLevel(logging.WARNING)
+log.propagate = False
+log.addHandler(logging.NullHandler())
+
+def configureLogging(level: int = logging.INFO) -> None:
+    """
+    Send simulator output to stdout as plain messages at the given level
+    """
+    if not any(isinstance(handler, logging.StreamHandler) for handler in log.handlers):
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+    log.setLevel(level)
+
+@contextlib.contextmanager
+def logLevel(level: int):
+    previous = log.level
+    log.setLevel(level)
+    try:
+        yield
+    finally:
+        log.setLevel(previous)
+
+# Replay phases, in the order they are reported
+PHASES = ("load", "book", "matching", "strategy", "orders", "recording")
+
+class PhaseTimer():
+    """
+    Seconds and calls per replay phase:
+        load       reading the market data
+        book       market inserts and cancels that rest or leave the book
+        matching   market inserts that cross the book and walk it
+        strategy   strategy callbacks, including any orders they place
+        orders     delayed order traffic released by the latency gateway
+        recording  recording and writing results
+    """
+
+    def __init__(self) -> None:
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+
+    def add(self, phase: str, seconds: float, calls: int = 1) -> None:
+        self.seconds[phase] += seconds
+        self.calls[phase] += calls
+
+    def summary(self, events: int, elapsed: float) -> str:
+        lines = [f"Replayed {events} events in {elapsed:.2f}s ({events / elapsed:.0f} events/sec)"]
+        # Everything measured is inside the replay loop except load
+        other = elapsed - sum(seconds for phase, seconds in self.seconds.items() if phase != "load")
+        for phase in PHASES + ("other",):
+            seconds = other if phase == "other" else self.seconds[phase]
+            calls = 0 if phase == "other" else self.calls[phase]
+            if phase != "other" and calls == 0:
+                continue
+            share = f"{100 * seconds / elapsed:5.1f}%" if phase != "load" else "     -"
+            perCall = ""
+            if calls:
+                us = 1e6 * seconds / calls
+                perCall = f"{us:8.2f}us/call" if us < 1000 else f"{us / 1000:8.2f}ms/call"
+            lines.append(f"  {phase:<10} {seconds:8.3f}s {share} {calls:>10} {perCall}")
+        return "\n".join(lines)
+
+class SamplingProfiler():
+    """
+    Statistical profiler: a profiling timer signal samples the running stack every interval seconds of CPU
+    time. Unix only, and only samples the main thread.
+    """
+
+    def __init__(self, interval: float = 0.001) -> None:
+        self.interval = interval
+        self.samples = 0
+        # Samples where the function was running (self) or anywhere on the stack (total)
+        self.own = Counter()
+        self.total = Counter()
+
+    def sample(self, signum, frame) -> None:
+        self.samples += 1
+        seen = set()
+        leaf = True
+        while frame is not None:
+            code = frame.f_code
+            key = f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+            if leaf:
+                self.own[key] += 1
+                leaf = False
+            if key not in seen:
+                self.total[key] += 1
+                seen.add(key)
+            frame = frame.f_back
+
+    def start(self) -> None:
+        signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def report(self, limit: int = 25) -> str:
+        lines = [f"{self.samples} samples every {self.interval * 1000:g}ms", f"{'self':>7} {'total':>7}  function"]
+        for key, count in self.own.most_common(limit):
+            lines.append(f"{100 * count / self.samples:6.1f}% {100 * self.total[key] / self.samples:6.1f}%  {key}")
+        return "\n".join(lines)
+
+PROFILERS = ("cprofile", "sample")
+
+@contextlib.contextmanager
+def profiled(kind: str = None, outFile: str = None, limit: int = 25):
+    """
+    Run the body under a profiler and print its report. kind is None (no profiling), "cprofile" or
+    "sample"; cProfile stats are also dumped to outFile if given (open with pstats or snakeviz).
+    """
+    if kind is None:
+        yield
+        return
+
+    if kind == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            if outFile is not None:
+                profiler.dump_stats(outFile)
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+            print(stream.getvalue())
+    elif kind == "sample":
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            report = profiler.report(limit)
+            if outFile is not None:
+                with open(outFile, "w") as f:
+                    f.write(report + "\n")
+            print(report)
+    else:
+        raise ValueError(f"Unknown profiler {kind}, expected one of {', '.join(PROFILERS)}")
@@ -0,0 +1,221 @@
+"""
+Latency-aware order routing for the simulator. Without it the strategy's orders reach TradingState the
+instant it decides on them. With an OrderGateway in between, order traffic is scheduled on a heap of
+timed events that the simulator merges with the recorded market events:
+
+    decision --cancel latency--> stale orders cancelled --order latency--> new orders rest
+    fill at the exchange --fill latency--> strategy sees its new position
+
+Like OrderManager.place_order, a side has at most one requote in flight (cancel round trip, then place
+round trip). Quotes decided while one is in flight are conflated and only the latest is sent once it lands.
+
+Latencies are given in milliseconds as a spec string:
+    25                  constant
+    uniform:10:40       uniform between 10 and 40
+    lognormal:25:0.5    lognormal with median 25 and log-space sigma 0.5
+    empirical:12,15,40  drawn from recorded samples
+"""
+import heapq
+import itertools
+import math
+import random
+
+class Constant():
+
+    def __init__(self, ms: float) -> None:
+        self.ms = ms
+
+    def sample(self, rng: random.Random) -> float:
+        return self.ms / 1000
+
+    def __repr__(self) -> str:
+        return f"{self.ms:g}"
+
+class Uniform():
+
+    def __init__(self, lo: float, hi: float) -> None:
+        self.lo = lo
+        self.hi = hi
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.uniform(self.lo, self.hi) / 1000
+
+    def __repr__(self) -> str:
+        return f"uniform:{self.lo:g}:{self.hi:g}"
+
+class LogNormal():
+
+    def __init__(self, median: float, sigma: float) -> None:
+        self.median = median
+        self.sigma = sigma
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.lognormvariate(math.log(self.median), self.sigma) / 1000
+
+    def __repr__(self) -> str:
+        return f"lognormal:{self.median:g}:{self.sigma:g}"
+
+class Empirical():
+
+    def __init__(self, samples) -> None:
+        self.samples = list(samples)
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.choice(self.samples) / 1000
+
+    def __repr__(self) -> str:
+        return "empirical:" + ",".join(f"{ms:g}" for ms in self.samples)
+
+def parseLatency(spec):
+    """
+    Latency distribution from a spec string (see module docstring), numbers are taken as constant milliseconds
+    """
+    if isinstance(spec, (int, float)):
+        return Constant(float(spec))
+    kind, _, args = str(spec).partition(":")
+    try:
+        if not args:
+            return Constant(float(kind))
+        if kind == "uniform":
+            lo, hi = args.split(":")
+            return Uniform(float(lo), float(hi))
+        if kind == "lognormal":
+            median, sigma = args.split(":")
+            return LogNormal(float(median), float(sigma))
+        if kind == "empirical":
+            return Empirical(float(ms) for ms in args.split(","))
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency {spec}, expected ms, uniform:lo:hi, lognormal:median:sigma or empirical:a,b,c")
+
+class EventQueue():
+    """
+    Min-heap of timed callbacks. Events at the same time run in the order they were scheduled.
+    """
+
+    def __init__(self) -> None:
+        self.heap = []
+        self.counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def schedule(self, time: float, action, *args) -> None:
+        heapq.heappush(self.heap, (time, next(self.counter), action, args))
+
+    def nextTime(self) -> float:
+        return self.heap[0][0] if self.heap else math.inf
+
+    def pop(self):
+        time, _, action, args = heapq.heappop(self.heap)
+        return time, action, args
+
+class OrderGateway():
+    """
+    Stands in for TradingState on the strategy side. Reads go through to the state, except position, which
+    only moves when a fill notification arrives; order calls are scheduled instead of applied.
+    """
+
+    def __init__(self, state, orderLatency, cancelLatency=None, fillLatency=None, seed: int = 0) -> None:
+        self.state = state
+        self.orderLatency = parseLatency(orderLatency)
+        self.cancelLatency = self.orderLatency if cancelLatency is None else parseLatency(cancelLatency)
+        self.fillLatency = self.orderLatency if fillLatency is None else parseLatency(fillLatency)
+        self.rng = random.Random(seed)
+        self.queue = EventQueue()
+
+        # Position as known to the strategy
+        self.position = state.position
+        state.onFill = self.onFill
+
+        # Per side: whether a requote is in flight, and the latest quotes waiting behind it
+        self.inFlight = {"B": False, "A": False}
+        self.pending = {"B": None, "A": None}
+
+        self.requotes = 0
+        self.conflated = 0
+        # Decision to orders resting, in seconds
+        self.requoteTimes = []
+
+    def __getattr__(self, name):
+        if name == "state":
+            raise AttributeError(name)
+        return getattr(self.state, name)
+
+    def runUntil(self, time: float) -> None:
+        """
+        Apply every scheduled event up to and including time, with the state clock at each event's time
+        """
+        while self.queue.nextTime() <= time:
+            eventTime, action, args = self.queue.pop()
+            self.state.time = eventTime
+            action(*args)
+
+    def setQuotes(self, side, quotes) -> None:
+        quotes = [(price, quantity) for price, quantity in quotes if quantity > 0]
+        if self.inFlight[side]:
+            if self.pending[side] is not None:
+                self.conflated += 1
+            self.pending[side] = quotes
+            return
+        self.send(side, quotes)
+
+    def insertOrder(self, side, price, quantity) -> None:
+        self.setQuotes(side, [(price, quantity)])
+
+    def cancelOrder(self, side) -> None:
+        self.setQuotes(side, [])
+
+    def send(self, side, quotes) -> None:
+        resting = [(order.price, order.quantity) for order in self.state.getOrders(side)]
+        if sorted(resting) == sorted(quotes):
+            return
+
+        self.inFlight[side] = True
+        self.requotes += 1
+        decided = self.state.time
+        if self.stale(side, quotes):
+            self.queue.schedule(decided + self.cancelLatency.sample(self.rng), self.cancelStale, side, quotes, decided)
+        else:
+            self.queue.schedule(decided + self.orderLatency.sample(self.rng), self.place, side, quotes, decided)
+
+    def stale(self, side, quotes):
+        # Resting orders the new quotes do not keep
+        wanted = list(quotes)
+        stale = []
+        for order in self.state.getOrders(side):
+            if (order.price, order.quantity) in wanted:
+                wanted.remove((order.price, order.quantity))
+            else:
+                stale.append(order)
+        return stale
+
+    def cancelStale(self, side, quotes, decided: float) -> None:
+        for order in self.stale(side, quotes):
+            self.state.cancelOrderId(order.id)
+        self.queue.schedule(self.state.time + self.orderLatency.sample(self.rng), self.place, side, quotes, decided)
+
+    def place(self, side, quotes, decided: float) -> None:
+        # Anything filled or changed since the cancel landed is reconciled here
+        self.state.setQuotes(side, quotes)
+        self.requoteTimes.append(self.state.time - decided)
+        self.inFlight[side] = False
+
+        if self.pending[side] is not None:
+            quotes, self.pending[side] = self.pending[side], None
+            self.send(side, quotes)
+
+    def onFill(self, side: str, quantity: int, price: int) -> None:
+        change = quantity if side == "bids" else -quantity
+        self.queue.schedule(self.state.time + self.fillLatency.sample(self.rng), self.notifyFill, change)
+
+    def notifyFill(self, change: int) -> None:
+        self.position += change
+
+    def summary(self) -> str:
+        times = sorted(self.requoteTimes)
+        if not times:
+            return f"{self.requotes} requotes"
+        median = times[len(times) // 2] * 1000
+        p99 = times[min(len(times) - 1, int(len(times) * 0.99))] * 1000
+        return f"{self.requotes} requotes ({self.conflated} conflated), decision to resting: median {median:.1f}ms, p99 {p99:.1f}ms"
@@ -1,23 +1,89 @@
 from state import TradingState
 from strategy import Strategy
 from simulator import Simulator
-import sys
+from eventsim import runEvent
+from catalog import Day, loadCatalog, findDay
+from latency import OrderGateway
+from instrumentation import configureLogging, logLevel, profiled, PROFILERS
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import logging
+import time
+
+def runDay(day: Day, eventsFile: str = "events.csv", quiet: bool = False, latency: str = None) -> dict:
+    if day.brackets:
+        # Whole-event days replay every bracket in one pass
+        if latency is not None:
+            raise ValueError(f"{day.name} is a whole-event day, latency is only modelled for single markets")
+        if quiet:
+            with logLevel(logging.WARNING):
+                return runEvent(day, eventsFile)
+        return runEvent(day, eventsFile)
+
+    start = time.perf_counter()
+    state = TradingState(day.sod)
+    # Orders act instantly unless a latency (ms or distribution spec, see latency.py) is given
+    gateway = OrderGateway(state, latency) if latency is not None else None
+    strategy = Strategy(gateway if gateway is not None else state, day.min, day.max, day.eod)
+    simulator = Simulator(day.file, state, strategy, (day.min, day.max), eventsFile=eventsFile, gateway=gateway)
+
+    if quiet:
+        with logLevel(logging.WARNING):
+            simulator.simulate()
+    else:
+        simulator.simulate()
+
+    return {
+        "day": day.name,
+        "date": day.date,
+        "pnl": round(state.pnl, 2),
+        "position": state.position,
+        "maxPosition": state.maxPosition,
+        "fills": state.fills,
+        "runtime": round(time.perf_counter() - start, 2),
+    }
+
+def runAll(days, workers: int = None, latency: str = None) -> None:
+    """
+    Replay every catalogued day concurrently, one events-<day>.csv per day
+    """
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(runDay, days, [f"events-{day.name}.csv" for day in days], [True] * len(days), [latency] * len(days)))
+
+    for result in results:
+        print(f"{result['date']} ({result['day']}): PnL {result['pnl']:>8.2f}, position {result['position']:>4}, max position {result['maxPosition']:>3}, {result['fills']} fills, {result['runtime']}s")
+    print(f"Total PnL over {len(results)} days: {sum(result['pnl'] for result in results):.2f} ({time.perf_counter() - start:.1f}s)")
 
 if __name__ == "__main__":
 
-    # Get index from command line
-    index = int(sys.argv[1])
-    if index < 0 or index > 2: 
-        print("Invalid index, please enter 0 (Apr 10), 1 (Apr 13), or 2 (Apr 14))")
+    days = loadCatalog()
+
+    parser = argparse.ArgumentParser(description="Replay a recorded day (or all of them) through the strategy",
+                                     epilog=f"Days: {', '.join(f'{i} ({day.name})' for i, day in enumerate(days))}")
+    parser.add_argument("day", help="Catalog index or name of the day, or run-all to replay every day across all cores")
+    parser.add_argument("workers", nargs="?", type=int, default=None, help="Worker processes for run-all")
+    parser.add_argument("--latency", default=None, help="Order/cancel/fill latency in ms, or uniform:lo:hi, lognormal:median:sigma, empirical:a,b,c")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Report every fill and PnL change")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only report warnings and errors")
+    parser.add_argument("--profile", choices=PROFILERS, default=None, help="Profile the replay with cProfile or the sampling profiler")
+    parser.add_argument("--profile-out", default=None, help="Also write the profile to this file")
+    args = parser.parse_args()
+
+    configureLogging(logging.WARNING if args.quiet else logging.DEBUG if args.verbose else logging.INFO)
+
+    # Replay every day across all cores
+    if args.day == "run-all":
+        with profiled(args.profile, args.profile_out):
+            runAll(days, args.workers, args.latency)
         exit()
 
-    MIN = [4050, 4100, 4100] 
-    MAX = [4100, 4150, 4150]
-    EOD = [1681156800, 1681416000, 1681502400] 
-    SOD = [1681133400, 1681392600, 1681479000]
-    FILE = ["../data/apr-10-combined.csv", "../data/apr-13-combined.csv", "../data/apr-14-combined.csv"]
+    # Get day from command line
+    try:
+        day = findDay(days, args.day)
+    except KeyError as e:
+        print(e.args[0])
+        exit()
 
-    state = TradingState(SOD[index])
-    strategy = Strategy(state, MIN[index], MAX[index], EOD[index])
-    simulator = Simulator(FILE[index], state, strategy)
-    simulator.simulate()
\ No newline at end of file
+    with profiled(args.profile, args.profile_out):
+        runDay(day, latency=args.latency)
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+import dateparser
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+
+# Columns written by saveMarketData, timestamps are stored as fixed-width bytes so they can be memory-mapped
+COLUMNS = ["time", "timeStr", "instrument", "side", "operation", "volume", "price", "spPrice"]
+# Derived columns, also saved so opening a cached day does not allocate them again
+DERIVED = ["seconds", "groupEnd"]
+
+# Converted days are cached next to their csv, one directory per source file hash. Bump the version
+# whenever the cached format or the conversion changes.
+CACHE_DIR = ".cache"
+CACHE_VERSION = 2
+
+# Integer codes used for the categorical columns of the combined csv
+INSTRUMENT_SP = 0
+INSTRUMENT_KALSHI = 1
+# Whole-event files number their brackets 1..N, single-market files only use INSTRUMENT_KALSHI
+
+SIDE_NONE = 0
+SIDE_BID = 1
+SIDE_ASK = 2
+SIDE_CODES = {"B": SIDE_BID, "A": SIDE_ASK}
+SIDE_NAMES = {SIDE_BID: "B", SIDE_ASK: "A"}
+
+OP_NONE = 0
+OP_INSERT = 1
+OP_CANCEL = 2
+OP_CODES = {"Insert": OP_INSERT, "Cancel": OP_CANCEL}
+OP_NAMES = {OP_INSERT: "Insert", OP_CANCEL: "Cancel"}
+
+class MarketData():
+    """
+    Columnar view of a combined market data csv. The csv is converted once into typed NumPy arrays
+    so the simulator never touches the DataFrame while replaying.
+    """
+
+    def __init__(self,
+                 time: np.ndarray,
+                 timeStr: np.ndarray,
+                 instrument: np.ndarray,
+                 side: np.ndarray,
+                 operation: np.ndarray,
+                 volume: np.ndarray,
+                 price: np.ndarray,
+                 spPrice: np.ndarray,
+                 seconds: np.ndarray = None,
+                 groupEnd: np.ndarray = None) -> None:
+        # Epoch nanoseconds and the original timestamp strings (used for output)
+        self.time = time
+        # Epoch seconds, matching datetime.timestamp() exactly
+        self.seconds = (time // 1000) / 1e6 if seconds is None else seconds
+        self.timeStr = timeStr
+        self.instrument = instrument
+        self.side = side
+        self.operation = operation
+        # Kalshi volume and price (in cents), zero for S&P 500 rows
+        self.volume = volume
+        self.price = price
+        # S&P 500 price, NaN for Kalshi rows
+        self.spPrice = spPrice
+
+        # True if the next event has a different timestamp (last event of a same-timestamp group)
+        if groupEnd is None:
+            groupEnd = np.ones(len(time), dtype=bool)
+            groupEnd[:-1] = time[1:] != time[:-1]
+        self.groupEnd = groupEnd
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+def parseTime(date: str) -> datetime:
+    # Fast path for ISO-8601 timestamps, fall back to dateparser for anything else
+    try:
+        return datetime.fromisoformat(date)
+    except ValueError:
+        return dateparser.parse(date)
+
+def toEpochNanos(dates: pd.Series) -> np.ndarray:
+    try:
+        times = pd.to_datetime(dates, utc=True)
+    except (ValueError, TypeError):
+        # Mixed or unusual formats: parse each distinct string once
+        unique = {date: parseTime(date) for date in dates.unique()}
+        times = pd.to_datetime(dates.map(unique), utc=True)
+
+    return times.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+def loadMarketData(fileName: str) -> MarketData:
+    df = pd.read_csv(fileName)
+
+    # Timestamps are parsed once here, the replay only sees numbers
+    time = toEpochNanos(df["Time"])
+
+    instrument = df["Instrument"].to_numpy(dtype=np.int8)
+    kalshi = instrument != INSTRUMENT_SP
+
+    side = df["Side"].map(SIDE_CODES).fillna(SIDE_NONE).to_numpy(dtype=np.int8)
+    operation = df["Operation"].map(OP_CODES).fillna(OP_NONE).to_numpy(dtype=np.int8)
+
+    volume = np.where(kalshi, df["Volume"].fillna(0), 0).astype(np.int32)
+
+    # Kalshi prices are stored in hundredths of a cent; truncate to cents
+    rawPrice = df["Price"].to_numpy(dtype=np.float64)
+    price = np.where(kalshi, rawPrice / 100, 0).astype(np.int32)
+    spPrice = np.where(instrument == INSTRUMENT_SP, rawPrice, np.nan)
+
+    return MarketData(time, df["Time"].to_numpy(dtype=object), instrument, side, operation, volume, price, spPrice)
+
+def saveMarketData(data: MarketData, directory: str) -> None:
+    """
+    Write every column to its own .npy file so other processes can memory-map them
+    """
+    os.makedirs(directory, exist_ok=True)
+    for column in COLUMNS + DERIVED:
+        values = getattr(data, column)
+        if column == "timeStr":
+            values = values.astype(bytes)
+        np.save(os.path.join(directory, column + ".npy"), values)
+
+def openMarketData(directory: str) -> MarketData:
+    """
+    Read-only, memory-mapped view of a directory written by saveMarketData. The pages are shared
+    between every process that opens the same files.
+    """
+    columns = {column: np.load(os.path.join(directory, column + ".npy"), mmap_mode="r") for column in COLUMNS}
+    for column in DERIVED:
+        path = os.path.join(directory, column + ".npy")
+        if os.path.exists(path):
+            columns[column] = np.load(path, mmap_mode="r")
+    return MarketData(**columns)
+
+def fileHash(fileName: str) -> str:
+    digest = hashlib.blake2b(digest_size=8)
+    with open(fileName, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def marketDataCache(fileName: str, cacheDir: str = None) -> str:
+    """
+    Directory holding the converted .npy columns of a combined csv, converting it first if the csv is
+    new or has changed since it was last cached. Older conversions of the same file are removed.
+    """
+    if cacheDir is None:
+        cacheDir = os.path.join(os.path.dirname(os.path.abspath(fileName)), CACHE_DIR)
+    name = os.path.splitext(os.path.basename(fileName))[0]
+    key = f"{name}-{fileHash(fileName)}-v{CACHE_VERSION}"
+    directory = os.path.join(cacheDir, key)
+    if os.path.isdir(directory):
+        return directory
+
+    # Convert into a scratch directory and rename it into place, so a cache directory is always complete
+    # even with several processes converting the same file at once
+    os.makedirs(cacheDir, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix=key + ".", dir=cacheDir)
+    os.chmod(scratch, 0o755)
+    try:
+        saveMarketData(loadMarketData(fileName), scratch)
+        os.rename(scratch, directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    # Only stale conversions of this file, not of files whose names start with it (day.csv vs day-2.csv)
+    stale = re.compile(re.escape(name) + r"-[0-9a-f]{16}-v\d+")
+    for entry in os.listdir(cacheDir):
+        if entry != key and stale.fullmatch(entry):
+            shutil.rmtree(os.path.join(cacheDir, entry), ignore_errors=True)
+    return directory
+
+def cachedMarketData(fileName: str, cacheDir: str = None) -> MarketData:
+    """
+    Memory-mapped market data for a combined csv, parsing the csv only on first use
+    """
+    return openMarketData(marketDataCache(fileName, cacheDir))
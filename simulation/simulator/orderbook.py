@@ -0,0 +1,117 @@
+"""
+Fixed-size array order book for the simulator. Kalshi prices are integer cents, so each side is a flat list
+of volumes indexed by price plus a bitmask of which levels exist. Best bid/ask are the highest/lowest set
+bit of the mask, so they are O(1) no matter how many levels were touched.
+
+Semantics match the dict book the simulator used before: a level exists from its first insert (even with
+zero volume) until a removal brings it back to exactly zero, and touching a missing level raises KeyError.
+"""
+
+# Bot quotes can land outside 1..99 (skew pushes them past the edges), so leave room on both sides
+PRICE_MIN = -200
+PRICE_MAX = 300
+LEVELS = PRICE_MAX - PRICE_MIN + 1
+
+SIDES = ("bids", "asks")
+
+class OrderBook():
+
+    def __init__(self) -> None:
+        self.volumes = {side: [0] * LEVELS for side in SIDES}
+        # Bit i is set if price PRICE_MIN + i has a level
+        self.masks = {side: 0 for side in SIDES}
+
+    def index(self, price: int) -> int:
+        i = price - PRICE_MIN
+        if i < 0 or i >= LEVELS:
+            raise ValueError(f"Price {price} outside of order book range {PRICE_MIN}..{PRICE_MAX}")
+        return i
+
+    def contains(self, side: str, price: int) -> bool:
+        i = price - PRICE_MIN
+        return 0 <= i < LEVELS and (self.masks[side] >> i) & 1 == 1
+
+    def get(self, side: str, price: int) -> int:
+        if not self.contains(side, price):
+            raise KeyError(price)
+        return self.volumes[side][price - PRICE_MIN]
+
+    def add(self, side: str, price: int, vol: int) -> None:
+        i = self.index(price)
+        if (self.masks[side] >> i) & 1:
+            self.volumes[side][i] += vol
+        else:
+            self.volumes[side][i] = vol
+            self.masks[side] |= 1 << i
+
+    def remove(self, side: str, price: int, vol: int) -> None:
+        """
+        Take vol off a level, deleting the level once it reaches zero
+        """
+        if not self.contains(side, price):
+            raise KeyError(price)
+        i = price - PRICE_MIN
+        self.volumes[side][i] -= vol
+        if self.volumes[side][i] == 0:
+            self.masks[side] &= ~(1 << i)
+
+    def isEmpty(self, side: str) -> bool:
+        return self.masks[side] == 0
+
+    def bestBid(self) -> int:
+        mask = self.masks["bids"]
+        return mask.bit_length() - 1 + PRICE_MIN if mask else None
+
+    def bestAsk(self) -> int:
+        mask = self.masks["asks"]
+        return (mask & -mask).bit_length() - 1 + PRICE_MIN if mask else None
+
+    def best(self, side: str) -> int:
+        return self.bestBid() if side == "bids" else self.bestAsk()
+
+    def levels(self, side: str):
+        """
+        Yield (price, volume) for every level, best price first
+        """
+        mask = self.masks[side]
+        volumes = self.volumes[side]
+        while mask:
+            if side == "bids":
+                i = mask.bit_length() - 1
+            else:
+                i = (mask & -mask).bit_length() - 1
+            mask &= ~(1 << i)
+            yield i + PRICE_MIN, volumes[i]
+
+    def depth(self, side: str, n: int):
+        """
+        Top n levels of a side as (price, volume), best first
+        """
+        result = []
+        for level in self.levels(side):
+            if len(result) == n:
+                break
+            result.append(level)
+        return result
+
+    def cumulativeVolume(self, side: str, price: int) -> int:
+        """
+        Total volume at price or better (bids at or above, asks at or below)
+        """
+        total = 0
+        for level, volume in self.levels(side):
+            if (side == "bids" and level < price) or (side == "asks" and level > price):
+                break
+            total += volume
+        return total
+
+    def toDict(self):
+        return {side: {price: volume for price, volume in self.levels(side)} for side in SIDES}
+
+    @classmethod
+    def fromDict(cls, orderbook) -> "OrderBook":
+        book = cls()
+        for side in SIDES:
+            for price, volume in orderbook[side].items():
+                book.add(side, price, volume)
+        return book
@@ -0,0 +1,139 @@
+"""
+FIFO queue model for the price levels of the simulator order book. Each level is a queue of entries, either
+anonymous market volume or one of the bot's orders, so several bot orders can rest on the same side (and on
+the same price) and each keeps its own place in line.
+
+Market inserts join the back of the queue, aggressive volume is taken from the front, and bot cancels are
+lazy (the entry is zeroed and dropped once it reaches either end), so every update is O(1) amortized.
+
+Market data only says how much volume was cancelled at a level, not whose. CANCEL_POLICIES decides which
+market volume it comes from:
+    back          behind the bot's orders first, so cancels never improve our position (pessimistic)
+    front         ahead of the bot's orders first (optimistic)
+    proportional  spread over every market entry in proportion to its size
+"""
+from collections import deque
+
+CANCEL_POLICIES = ("back", "front", "proportional")
+
+class BotOrder():
+
+    def __init__(self, orderId: int, side: str, price: int, quantity: int) -> None:
+        self.id = orderId
+        # "bids" or "asks"
+        self.side = side
+        self.price = price
+        # Remaining (unfilled) quantity
+        self.quantity = quantity
+        self.filled = 0
+        # [owner, quantity] entry in its level queue while resting
+        self.entry = None
+
+    def __repr__(self) -> str:
+        return f"BotOrder({self.id}, {self.side}, {self.quantity}@{self.price})"
+
+class LevelQueue():
+
+    def __init__(self) -> None:
+        # [owner, quantity] entries in time priority, owner is None for market volume
+        self.entries = deque()
+        self.market = 0
+
+    def volume(self) -> int:
+        return sum(quantity for _, quantity in self.entries)
+
+    def addMarket(self, quantity: int) -> None:
+        # Consecutive market volume collapses into one entry
+        if self.entries and self.entries[-1][0] is None:
+            self.entries[-1][1] += quantity
+        else:
+            self.entries.append([None, quantity])
+        self.market += quantity
+
+    def addOrder(self, order: BotOrder) -> None:
+        order.entry = [order, order.quantity]
+        self.entries.append(order.entry)
+
+    def removeOrder(self, order: BotOrder) -> None:
+        order.entry[1] = 0
+        order.entry = None
+        self.trim()
+
+    def trim(self) -> None:
+        # Drop emptied entries from both ends
+        entries = self.entries
+        while entries and entries[0][1] == 0:
+            entries.popleft()
+        while entries and entries[-1][1] == 0:
+            entries.pop()
+
+    def cancelMarket(self, quantity: int, policy: str = "back") -> int:
+        """
+        Remove up to quantity of market volume, returns how much was removed
+        """
+        quantity = min(quantity, self.market)
+        if quantity <= 0:
+            return 0
+
+        if policy == "proportional":
+            markets = [entry for entry in self.entries if entry[0] is None and entry[1] > 0]
+            remaining = quantity
+            for entry in markets:
+                share = min(entry[1], quantity * entry[1] // self.market)
+                entry[1] -= share
+                remaining -= share
+            # Rounding leftovers come off the back
+            for entry in reversed(markets):
+                if remaining == 0:
+                    break
+                take = min(remaining, entry[1])
+                entry[1] -= take
+                remaining -= take
+        else:
+            remaining = quantity
+            entries = reversed(self.entries) if policy == "back" else self.entries
+            for entry in entries:
+                if remaining == 0:
+                    break
+                if entry[0] is None:
+                    take = min(remaining, entry[1])
+                    entry[1] -= take
+                    remaining -= take
+
+        self.market -= quantity
+        self.trim()
+        return quantity
+
+    def consume(self, quantity: int, fills) -> int:
+        """
+        Take up to quantity from the front of the queue, appending (order, quantity) to fills for every bot
+        order reached. Returns how much was taken.
+        """
+        entries = self.entries
+        taken = 0
+        while taken < quantity and entries:
+            entry = entries[0]
+            take = min(quantity - taken, entry[1])
+            entry[1] -= take
+            taken += take
+            if entry[0] is None:
+                self.market -= take
+            elif take > 0:
+                fills.append((entry[0], take))
+            if entry[1] == 0:
+                entries.popleft()
+        return taken
+
+    def ahead(self, order: BotOrder) -> int:
+        """
+        Volume queued in front of a resting bot order
+        """
+        total = 0
+        for entry in self.entries:
+            if entry is order.entry:
+                return total
+            total += entry[1]
+        raise KeyError(order.id)
+
+    def orders(self):
+        return [entry[0] for entry in self.entries if entry[0] is not None and entry[1] > 0]
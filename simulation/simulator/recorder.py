@@ -0,0 +1,93 @@
+from array import array
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["Time", "PnL", "Position", "AdjPnL", "SP_Price"]
+
+class Recorder():
+    """
+    Records simulation results into growable typed arrays and only builds a DataFrame once the replay
+    is over. Times are stored as row indices into the replayed data and resolved to their labels on output.
+
+    If flushPath is given, rows are appended to that csv every chunkSize records so memory stays bounded
+    on long, multi-day replays.
+    """
+
+    def __init__(self,
+                 timeLabels: np.ndarray,
+                 flushPath: str = None,
+                 chunkSize: int = 100000) -> None:
+        self.timeLabels = timeLabels
+        self.flushPath = flushPath
+        self.chunkSize = chunkSize
+
+        # Number of rows already written to flushPath
+        self.flushed = 0
+        self.clear()
+
+    def clear(self) -> None:
+        self.rows = array("q")
+        self.pnl = array("d")
+        self.position = array("q")
+        self.adjPnl = array("d")
+        self.spPrice = array("d")
+
+    def __len__(self) -> int:
+        return self.flushed + len(self.rows)
+
+    def record(self, row: int, pnl: float, position: int, adjPnl: float, spPrice: float) -> None:
+        self.rows.append(row)
+        self.pnl.append(pnl)
+        self.position.append(position)
+        self.adjPnl.append(adjPnl)
+        self.spPrice.append(spPrice)
+
+        if self.flushPath is not None and len(self.rows) >= self.chunkSize:
+            self.flush()
+
+    def buffered(self) -> pd.DataFrame:
+        """
+        DataFrame of the rows that have not been flushed yet
+        """
+        rows = np.frombuffer(self.rows, dtype=np.int64)
+        times = self.timeLabels[rows]
+        # Memory-mapped market data stores timestamps as bytes
+        if times.dtype.kind == "S":
+            times = times.astype(str)
+        df = pd.DataFrame({
+            "Time": times,
+            "PnL": np.frombuffer(self.pnl, dtype=np.float64),
+            "Position": np.frombuffer(self.position, dtype=np.int64),
+            "AdjPnL": np.frombuffer(self.adjPnl, dtype=np.float64),
+            "SP_Price": np.frombuffer(self.spPrice, dtype=np.float64),
+        }, columns=COLUMNS)
+        df.index = pd.RangeIndex(self.flushed, self.flushed + len(rows))
+        return df
+
+    def flush(self) -> None:
+        """
+        Append buffered rows to flushPath and release them from memory
+        """
+        df = self.buffered()
+        df.to_csv(self.flushPath, mode="w" if self.flushed == 0 else "a", header=self.flushed == 0, index=True, index_label="ID")
+        self.flushed += len(df)
+        self.clear()
+
+    def toDataFrame(self) -> pd.DataFrame:
+        if self.flushed > 0:
+            raise ValueError(f"{self.flushed} rows were already flushed to {self.flushPath}, read the file instead")
+        return self.buffered()
+
+    def save(self, fileName: str) -> None:
+        # Streaming mode: write whatever is left to the file we have been appending to
+        if self.flushPath is not None:
+            if fileName != self.flushPath:
+                raise ValueError(f"Recorder is streaming to {self.flushPath}, cannot save to {fileName}")
+            self.flush()
+            return
+
+        df = self.toDataFrame()
+        if fileName.endswith(".parquet"):
+            df.to_parquet(fileName)
+        else:
+            df.to_csv(fileName, index=True, index_label="ID")
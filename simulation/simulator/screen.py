@@ -0,0 +1,252 @@
+"""
+APPROXIMATE signal screening. Scores quoting rules without the matching engine so thousands of them can be
+tried in seconds; only the promising ones are worth a full Simulator run, which is the number that counts.
+
+Per day, the market-only book is replayed once to get the best bid/ask after every event and the price
+range and volume of every aggressive order. Fair value is computed for every event in one array pass
+(S&P 500 price as-of each event). For a rule, quotes are then a vectorized function of fair value plus an
+inventory skew, and fills come from a simple model:
+
+    a bid at b fills at event i if b >= best ask (taken at the best ask), or if a sell order traded below
+    b (filled at b, at most the traded volume); asks mirror this
+
+Position only changes at fills, so the fill loop jumps from fill to fill with a binary search instead of
+visiting every event. What this ignores: queue position and market cancels, our own volume in the book,
+the strategy's cross limit, and that quotes only move when the strategy is called.
+
+Example: python screen.py --param bidOffset=0,1,2,3 --param askOffset=0,1,2,3 --param skew=5,10,20
+"""
+from orderbook import OrderBook
+from marketdata import MarketData, cachedMarketData, INSTRUMENT_SP, INSTRUMENT_KALSHI, OP_INSERT, OP_CANCEL, SIDE_BID
+from catalog import Day, loadCatalog, findDay
+from accounting import Ledger
+from sweep import DEFAULTS, parseParam, gridConfigs, randomConfigs, latinHypercubeConfigs
+import argparse
+import random
+import time
+import numpy as np
+import pandas as pd
+from pricing.fair_value import fair_value_array
+
+# Strategy parameters the screen models
+PARAMS = ("gamma", "x0", "exponent", "bidOffset", "askOffset", "positionLimit", "orderSize", "skew")
+
+# Stands in for "no fill possible" in the integer condition arrays
+NEVER = -10**6
+
+class DayTape():
+    """
+    Everything about a day the screen needs, independent of the quoting rule
+    """
+
+    def __init__(self, day: Day, data: MarketData) -> None:
+        self.day = day
+        self.seconds = np.asarray(data.seconds)
+        n = len(data)
+
+        # S&P 500 price as of every event, NaN before the first tick
+        sp = np.asarray(data.spPrice)
+        isSp = np.asarray(data.instrument) == INSTRUMENT_SP
+        last = np.maximum.accumulate(np.where(isSp, np.arange(n), -1))
+        self.spPrice = np.where(last >= 0, sp[np.maximum(last, 0)], np.nan)
+
+        # Settlement as in the simulator: the last S&P 500 price in the day's bracket
+        finalPrice = sp[isSp][-1]
+        self.resolvesYes = day.min <= finalPrice <= day.max - 0.01
+
+        self.bestBid, self.bestAsk, self.tradeLow, self.tradeHigh, self.tradeVolume = replayTops(data)
+
+def replayTops(data: MarketData):
+    """
+    Replay the market's own orders once. Per event: best bid/ask afterwards (NEVER when a side is empty),
+    and for aggressive orders the lowest bid / highest ask they traded at and the volume traded.
+    """
+    n = len(data)
+    bestBid = np.full(n, NEVER, dtype=np.int64)
+    bestAsk = np.full(n, -NEVER, dtype=np.int64)
+    tradeLow = np.full(n, -NEVER, dtype=np.int64)
+    tradeHigh = np.full(n, NEVER, dtype=np.int64)
+    tradeVolume = np.zeros(n, dtype=np.int64)
+
+    book = OrderBook()
+    instruments = data.instrument.tolist()
+    sides = data.side.tolist()
+    operations = data.operation.tolist()
+    volumes = data.volume.tolist()
+    prices = data.price.tolist()
+    bid = ask = None
+    for index in range(n):
+        if instruments[index] == INSTRUMENT_KALSHI:
+            side = "bids" if sides[index] == SIDE_BID else "asks"
+            price = prices[index]
+            vol = volumes[index]
+            if operations[index] == OP_CANCEL:
+                if book.contains(side, price):
+                    book.remove(side, price, min(vol, book.get(side, price)))
+            elif operations[index] == OP_INSERT:
+                other = "asks" if side == "bids" else "bids"
+                best = book.best(other)
+                traded = 0
+                while vol > 0 and best is not None and (best <= price if side == "bids" else best >= price):
+                    take = min(vol, book.get(other, best))
+                    book.remove(other, best, take)
+                    vol -= take
+                    traded += take
+                    if side == "bids":
+                        tradeHigh[index] = best
+                    else:
+                        tradeLow[index] = best
+                    best = book.best(other)
+                tradeVolume[index] = traded
+                if vol > 0:
+                    book.add(side, price, vol)
+            bid, ask = book.bestBid(), book.bestAsk()
+        if bid is not None:
+            bestBid[index] = bid
+        if ask is not None:
+            bestAsk[index] = ask
+    return bestBid, bestAsk, tradeLow, tradeHigh, tradeVolume
+
+class FillIndex():
+    """
+    Sorted event indices where condition >= k, built the first time a skew k is needed
+    """
+
+    def __init__(self, condition: np.ndarray) -> None:
+        self.condition = condition
+        self.indices = {}
+
+    def next(self, k: int, start: int) -> int:
+        # First event at or after start that fills with skew k, None if there is none
+        indices = self.indices.get(k)
+        if indices is None:
+            indices = self.indices[k] = np.flatnonzero(self.condition >= k)
+        i = indices.searchsorted(start)
+        return int(indices[i]) if i < len(indices) else None
+
+def screenRule(tape: DayTape, params) -> dict:
+    """
+    Approximate fills, edge and PnL of one quoting rule over one day
+    """
+    params = {**{name: DEFAULTS[name] for name in PARAMS}, **params}
+    positionLimit, orderSize, skew = params["positionLimit"], params["orderSize"], params["skew"]
+    day = tape.day
+
+    offset = day.eod - tape.seconds
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fair = 100 * fair_value_array(tape.spPrice, offset, day.min, day.max, params["gamma"], params["x0"], params["exponent"])
+    # The strategy stays out before the first S&P 500 tick, after the close and with a one-sided book
+    live = (offset > 0) & np.isfinite(fair) & (tape.bestBid != NEVER) & (tape.bestAsk != -NEVER)
+    center = np.round(np.where(live, fair, 0)).astype(np.int64)
+    baseBid = center - params["bidOffset"]
+    baseAsk = center + params["askOffset"]
+
+    # A position p moves both quotes down by k = round(p / skew). Fills need:
+    #   bid: max(baseBid - bestAsk, baseBid - tradeLow - 1) >= k
+    #   ask: max(bestBid - baseAsk, tradeHigh - baseAsk - 1) >= -k
+    takeBid = baseBid - tape.bestAsk
+    bidCondition = np.where(live, np.maximum(takeBid, baseBid - tape.tradeLow - 1), NEVER)
+    takeAsk = tape.bestBid - baseAsk
+    askCondition = np.where(live, np.maximum(takeAsk, tape.tradeHigh - baseAsk - 1), NEVER)
+
+    bidFills = FillIndex(bidCondition)
+    askFills = FillIndex(askCondition)
+
+    ledger = Ledger()
+    edge = 0.0
+    position = 0
+    index = 0
+    n = len(tape.seconds)
+    while index < n:
+        k = round(position / skew)
+        bidSize = min(orderSize, positionLimit - position)
+        askSize = min(orderSize, positionLimit + position)
+
+        nextBid = bidFills.next(k, index) if bidSize > 0 else None
+        nextAsk = askFills.next(-k, index) if askSize > 0 else None
+        nextBid = n if nextBid is None else nextBid
+        nextAsk = n if nextAsk is None else nextAsk
+
+        index = min(nextBid, nextAsk)
+        if index == n:
+            break
+
+        if index == nextBid:
+            quote = baseBid[index] - k
+            if takeBid[index] >= k:
+                price, quantity = tape.bestAsk[index], bidSize
+            else:
+                price, quantity = quote, min(bidSize, int(tape.tradeVolume[index]))
+            ledger.fill(True, quantity, int(price), tape.seconds[index])
+            edge += quantity * (fair[index] - price) / 100
+            position += quantity
+        elif index == nextAsk:
+            quote = baseAsk[index] - k
+            if takeAsk[index] >= -k:
+                price, quantity = tape.bestBid[index], askSize
+            else:
+                price, quantity = quote, min(askSize, int(tape.tradeVolume[index]))
+            ledger.fill(False, quantity, int(price), tape.seconds[index])
+            edge += quantity * (price - fair[index]) / 100
+            position -= quantity
+        index += 1
+
+    return {
+        "day": day.name,
+        **{name: params[name] for name in PARAMS},
+        "fills": len(ledger.quantities),
+        "volume": ledger.yes + ledger.no,
+        "edge": round(float(edge), 2),
+        "pnl": round(ledger.pnl(tape.resolvesYes), 2),
+        "position": position,
+    }
+
+def screen(configs, days) -> pd.DataFrame:
+    results = []
+    for day in days:
+        tape = DayTape(day, cachedMarketData(day.file))
+        for configId, config in enumerate(configs):
+            results.append({"config": configId, **screenRule(tape, config)})
+    return pd.DataFrame(results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="APPROXIMATE vectorized screen of quoting rules; confirm candidates with sweep.py")
+    parser.add_argument("--days", nargs="+", default=None, help="Catalog indices or names of the days to screen (default: all)")
+    parser.add_argument("--param", action="append", default=[], help=f"name=a,b,c (values) or name=lo:hi (range), for {', '.join(PARAMS)}")
+    parser.add_argument("--sample", choices=["grid", "random", "lhs"], default="grid", help="How to pick rules")
+    parser.add_argument("-n", type=int, default=1000, help="Number of rules for random/lhs sampling")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top", type=int, default=20, help="Candidates to show")
+    parser.add_argument("--out", default=None, help="Write every screened rule to this csv")
+    args = parser.parse_args()
+
+    catalog = loadCatalog()
+    try:
+        days = catalog if args.days is None else [findDay(catalog, key) for key in args.days]
+    except KeyError as e:
+        print(e.args[0])
+        exit()
+
+    params = dict(parseParam(spec) for spec in args.param)
+    unsupported = [name for name in params if name not in PARAMS]
+    if unsupported:
+        parser.error(f"the screen does not model {', '.join(unsupported)}")
+    rng = random.Random(args.seed)
+    if args.sample == "grid":
+        configs = gridConfigs(params)
+    elif args.sample == "random":
+        configs = randomConfigs(params, args.n, rng)
+    else:
+        configs = latinHypercubeConfigs(params, args.n, rng)
+
+    start = time.perf_counter()
+    results = screen(configs, days)
+    elapsed = time.perf_counter() - start
+    if args.out is not None:
+        results.to_csv(args.out, index=False)
+
+    print(f"APPROXIMATE screen of {len(configs)} rules over {len(days)} days in {elapsed:.1f}s ({len(results) / elapsed:.0f} rule-days/sec)")
+    summary = results.groupby("config").agg(pnl=("pnl", "sum"), edge=("edge", "sum"), fills=("fills", "sum"))
+    summary = summary.join(pd.DataFrame(configs)).sort_values("pnl", ascending=False)
+    print(summary.head(args.top).to_string())
+    print("Screen fills ignore queue position and market cancels; rerun the top rules through sweep.py before trusting them.")
@@ -1,101 +1,180 @@
 from state import TradingState
 from strategy import Strategy
+from marketdata import MarketData, cachedMarketData, INSTRUMENT_SP, INSTRUMENT_KALSHI, OP_INSERT, OP_CANCEL, SIDE_NAMES
+from recorder import Recorder
+from latency import OrderGateway
+from instrumentation import PhaseTimer, log
 import pandas as pd
+import time
 
 class Simulator(): 
 
     def __init__(self, 
                  fileName: str,
                  state: TradingState,
-                 strat: Strategy) -> None:
+                 strat: Strategy,
+                 bounds: tuple,
+                 eventsFile: str = "events.csv",
+                 flushEvery: int = 0,
+                 data: MarketData = None,
+                 gateway: OrderGateway = None) -> None:
         
         self.state = state
-        self.data = pd.read_csv(fileName)
+        self.fileName = fileName
+        self.timer = PhaseTimer()
+        # Already loaded (e.g. memory-mapped) market data can be passed in instead of a file name.
+        # Otherwise the csv is converted to a binary cache on first use and memory-mapped after that.
+        if data is None:
+            start = time.perf_counter()
+            data = cachedMarketData(fileName)
+            self.timer.add("load", time.perf_counter() - start)
+        self.data = data
         self.strat = strat
-        self.events = pd.DataFrame(columns=["Time", "PnL", "Position", "AdjPnL", "SP_Price"])
+        # Bracket the market settles YES on, [lower, upper)
+        self.bounds = bounds
+        # With a gateway, order traffic and fill notifications are delayed and replayed between market events
+        self.gateway = gateway
+        self.eventsFile = eventsFile
+        # flushEvery > 0 streams results to eventsFile in chunks instead of holding the whole day in memory
+        self.events = Recorder(self.data.timeStr, eventsFile if flushEvery > 0 else None, flushEvery)
         self.probability = pd.DataFrame(columns=["Time", "SPX", "Mid"])
         self.last_adj_pnl = -1 
-
-    def simulate(self) -> None: 
-        
-        priceMin = self.data["Price"].iloc[0]
-        # Round priceMin down to the nearest 50
-        priceMin = int(priceMin / 50) * 50
-
-        priceMax = self.data["Price"].iloc[0]
-        # Round priceMax up to the nearest 50
-        priceMax = (int(priceMax / 50) * 50 + 50) - 0.01
-
-        self.state.min = priceMin
-        self.state.max = priceMax
-
-        # Iterate through data
-        for index, row in self.data.iterrows():
-            # print(index)
-            instrument = row["Instrument"]
-            time = row["Time"]
-            self.state.time = time 
-
-            if instrument == 0: 
-                self.state.updateSP(row["Price"])
-
-                pnl = 0
-                # Yes resolution
-                if self.state.sp_price >= self.state.min and self.state.sp_price <= self.state.max:
-                    pnl = (self.state.yes - self.state.total_yes_price) - (self.state.total_no_price)
-                # No resolution
-                else:
-                    pnl = (self.state.no - self.state.total_no_price) - (self.state.total_yes_price)
-
-                if pnl != self.state.pnl: 
-                    self.state.pnl = pnl
-                    newRow = [time, round(self.state.pnl, 2), self.state.position, self.state.pnl, self.state.sp_price]
-                    newRow[3] = round(newRow[3], 2)
-                    self.events.loc[len(self.events)] = newRow
-                    print(f"PnL update. Current position: {self.state.position}")
-                    print(f"Current PnL: {self.state.pnl}")
-
+        # Events replayed and replay time so far, across simulate() calls
+        self.replayed = 0
+        self.elapsed = 0.0
+
+    def simulate(self, start: int = 0, stop: int = None) -> None: 
+        """
+        Replay events start..stop-1. The day is settled and results written once the last event has been
+        replayed; stopping earlier leaves the state as it is after stop - 1 so it can be checkpointed or
+        resumed with simulate(stop).
+        """
+        data = self.data
+        stop = len(data) if stop is None else stop
+
+        lower, upper = self.bounds
+        self.state.min = lower
+        self.state.max = upper - 0.01
+
+        # Native Python lists are much faster to index per event than NumPy arrays
+        seconds = data.seconds.tolist()
+        instruments = data.instrument.tolist()
+        sides = data.side.tolist()
+        operations = data.operation.tolist()
+        volumes = data.volume.tolist()
+        prices = data.price.tolist()
+        spPrices = data.spPrice.tolist()
+        groupEnds = data.groupEnd.tolist()
+
+        state = self.state
+        ledger = state.ledger
+        gateway = self.gateway
+        # Per-phase time is accumulated in locals and handed to the timer once the replay is over
+        perf = time.perf_counter
+        bookTime = matchTime = strategyTime = ordersTime = recordTime = 0.0
+        bookCalls = matchCalls = strategyCalls = ordersCalls = recordCalls = 0
+        began = perf()
+
+        # Iterate through events
+        for index in range(start, stop):
+            instrument = instruments[index]
+            if gateway is not None and gateway.queue.nextTime() <= seconds[index]:
+                t0 = perf()
+                gateway.runUntil(seconds[index])
+                ordersTime += perf() - t0
+                ordersCalls += 1
+            state.time = seconds[index]
+
+            if instrument == INSTRUMENT_SP: 
+                state.updateSP(spPrices[index])
+
+                # PnL if the market settled now
+                pnl = ledger.settleYes if state.min <= state.sp_price <= state.max else ledger.settleNo
+
+                if pnl != state.pnl: 
+                    t0 = perf()
+                    state.pnl = pnl
+                    self.events.record(index, round(state.pnl, 2), state.position, round(state.pnl, 2), state.sp_price)
+                    recordTime += perf() - t0
+                    recordCalls += 1
+                    log.debug("PnL update. Current position: %s", state.position)
+                    log.debug("Current PnL: %s", state.pnl)
+
+                t0 = perf()
                 self.strat.spUpdate()
-            elif instrument == 1: 
-                operation = row["Operation"]
-                price = int(row["Price"] / 100)
-                side = row["Side"]
-                volume = int(row["Volume"])
-
-                if operation == "Insert": 
-                    self.state.updateOrderbook(side, price, volume, "Insert", False)     
-                elif operation == "Cancel": 
-                    self.state.updateOrderbook(side, price, volume, "Cancel", False)
+                strategyTime += perf() - t0
+                strategyCalls += 1
+            elif instrument == INSTRUMENT_KALSHI: 
+                operation = operations[index]
+                price = prices[index]
+                side = SIDE_NAMES[sides[index]]
+                volume = volumes[index]
+
+                t0 = perf()
+                crosses = False
+                if operation == OP_INSERT: 
+                    best = state.book.bestAsk() if side == "B" else state.book.bestBid()
+                    crosses = best is not None and (price >= best if side == "B" else price <= best)
+                    state.updateOrderbook(side, price, volume, "Insert")
+                elif operation == OP_CANCEL: 
+                    state.updateOrderbook(side, price, volume, "Cancel")
+                if crosses:
+                    matchTime += perf() - t0
+                    matchCalls += 1
+                else:
+                    bookTime += perf() - t0
+                    bookCalls += 1
                 
-                if index + 1 < len(self.data) and self.data["Time"].iloc[index + 1] == row["Time"]:
+                # Only act once all events sharing this timestamp have been applied
+                if not groupEnds[index]:
                     continue
 
-                newRow = [time, round(self.state.pnl, 2), self.state.position, self.state.pnl, self.state.sp_price]
-                newRow[3] = round(newRow[3], 2)
-                self.events.loc[len(self.events)] = newRow
+                t0 = perf()
+                self.events.record(index, round(state.pnl, 2), state.position, round(state.pnl, 2), state.sp_price)
+                recordTime += perf() - t0
+                recordCalls += 1
 
+                t0 = perf()
                 self.strat.kalshiUpdate()
-
-        print("Simulation complete. Finished with position of " + str(self.state.position) + " and S&P 500 price of " + str(self.state.sp_price) + ".")
+                strategyTime += perf() - t0
+                strategyCalls += 1
+
+        self.replayed += stop - start
+        self.elapsed += perf() - began
+        timer = self.timer
+        timer.add("book", bookTime, bookCalls)
+        timer.add("matching", matchTime, matchCalls)
+        timer.add("strategy", strategyTime, strategyCalls)
+        timer.add("orders", ordersTime, ordersCalls)
+        timer.add("recording", recordTime, recordCalls)
+        if stop < len(data):
+            return
+
+        log.info("Simulation complete. Finished with position of " + str(state.position) + " and S&P 500 price of " + str(state.sp_price) + ".")
         marketResolution = True
-        if self.state.sp_price >= priceMin and self.state.sp_price <= priceMax:
-            print("Market resolved to YES")
+        if state.min <= state.sp_price <= state.max:
+            log.info("Market resolved to YES")
             marketResolution = True
         else: 
-            print("Market resolved to NO")
+            log.info("Market resolved to NO")
             marketResolution = False
         
-        if self.state.position > 0 and marketResolution: 
-            print(f"Settling {self.state.position} contracts at $1. Total PnL: ${(self.state.yes - self.state.total_yes_price) - self.state.total_no_price}")
-        elif self.state.position > 0 and not marketResolution:
-            print(f"Settling {self.state.position} contracts at $0. Total PnL: ${(self.state.no - self.state.total_no_price) - self.state.total_yes_price}")
-        elif self.state.position < 0 and marketResolution: 
-            print(f"Settling {self.state.position} contracts at $0. Total PnL: ${(self.state.yes - self.state.total_yes_price) - self.state.total_no_price}")
-        elif self.state.position < 0 and not marketResolution:
-            print(f"Settling {self.state.position} contracts at $1. Total PnL: ${(self.state.no - self.state.total_no_price) - self.state.total_yes_price}")
+        if state.position != 0:
+            payout = 1 if (state.position > 0) == marketResolution else 0
+            log.info(f"Settling {state.position} contracts at ${payout}. Total PnL: ${ledger.pnl(marketResolution)}")
+        if not state.book.isEmpty("bids") and not state.book.isEmpty("asks"):
+            mid = (state.book.bestBid() + state.book.bestAsk()) / 2
+            log.info(f"Mark to market at mid {mid}: ${ledger.markToMarket(mid):.2f}, realized on offsetting pairs: ${ledger.realized():.2f}")
+        fairValue = getattr(self.strat, "fairValue", None)
+        if fairValue is not None:
+            log.info(f"Mark to model fair value {100 * fairValue:.1f}: ${ledger.markToFair(fairValue):.2f}")
         
         # Write events to CSV
-        self.events.to_csv("events.csv", index=True, index_label="ID")
-
-
-            
\ No newline at end of file
+        t0 = perf()
+        self.events.save(self.eventsFile)
+        timer.add("recording", perf() - t0, 0)
+        self.elapsed += perf() - t0
+
+        if gateway is not None:
+            log.info(f"Order latency: {gateway.summary()}")
+        log.info(timer.summary(self.replayed, self.elapsed))
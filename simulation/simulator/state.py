@@ -1,301 +1,207 @@
-class TradingState(): 
+from orderbook import OrderBook, SIDES
+from orderqueue import BotOrder, LevelQueue, CANCEL_POLICIES
+from instrumentation import log
+from accounting import Ledger
 
-    def __init__(self, start: int) -> None:
-        self.orderbook = {
-            "bids": {}, 
-            "asks": {}
-        }
+# Order sides as used by the strategy and the market data
+SIDE_BOOK = {"B": "bids", "A": "asks"}
 
-        self.sp_price: float = -1 
+class TradingState():
+
+    def __init__(self, start: int, cancelPolicy: str = "back") -> None:
+        if cancelPolicy not in CANCEL_POLICIES:
+            raise ValueError(f"Unknown cancel policy {cancelPolicy}, expected one of {', '.join(CANCEL_POLICIES)}")
+
+        # Aggregate volume per level (market and bot), with the FIFO queue behind every level
+        self.book = OrderBook()
+        self.queues = {side: {} for side in SIDES}
+        self.cancelPolicy = cancelPolicy
+
+        # Resting bot orders by id
+        self.orders = {}
+        self.nextOrderId = 0
+        # Called with (side, quantity, price) on every bot fill
+        self.onFill = None
+
+        self.sp_price: float = -1
         self.position: int = 0
-        self.pnl = 0 
+        self.pnl = 0
+        # Number of bot fills and largest absolute inventory held
+        self.fills: int = 0
+        self.maxPosition: int = 0
 
-        self.yes: int = 0
-        self.no: int = 0
-        self.total_yes_price: float = 0 
-        self.total_no_price: float = 0
+        # Cost basis, settlement PnL and fill log
+        self.ledger = Ledger()
         self.min = min
         self.max = max
-        # Hardcoded start of trading day value 
+        # Hardcoded start of trading day value
         self.time = start
 
-        self.bid = {
-            "price": 0, 
-            "quantity": 0, 
-            "queue": 0
-        }
-
-        self.ask = {
-            "price": 0,
-            "quantity": 0,
-            "queue": 0
-        } 
-
-    def getSP(self) -> float: 
+    def getSP(self) -> float:
         return self.sp_price
 
-    def getOrderbook(self): 
-        return self.orderbook
-
-    def cancelOrder(self, side) -> None: 
-        if side == "B": 
-            if self.bid["quantity"] != 0: 
-                # Update order book
-                price = self.bid["price"]
-                self.orderbook["bids"][price] -= self.bid["quantity"]
-                if self.orderbook["bids"][price] == 0:
-                    del self.orderbook["bids"][price]
-
-                # Zero out quantity and queue 
-                self.bid["quantity"] = 0
-                self.bid["queue"] = 0
-
-        elif side == "A": 
-            if self.ask["quantity"] != 0: 
-                price = self.ask["price"]
-
-                self.orderbook["asks"][price] -= self.ask["quantity"]
-                if self.orderbook["asks"][price] == 0:
-                    del self.orderbook["asks"][price]
-
-                self.ask["quantity"] = 0
-                self.ask["queue"] = 0
-
-    def insertOrder(self, side, price, quantity) -> None: 
-        if side == "B": 
-            
-            if price != self.bid["price"] or quantity != self.bid["quantity"]:
-                self.cancelOrder("B")
-
-            self.bid["price"] = price
-            self.bid["quantity"] = 0
-            self.bid["queue"] = 0
-
-            self.updateOrderbook("B", price, quantity, "Insert", True)
-
-        elif side == "A": 
-            
-            if price != self.ask["price"] or quantity != self.ask["quantity"]:
-                self.cancelOrder("A")
+    def getOrderbook(self):
+        # Dict view of the book for callers that still expect {"bids": {price: volume}, "asks": {...}}
+        return self.book.toDict()
+
+    def getOrders(self, side):
+        """
+        Resting bot orders on a side ("B" or "A"), best price first and in queue order within a price
+        """
+        bookSide = SIDE_BOOK[side]
+        # Ids are handed out in time order, so they also give queue order within a price
+        sign = -1 if bookSide == "bids" else 1
+        return sorted((order for order in self.orders.values() if order.side == bookSide),
+                      key=lambda order: (sign * order.price, order.id))
+
+    def queuePosition(self, orderId: int) -> int:
+        """
+        Volume ahead of a resting bot order at its price
+        """
+        order = self.orders[orderId]
+        return self.queues[order.side][order.price].ahead(order)
+
+    def placeOrder(self, side, price, quantity) -> int:
+        """
+        Send a bot limit order. Whatever crosses the book fills immediately, the rest joins the back of the
+        queue at its price. Returns the order id, which is no longer in self.orders if it filled completely.
+        """
+        order = BotOrder(self.nextOrderId, SIDE_BOOK[side], price, quantity)
+        self.nextOrderId += 1
+
+        order.quantity = self.match(order.side, price, quantity, order)
+        if order.quantity > 0:
+            self.book.add(order.side, price, order.quantity)
+            self.queue(order.side, price).addOrder(order)
+            self.orders[order.id] = order
+        return order.id
+
+    def cancelOrderId(self, orderId: int) -> None:
+        order = self.orders.pop(orderId)
+        self.book.remove(order.side, order.price, order.quantity)
+        self.queues[order.side][order.price].removeOrder(order)
+        self.dropLevel(order.side, order.price)
+
+    def cancelOrder(self, side) -> None:
+        # Cancel every resting bot order on a side
+        for order in self.getOrders(side):
+            self.cancelOrderId(order.id)
+
+    def setQuotes(self, side, quotes) -> None:
+        """
+        Requote a side to the given [(price, quantity)] ladder. Resting orders that already match a quote
+        are left alone so they keep their queue position, the rest are cancelled and replaced.
+        """
+        wanted = [(price, quantity) for price, quantity in quotes if quantity > 0]
+        for order in self.getOrders(side):
+            if (order.price, order.quantity) in wanted:
+                wanted.remove((order.price, order.quantity))
+            else:
+                self.cancelOrderId(order.id)
 
-            self.ask["price"] = price
-            self.ask["quantity"] = 0
-            self.ask["queue"] = 0
+        for price, quantity in wanted:
+            self.placeOrder(side, price, quantity)
 
-            self.updateOrderbook("A", price, quantity, "Insert", True)
+    def insertOrder(self, side, price, quantity) -> None:
+        # Single order per side: replace whatever is resting unless it is already this order
+        self.setQuotes(side, [(price, quantity)])
 
-    def updateSP(self, price) -> None: 
+    def updateSP(self, price) -> None:
         self.sp_price = price
 
-    def updateOrderbook(self, side, price, vol, type, bot) -> None: 
-
-        if type == "Cancel": 
-            if side == "A" and price in self.orderbook["asks"]: 
-                    
-                    # Can only cancel as much quantity as is in the orderbook
-                    cancelVolume = min(vol, self.orderbook["asks"][price])
-
-                    # Don't want to cancel bot orders
-                    if self.ask["price"] == price and self.ask["quantity"] != 0:
-                        cancelVolume -= self.ask["quantity"]
-
-                    self.orderbook["asks"][price] -= cancelVolume
-                    if self.orderbook["asks"][price] == 0: 
-                        del self.orderbook["asks"][price]
-            elif side == "B" and price in self.orderbook["bids"]: 
-                    cancelVolume = min(vol, self.orderbook["bids"][price])
-                    if self.bid["price"] == price and self.bid["quantity"] != 0:
-                        cancelVolume -= self.bid["quantity"]
-
-                    self.orderbook["bids"][price] -= cancelVolume
-                    if self.orderbook["bids"][price] == 0: 
-                        del self.orderbook["bids"][price]
-        
-        elif type == "Insert": 
-             
-            # Check if the order results in a fill (with best resting bid/ask) 
-            fillStatus = self.checkFill(side, price, vol)
-
-            if fillStatus and side == "A": 
-
-                # Walk the book: 
-                remVol = vol
-                bestBid = max(self.orderbook["bids"])
-                while remVol > 0 and bestBid >= price: 
-                    fillVolume = min(remVol, self.orderbook["bids"][bestBid])
-
-                    if self.bid["price"] == bestBid and self.bid["quantity"] != 0:
-                        botFill = min(fillVolume - self.bid["queue"] + 1, self.bid["quantity"])
-
-                        if botFill > 0: 
-                            # Update bot order quantity and queue position
-                            self.bid["quantity"] = max(0, self.bid["quantity"] - botFill)
-                            self.bid["queue"] = max(1, self.bid["queue"] - fillVolume)
-                            self.position += botFill
-
-                            self.yes += botFill
-                            self.total_yes_price += botFill * (self.bid["price"] / 100)
-
-                            # Yes resolution 
-                            if self.sp_price >= self.min and self.sp_price <= self.max:
-                                self.pnl = (self.yes - self.total_yes_price) - (self.total_no_price)
-                            # No resolution
-                            else: 
-                                self.pnl = (self.no - self.total_no_price) - (self.total_yes_price)
-
-                            # self.pnl -= botFill * (self.bid["price"] / 100)
-
-                            print(f"Bot bid order filled. {botFill} at {bestBid}. Current position: {self.position}")
-                            print(f"Current PnL: {self.pnl}")
-                    
-                    # Bot market order
-                    elif bot: 
-                        self.position -= fillVolume
-
-                        self.no += fillVolume
-                        self.total_no_price += fillVolume * ((100 - bestBid) / 100)
-
-                        # Yes resolution
-                        if self.sp_price >= self.min and self.sp_price <= self.max:
-                            self.pnl = (self.yes - self.total_yes_price) - (self.total_no_price)
-                        # No resolution
-                        else:
-                            self.pnl = (self.no - self.total_no_price) - (self.total_yes_price)
-
-                        # self.pnl += fillVolume * (bestBid / 100)
-                        print(f"Bot market ask order filled. {fillVolume} at {bestBid}. Current position: {self.position}")
-                        print(f"Current PnL: {self.pnl}")
-
-                    self.orderbook["bids"][bestBid] -= fillVolume
-                    remVol -= fillVolume
-                    if self.orderbook["bids"][bestBid] == 0: 
-                        del self.orderbook["bids"][bestBid]
-
-                    if len(self.orderbook["bids"]) == 0:
-                        break
-
-                    bestBid = max(self.orderbook["bids"])
-                
-                # If there is still volume left, insert the remainder into the orderbook
-                if remVol > 0: 
-                    if price in self.orderbook["asks"]: 
-                        self.orderbook["asks"][price] += remVol
-                    else:
-                        self.orderbook["asks"][price] = remVol
-
-                    # Bot market order with remaining volume
-                    if bot: 
-                        self.ask["quantity"] = remVol
-                        self.ask["queue"] = 1
-            
-            elif fillStatus and side == "B": 
-
-                remVol = vol
-                bestAsk = min(self.orderbook["asks"])
-                while remVol > 0 and bestAsk <= price: 
-                    fillVolume = min(remVol, self.orderbook["asks"][bestAsk])
-
-                    if self.ask["price"] == bestAsk and self.ask["quantity"] != 0:
-                        botFill = min(fillVolume - self.ask["queue"] + 1, self.ask["quantity"])
-
-                        if botFill > 0: 
-                            # Update bot order quantity and queue position
-                            self.ask["quantity"] = max(0, self.ask["quantity"] - botFill)
-                            self.ask["queue"] = max(1, self.ask["queue"] - fillVolume)
-                            self.position -= botFill
-
-                            self.no += botFill
-                            self.total_no_price += botFill * ((100 - bestAsk) / 100)
-
-                            # Yes resolution
-                            if self.sp_price >= self.min and self.sp_price <= self.max:
-                                self.pnl = (self.yes - self.total_yes_price) - (self.total_no_price)
-                            # No resolution
-                            else:
-                                self.pnl = (self.no - self.total_no_price) - (self.total_yes_price)
-
-                            # self.pnl += botFill * (self.ask["price"] / 100)
-
-                            print(f"Bot ask order filled. {botFill} at {bestAsk}. Current position: {self.position}")
-                            print(f"Current PnL: {self.pnl}")
-                    
-                    # Bot market order
-                    elif bot: 
-                        self.position += fillVolume
-
-                        self.yes += fillVolume
-                        self.total_yes_price += fillVolume * (bestAsk / 100)
-
-                        # Yes resolution
-                        if self.sp_price >= self.min and self.sp_price <= self.max:
-                            self.pnl = (self.yes - self.total_yes_price) - (self.total_no_price)
-                        # No resolution
-                        else:
-                            self.pnl = (self.no - self.total_no_price) - (self.total_yes_price)
-
-                        # self.pnl -= fillVolume * (bestAsk / 100)
-                        print(f"Bot market bid order filled. {fillVolume} at {bestAsk}. Current position: {self.position}")
-                        print(f"Current PnL: {self.pnl}")
-
-                    self.orderbook["asks"][bestAsk] -= fillVolume
-                    remVol -= fillVolume
-                    if self.orderbook["asks"][bestAsk] == 0: 
-                        del self.orderbook["asks"][bestAsk]
-
-                    if len(self.orderbook["asks"]) == 0:
-                        break
-
-                    bestAsk = min(self.orderbook["asks"])
-                
-                # If there is still volume left, insert the remainder into the orderbook
-                if remVol > 0: 
-                    if price in self.orderbook["bids"]: 
-                        self.orderbook["bids"][price] += remVol
-                    else:
-                        self.orderbook["bids"][price] = remVol
-
-                    # Bot market order with remaining volume
-                    if bot: 
-                        self.bid["quantity"] = remVol
-                        self.bid["queue"] = 1
-            
-            # No fill, simply update orderbook
-            else: 
-                if side == "A": 
-                    
-                    # Set bot order quantity and queue position
-                    if bot: 
-                        self.ask["quantity"] = vol
-                        self.ask["queue"] = 1 if price not in self.orderbook["asks"] else self.orderbook["asks"][price] + 1
-
-                    if price in self.orderbook["asks"]: 
-                        self.orderbook["asks"][price] += vol
-                    else:
-                        self.orderbook["asks"][price] = vol
-                elif side == "B": 
-                    
-                    # Set bot order quantity and queue position
-                    if bot:
-                        self.bid["quantity"] = vol
-                        self.bid["queue"] = 1 if price not in self.orderbook["bids"] else self.orderbook["bids"][price] + 1
-
-                    if price in self.orderbook["bids"]: 
-                        self.orderbook["bids"][price] += vol
-                    else:
-                        self.orderbook["bids"][price] = vol
-
-    def checkFill(self, side, price, vol) -> bool: 
-        if side == "A": 
-            if len(self.orderbook["bids"]) > 0 and price <= max(self.orderbook["bids"]): 
-                return True
-            else:
-                return False
-        elif side == "B": 
-            if len(self.orderbook["asks"]) > 0 and price >= min(self.orderbook["asks"]): 
-                return True
-            else:
-                return False
-    
-    def setOrderbook(self, orderbook) -> None: 
-        self.orderbook = orderbook
-                
\ No newline at end of file
+    def updateOrderbook(self, side, price, vol, type) -> None:
+        bookSide = SIDE_BOOK[side]
+
+        if type == "Cancel":
+            # Market cancels can only remove market volume, never the bot's orders
+            if self.book.contains(bookSide, price):
+                cancelled = self.queues[bookSide][price].cancelMarket(vol, self.cancelPolicy)
+                if cancelled > 0:
+                    self.book.remove(bookSide, price, cancelled)
+                    self.dropLevel(bookSide, price)
+
+        elif type == "Insert":
+            remVol = self.match(bookSide, price, vol)
+            if remVol > 0:
+                self.book.add(bookSide, price, remVol)
+                self.queue(bookSide, price).addMarket(remVol)
+
+    def match(self, side: str, price: int, vol: int, order: BotOrder = None) -> int:
+        """
+        Walk the opposite side of the book with an incoming order, filling resting volume in FIFO order.
+        order is the bot's own order when the bot is the aggressor. Returns the volume left to rest.
+        """
+        other = "asks" if side == "bids" else "bids"
+        remVol = vol
+        best = self.book.best(other)
+        while remVol > 0 and best is not None and (best <= price if side == "bids" else best >= price):
+            level = self.queues[other][best]
+
+            # No self trades: the bot's resting orders on the level it is about to take are pulled first
+            if order is not None:
+                for resting in level.orders():
+                    self.cancelOrderId(resting.id)
+                if not self.book.contains(other, best):
+                    best = self.book.best(other)
+                    continue
+
+            fills = []
+            taken = level.consume(remVol, fills)
+            self.book.remove(other, best, taken)
+            remVol -= taken
+
+            for resting, quantity in fills:
+                resting.quantity -= quantity
+                resting.filled += quantity
+                if resting.quantity == 0:
+                    resting.entry = None
+                    del self.orders[resting.id]
+                self.botFill(other, quantity, best)
+
+            if order is not None:
+                order.filled += taken
+                self.botFill(side, taken, best, market=True)
+
+            self.dropLevel(other, best)
+            best = self.book.best(other)
+        return remVol
+
+    def botFill(self, side: str, quantity: int, price: int, market: bool = False) -> None:
+        # side is the side of the bot order that traded
+        self.ledger.fill(side == "bids", quantity, price, self.time)
+        self.position = self.ledger.position
+        self.fills += 1
+        self.maxPosition = max(self.maxPosition, abs(self.position))
+        self.updatePnl()
+        if self.onFill is not None:
+            self.onFill(side, quantity, price)
+
+        log.debug("Bot %s%s order filled. %s at %s. Current position: %s", "market " if market else "",
+                  "bid" if side == "bids" else "ask", quantity, price, self.position)
+        log.debug("Current PnL: %s", self.pnl)
+
+    def updatePnl(self) -> None:
+        # PnL if the market settled at the current S&P 500 price
+        self.pnl = self.ledger.pnl(self.min <= self.sp_price <= self.max)
+
+    def queue(self, side: str, price: int) -> LevelQueue:
+        queues = self.queues[side]
+        if price not in queues:
+            queues[price] = LevelQueue()
+        return queues[price]
+
+    def dropLevel(self, side: str, price: int) -> None:
+        # Forget the queue once its level is gone from the book
+        if not self.book.contains(side, price):
+            self.queues[side].pop(price, None)
+
+    def setOrderbook(self, orderbook) -> None:
+        # Replace the book with market volume only, any bot orders are dropped
+        self.book = OrderBook()
+        self.queues = {side: {} for side in SIDES}
+        self.orders = {}
+        for side in SIDES:
+            for price, volume in orderbook[side].items():
+                if volume > 0:
+                    self.book.add(side, price, volume)
+                    self.queue(side, price).addMarket(volume)
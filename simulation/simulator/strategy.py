@@ -1,8 +1,14 @@
 from state import TradingState
-import dateparser 
-from scipy.stats import cauchy 
+from pricing.fair_value import cauchy_probability, decayed_gamma
+from pricing.calibration import load_params
+
+# Model parameters fitted by calibrate.py, or the fair_value constants if nothing was fitted
+MODEL_PARAMS = load_params()
 
 POSITION_LIMIT = 40
+ORDER_SIZE = 10
+# Position beyond which the strategy stops crossing the spread
+CROSS_LIMIT = 20
 
 class Strategy(): 
 
@@ -10,89 +16,122 @@ class Strategy():
                  state: TradingState, 
                  min: int,
                  max: int,
-                 EOD: int) -> None:
+                 EOD: int,
+                 gamma: float = MODEL_PARAMS["gamma"],
+                 x0: float = MODEL_PARAMS["x0"],
+                 exponent: float = MODEL_PARAMS["exponent"],
+                 bidOffset: int = 1,
+                 askOffset: int = 1,
+                 positionLimit: int = POSITION_LIMIT,
+                 orderSize: int = ORDER_SIZE,
+                 skew: int = 10,
+                 crossLimit: int = CROSS_LIMIT,
+                 levels: int = 1,
+                 levelSpacing: int = 1) -> None:
         self.state = state
-        # Hardcoded constants
         self.EOD = EOD
         self.UPPER = max
         self.LOWER = min 
-        self.x0 = 0 
-        self.gamma = 0.000005
+        self.x0 = x0
+        self.gamma = gamma
+        self.exponent = exponent
+        # Latest model probability of a YES resolution, for marking inventory at fair value
+        self.fairValue = None
+
+        # Quoting parameters: spread around fair value, size, and one cent of skew per `skew` contracts held
+        self.bidOffset = bidOffset
+        self.askOffset = askOffset
+        self.positionLimit = positionLimit
+        self.orderSize = orderSize
+        self.skew = skew
+        self.crossLimit = crossLimit
+        # Number of orders quoted per side, each `levelSpacing` cents behind the previous one
+        self.levels = levels
+        self.levelSpacing = levelSpacing
+
+    def ladder(self, price: int, room: int, step: int):
+        # Quotes from price outwards in steps of levelSpacing, sized so the whole ladder fits in the position limit
+        quotes = []
+        for i in range(self.levels):
+            size = min(self.orderSize, room)
+            if size <= 0:
+                break
+            quotes.append((price + i * step * self.levelSpacing, size))
+            room -= size
+        return quotes
 
     def kalshiUpdate(self) -> None: 
-        orderbook = self.state.getOrderbook()
-        if len(orderbook["bids"]) == 0 or len(orderbook["asks"]) == 0:
+        book = self.state.book
+        if book.isEmpty("bids") or book.isEmpty("asks"):
             return
 
-        # Convert self.state.time to unix timestamp
-        curr_time = dateparser.parse(self.state.time)
-        offset = self.EOD - curr_time.timestamp()
-        curr_gamma = self.gamma*(offset)**(3/5)
+        # self.state.time is already a unix timestamp
+        offset = self.EOD - self.state.time
+        curr_gamma = decayed_gamma(offset, self.gamma, self.exponent)
         if offset <= 0 or curr_gamma == 0: 
             return 
         try: 
-            p = cauchy.cdf((self.UPPER-self.state.sp_price)/self.state.sp_price, self.x0, curr_gamma) - cauchy.cdf((self.LOWER-self.state.sp_price)/self.state.sp_price, self.x0, curr_gamma)
+            p = cauchy_probability(self.state.sp_price, self.LOWER, self.UPPER, curr_gamma, self.x0)
+            self.fairValue = p
 
-            bid = round(p * 100) - 1
-            ask = round(p * 100) + 1
+            bid = round(p * 100) - self.bidOffset
+            ask = round(p * 100) + self.askOffset
 
-            bid_vol = min(10, POSITION_LIMIT - self.state.position)
-            ask_vol = min(10, POSITION_LIMIT + self.state.position)
+            bid_room = self.positionLimit - self.state.position
+            ask_room = self.positionLimit + self.state.position
 
             if self.state.position > 0:
-                bid -= round(self.state.position / 10)
-                ask -= round(self.state.position / 10)
+                bid -= round(self.state.position / self.skew)
+                ask -= round(self.state.position / self.skew)
             elif self.state.position < 0:
-                bid += round(-self.state.position / 10)
-                ask += round(-self.state.position / 10)
+                bid += round(-self.state.position / self.skew)
+                ask += round(-self.state.position / self.skew)
 
-            best_bid = max(orderbook["bids"])
-            best_ask = min(orderbook["asks"])
+            best_bid = book.bestBid()
+            best_ask = book.bestAsk()
 
-            self.state.insertOrder("B", bid, bid_vol)
-            self.state.insertOrder("A", ask, ask_vol)
+            self.state.setQuotes("B", self.ladder(bid, bid_room, -1))
+            self.state.setQuotes("A", self.ladder(ask, ask_room, 1))
         except Exception as e: 
             pass
         
     def spUpdate(self) -> None: 
-        orderbook = self.state.getOrderbook()
-        if len(orderbook["bids"]) == 0 or len(orderbook["asks"]) == 0:
+        book = self.state.book
+        if book.isEmpty("bids") or book.isEmpty("asks"):
             return
 
-        # Convert self.state.time to unix timestamp
-        curr_time = dateparser.parse(self.state.time)
-        offset = self.EOD - curr_time.timestamp()
-        curr_gamma = self.gamma*(offset)**(3/5)
+        # self.state.time is already a unix timestamp
+        offset = self.EOD - self.state.time
+        curr_gamma = decayed_gamma(offset, self.gamma, self.exponent)
         if offset <= 0 or curr_gamma == 0: 
             return 
         try: 
-            p = cauchy.cdf((self.UPPER-self.state.sp_price)/self.state.sp_price, self.x0, curr_gamma) - cauchy.cdf((self.LOWER-self.state.sp_price)/self.state.sp_price, self.x0, curr_gamma)
+            p = cauchy_probability(self.state.sp_price, self.LOWER, self.UPPER, curr_gamma, self.x0)
+            self.fairValue = p
 
-            bid = round(p * 100) - 1
-            ask = round(p * 100) + 1
+            bid = round(p * 100) - self.bidOffset
+            ask = round(p * 100) + self.askOffset
 
-            bid_vol = min(10, POSITION_LIMIT - self.state.position)
-            ask_vol = min(10, POSITION_LIMIT + self.state.position)
+            bid_room = self.positionLimit - self.state.position
+            ask_room = self.positionLimit + self.state.position
 
             if self.state.position > 0:
-                bid -= round(self.state.position / 10)
-                ask -= round(self.state.position / 10)
+                bid -= round(self.state.position / self.skew)
+                ask -= round(self.state.position / self.skew)
             elif self.state.position < 0:
-                bid += round(-self.state.position / 10)
-                ask += round(-self.state.position / 10)
+                bid += round(-self.state.position / self.skew)
+                ask += round(-self.state.position / self.skew)
 
-            best_bid = max(orderbook["bids"])
-            best_ask = min(orderbook["asks"])
+            best_bid = book.bestBid()
+            best_ask = book.bestAsk()
 
-            if bid >= best_ask and self.state.position > -20: 
-                self.state.insertOrder("B", best_ask - 1, bid_vol)
-            else: 
-               self.state.insertOrder("B", bid, bid_vol)
+            if bid >= best_ask and self.state.position > -self.crossLimit: 
+                bid = best_ask - 1
+            self.state.setQuotes("B", self.ladder(bid, bid_room, -1))
 
-            if ask <= best_bid and self.state.position < 20:
-                self.state.insertOrder("A", best_bid + 1, ask_vol)
-            else:
-                self.state.insertOrder("A", ask, ask_vol)
+            if ask <= best_bid and self.state.position < self.crossLimit:
+                ask = best_bid + 1
+            self.state.setQuotes("A", self.ladder(ask, ask_room, 1))
 
         except Exception as e: 
             pass
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+Parameter sweep backtester. Every (configuration, day) pair is replayed in a process pool. Each day is
+converted once into the binary market data cache, which the workers memory-map read-only, so the csv is
+never re-parsed per run.
+
+Example: python sweep.py --days apr-10 apr-13 --param gamma=0.000003,0.000005 --param bidOffset=1,2 --out sweep.csv
+PnL cost of latency: python sweep.py --param latency=0,1,5,10,25,50,100
+"""
+from state import TradingState
+from strategy import Strategy, MODEL_PARAMS, POSITION_LIMIT, ORDER_SIZE, CROSS_LIMIT
+from simulator import Simulator
+from marketdata import marketDataCache, openMarketData
+from catalog import Day, loadCatalog, findDay
+from latency import OrderGateway
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import itertools
+import os
+import random
+import time
+import pandas as pd
+
+# Default value of every sweepable parameter. All but latency (order round trip in ms, 0 for instant
+# orders) are Strategy parameters.
+DEFAULTS = {
+    "latency": 0.0,
+    "gamma": MODEL_PARAMS["gamma"],
+    "x0": MODEL_PARAMS["x0"],
+    "exponent": MODEL_PARAMS["exponent"],
+    "bidOffset": 1,
+    "askOffset": 1,
+    "positionLimit": POSITION_LIMIT,
+    "orderSize": ORDER_SIZE,
+    "skew": 10,
+    "crossLimit": CROSS_LIMIT,
+    "levels": 1,
+    "levelSpacing": 1,
+}
+
+# Type of every sweepable parameter, values on the command line and sampled from ranges are cast to it.
+# Declared rather than taken from the defaults, which can be whole numbers of a float parameter (x0 is 0).
+TYPES = {
+    "latency": float,
+    "gamma": float,
+    "x0": float,
+    "exponent": float,
+    "bidOffset": int,
+    "askOffset": int,
+    "positionLimit": int,
+    "orderSize": int,
+    "skew": int,
+    "crossLimit": int,
+    "levels": int,
+    "levelSpacing": int,
+}
+
+def parseParam(spec: str):
+    """
+    name=a,b,c gives a list of values, name=lo:hi gives a range to sample from
+    """
+    name, values = spec.split("=", 1)
+    if name not in DEFAULTS:
+        raise ValueError(f"Unknown strategy parameter {name}, expected one of {', '.join(DEFAULTS)}")
+    cast = TYPES[name]
+    if ":" in values:
+        lo, hi = values.split(":")
+        return name, (cast(lo), cast(hi))
+    return name, [cast(value) for value in values.split(",")]
+
+def castValue(name: str, value):
+    return int(round(value)) if TYPES[name] is int else float(value)
+
+def gridConfigs(params):
+    names = list(params)
+    for name, values in params.items():
+        if isinstance(values, tuple):
+            raise ValueError(f"Grid sampling needs a list of values for {name}, not a range")
+    return [dict(zip(names, combo)) for combo in itertools.product(*params.values())]
+
+def randomConfigs(params, n: int, rng: random.Random):
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name, values in params.items():
+            if isinstance(values, tuple):
+                config[name] = castValue(name, rng.uniform(*values))
+            else:
+                config[name] = rng.choice(values)
+        configs.append(config)
+    return configs
+
+def latinHypercubeConfigs(params, n: int, rng: random.Random):
+    # One sample in each of n equal strata per parameter, strata shuffled independently
+    configs = [{} for _ in range(n)]
+    for name, values in params.items():
+        strata = list(range(n))
+        rng.shuffle(strata)
+        for config, stratum in zip(configs, strata):
+            u = (stratum + rng.random()) / n
+            if isinstance(values, tuple):
+                lo, hi = values
+                config[name] = castValue(name, lo + u * (hi - lo))
+            else:
+                config[name] = values[min(int(u * len(values)), len(values) - 1)]
+    return configs
+
+# Memory-mapped market data, opened once per worker process
+workerData = {}
+
+def initWorker(cacheDirs) -> None:
+    for day, directory in cacheDirs.items():
+        workerData[day] = openMarketData(directory)
+
+def runConfig(configId: int, day: Day, params) -> dict:
+    start = time.perf_counter()
+    state = TradingState(day.sod)
+    strategyParams = dict(params)
+    latency = strategyParams.pop("latency", 0)
+    gateway = OrderGateway(state, latency) if latency > 0 else None
+    strategy = Strategy(gateway if gateway is not None else state, day.min, day.max, day.eod, **strategyParams)
+    simulator = Simulator(day.file, state, strategy, (day.min, day.max), eventsFile=os.devnull, data=workerData[day.name], gateway=gateway)
+    simulator.simulate()
+
+    return {
+        "config": configId,
+        "day": day.name,
+        **params,
+        "pnl": round(state.pnl, 2),
+        "position": state.position,
+        "maxPosition": state.maxPosition,
+        "fills": state.fills,
+        "runtime": round(time.perf_counter() - start, 3),
+    }
+
+def sweep(configs, days, workers: int = None) -> pd.DataFrame:
+    results = []
+    # Convert every day once (or reuse its cache) and share it with the workers through memory-mapped files
+    cacheDirs = {day.name: marketDataCache(day.file) for day in days}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(cacheDirs,)) as pool:
+        futures = [pool.submit(runConfig, configId, day, config) for configId, config in enumerate(configs) for day in days]
+        for future in as_completed(futures):
+            results.append(future.result())
+            print(f"Finished {len(results)}/{len(futures)} runs", end="\r")
+    print()
+
+    return pd.DataFrame(results).sort_values(["config", "day"]).reset_index(drop=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest a grid or sample of strategy parameters over several days")
+    parser.add_argument("--days", nargs="+", default=None, help="Catalog indices or names of the days to replay (default: all)")
+    parser.add_argument("--param", action="append", default=[], help="name=a,b,c (values) or name=lo:hi (range)")
+    parser.add_argument("--sample", choices=["grid", "random", "lhs"], default="grid", help="How to pick configurations")
+    parser.add_argument("-n", type=int, default=20, help="Number of configurations for random/lhs sampling")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--out", default="sweep.csv")
+    args = parser.parse_args()
+
+    catalog = loadCatalog()
+    try:
+        days = catalog if args.days is None else [findDay(catalog, key) for key in args.days]
+    except KeyError as e:
+        print(e.args[0])
+        exit()
+
+    params = dict(parseParam(spec) for spec in args.param)
+    rng = random.Random(args.seed)
+    if args.sample == "grid":
+        configs = gridConfigs(params)
+    elif args.sample == "random":
+        configs = randomConfigs(params, args.n, rng)
+    else:
+        configs = latinHypercubeConfigs(params, args.n, rng)
+
+    start = time.perf_counter()
+    results = sweep(configs, days, args.workers)
+    results.to_csv(args.out, index=False)
+
+    print(f"Ran {len(results)} backtests in {time.perf_counter() - start:.1f}s, results written to {args.out}")
+    summary = results.groupby("config").agg(pnl=("pnl", "sum"), maxPosition=("maxPosition", "max"), fills=("fills", "sum"))
+    print(summary.sort_values("pnl", ascending=False).head(10))
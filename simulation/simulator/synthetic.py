@@ -0,0 +1,224 @@
+"""
+Synthetic market data for benchmarks. Generates a trading day in the combined csv format, or as the raw
+Kalshi/S&P 500 dumps parse.py reads, at any multiple of the recorded volume (a recorded day is about
+27k S&P 500 ticks and 27k Kalshi events).
+
+The S&P 500 is a Gaussian random walk with occasional jumps. The Kalshi book is kept live while
+generating: passive inserts land a few cents behind the model fair value, cancels take volume off
+existing levels and trades are aggressive inserts that take part of the opposite best level, leaning
+towards fair value. Events sometimes share a timestamp, as snapshots and bursts do in the recordings.
+
+Example: python synthetic.py --scale 10 --out ../data/synthetic-x10-combined.csv
+"""
+from catalog import bracketBounds, sessionBounds
+import argparse
+import csv
+import math
+import os
+import random
+import time
+import numpy as np
+import pandas as pd
+from pricing.fair_value import fair_value_array
+
+COLUMNS = ["Time", "Competitor", "Operation", "OrderId", "Instrument", "Side", "Volume", "Price", "Lifespan", "Fee"]
+
+# Per-day volume of a recorded day
+SP_TICKS = 27000
+KALSHI_EVENTS = 27000
+
+# Kalshi event mix, the rest are trades
+INSERT_SHARE = 0.5
+CANCEL_SHARE = 0.35
+# Share of events stamped with the previous event's time
+SAME_TIME_SHARE = 0.1
+
+class SyntheticDay():
+    """
+    One generated day: S&P 500 ticks and Kalshi events, each in time order
+    """
+
+    def __init__(self, date: str, scale: float = 1, seed: int = 0, open: float = 4075, width: int = 50) -> None:
+        self.date = date
+        self.scale = scale
+        self.sod, self.eod = sessionBounds(date)
+        rng = np.random.default_rng(seed)
+
+        # S&P 500: Gaussian steps sized for about a 1% daily range, plus rare jumps
+        n = max(int(SP_TICKS * scale), 2)
+        self.spTimes = np.sort(rng.uniform(self.sod + 60, self.eod, n))
+        steps = rng.normal(0, 0.08 * math.sqrt(1 / scale), n)
+        steps += np.where(rng.random(n) < 0.001, rng.normal(0, 2, n), 0)
+        self.spPrices = np.round(open + np.cumsum(steps), 2)
+        self.lower, self.upper = bracketBounds(open, width)
+
+        self.kalshi = self.kalshiEvents(int(KALSHI_EVENTS * scale), rng, random.Random(seed))
+
+    def kalshiEvents(self, n: int, rng: np.random.Generator, prng: random.Random):
+        """
+        (time, operation, side, volume, price in cents, trade) tuples; side is "B" or "A"
+        """
+        times = np.sort(rng.uniform(self.sod + 61, self.eod, n))
+        same = rng.random(n) < SAME_TIME_SHARE
+        same[0] = False
+        # Reuse the previous distinct time for same-time events
+        times = times[np.maximum.accumulate(np.where(same, 0, np.arange(n)))]
+
+        # Fair value in cents as of every event
+        last = np.searchsorted(self.spTimes, times, side="right") - 1
+        sp = np.where(last >= 0, self.spPrices[np.maximum(last, 0)], self.spPrices[0])
+        fair = 100 * fair_value_array(sp, self.eod - times, self.lower, self.upper)
+        fair = np.clip(np.nan_to_num(fair, nan=50.0), 2, 98).tolist()
+
+        kinds = rng.random(n).tolist()
+        sizes = np.minimum(np.round(rng.lognormal(5.5, 1.0, n)), 2000).astype(int).clip(1).tolist()
+        depths = rng.geometric(0.35, n).tolist()
+        times = times.tolist()
+
+        bids = {}
+        asks = {}
+        events = []
+        # Initial snapshot: a few levels on both sides of fair value
+        center = round(fair[0])
+        for offset in range(1, 6):
+            for side, book, price in (("B", bids, center - offset), ("A", asks, center + offset)):
+                if 1 <= price <= 99:
+                    book[price] = 500
+                    events.append((times[0], "Insert", side, 500, price, False))
+
+        for i in range(n):
+            kind = kinds[i]
+            f = fair[i]
+            if kind >= INSERT_SHARE + CANCEL_SHARE and (bids or asks):
+                # Trade: lean towards the side fair value says is cheap
+                if bids and asks:
+                    buy = prng.random() < 0.5 + (f - (max(bids) + min(asks)) / 2) / 20
+                else:
+                    buy = bool(asks)
+                book = asks if buy else bids
+                best = min(book) if buy else max(book)
+                volume = min(book[best], sizes[i])
+                self.take(book, best, volume)
+                events.append((times[i], "Insert", "B" if buy else "A", volume, best, True))
+            elif kind >= INSERT_SHARE and (bids or asks):
+                side = prng.choice(("B", "A")) if bids and asks else ("B" if bids else "A")
+                book = bids if side == "B" else asks
+                price = prng.choice(list(book))
+                volume = min(book[price], sizes[i])
+                self.take(book, price, volume)
+                events.append((times[i], "Cancel", side, volume, price, False))
+            else:
+                side = "B" if prng.random() < 0.5 else "A"
+                if side == "B":
+                    price = min(round(f) - depths[i], (min(asks) if asks else 100) - 1)
+                else:
+                    price = max(round(f) + depths[i], (max(bids) if bids else 0) + 1)
+                if not 1 <= price <= 99:
+                    continue
+                book = bids if side == "B" else asks
+                book[price] = book.get(price, 0) + sizes[i]
+                events.append((times[i], "Insert", side, sizes[i], price, False))
+        return events
+
+    @staticmethod
+    def take(book, price: int, volume: int) -> None:
+        book[price] -= volume
+        if book[price] == 0:
+            del book[price]
+
+    def __len__(self) -> int:
+        return len(self.spTimes) + len(self.kalshi)
+
+def timeStrings(seconds) -> np.ndarray:
+    # Timestamps as the recordings write them: 2023-04-10 13:31:00.945899+00:00
+    stamps = np.datetime_as_string((np.asarray(seconds) * 1e6).astype("datetime64[us]"), unit="us")
+    return np.char.add(np.char.replace(stamps, "T", " "), "+00:00")
+
+def combinedFrame(day: SyntheticDay) -> pd.DataFrame:
+    """
+    The day as a combined csv DataFrame, Kalshi events ahead of S&P 500 ticks on equal times
+    """
+    kalshiTimes, operations, sides, volumes, prices, _ = zip(*day.kalshi)
+    nKalshi = len(kalshiTimes)
+    nSp = len(day.spTimes)
+    times = np.concatenate([np.asarray(kalshiTimes), day.spTimes])
+    order = np.argsort(times, kind="stable")
+
+    frame = pd.DataFrame({
+        "Time": timeStrings(times),
+        "Competitor": "",
+        "Operation": np.concatenate([np.asarray(operations, dtype=object), np.full(nSp, "", dtype=object)]),
+        "OrderId": np.concatenate([np.arange(nKalshi).astype(str).astype(object), np.full(nSp, "", dtype=object)]),
+        "Instrument": np.concatenate([np.ones(nKalshi, dtype=int), np.zeros(nSp, dtype=int)]),
+        "Side": np.concatenate([np.asarray(sides, dtype=object), np.full(nSp, "", dtype=object)]),
+        "Volume": np.concatenate([np.asarray(volumes).astype(str).astype(object), np.full(nSp, "", dtype=object)]),
+        "Price": np.concatenate([np.asarray(prices, dtype=np.float64) * 100, day.spPrices]),
+        "Lifespan": np.concatenate([np.full(nKalshi, "G", dtype=object), np.full(nSp, "", dtype=object)]),
+        "Fee": np.concatenate([np.zeros(nKalshi, dtype=int).astype(str).astype(object), np.full(nSp, "", dtype=object)]),
+    }, columns=COLUMNS)
+    return frame.iloc[order].reset_index(drop=True)
+
+def writeCombined(day: SyntheticDay, fileName: str) -> int:
+    frame = combinedFrame(day)
+    frame.to_csv(fileName, index=False)
+    return len(frame)
+
+def writeDumps(day: SyntheticDay, directory: str, ticker: str = "INXD-SYNTH-B4075") -> int:
+    """
+    Write the day as the kalshi.csv and sp.csv database dumps parse.py converts. Inserts become positive
+    orderbook deltas, cancels negative ones, and trades a trade message plus the negative delta it fills.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rows = 0
+    with open(os.path.join(directory, "kalshi.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "market_ticker", "message"])
+        seq = 0
+        stamps = timeStrings([event[0] for event in day.kalshi]).tolist()
+        for stamp, (seconds, operation, side, volume, price, trade) in zip(stamps, day.kalshi):
+            if trade:
+                # The aggressor takes the other side: a buy hits no-side (ask) volume at 100 - price
+                takerSide = "yes" if side == "B" else "no"
+                message = {"type": "trade", "msg": {"market_ticker": ticker, "ts": int(seconds), "count": volume,
+                                                    "yes_price": price, "no_price": 100 - price, "taker_side": takerSide}}
+                writer.writerow([stamp, ticker, str(message)])
+                delta = {"side": "no", "price": 100 - price} if side == "B" else {"side": "yes", "price": price}
+                delta["delta"] = -volume
+            elif side == "B":
+                delta = {"side": "yes", "price": price, "delta": volume if operation == "Insert" else -volume}
+            else:
+                delta = {"side": "no", "price": 100 - price, "delta": volume if operation == "Insert" else -volume}
+            message = {"type": "orderbook_delta", "seq": seq, "msg": {"market_ticker": ticker, **delta}}
+            writer.writerow([stamp, ticker, str(message)])
+            seq += 1
+            rows += 1 + trade
+
+    with open(os.path.join(directory, "sp.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "message"])
+        for stamp, price in zip(timeStrings(day.spTimes).tolist(), day.spPrices.tolist()):
+            writer.writerow([stamp, str({"$SPX.X": {"lastPrice": price, "delayed": False}})])
+            rows += 1
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic trading day at a multiple of recorded volume")
+    parser.add_argument("--scale", type=float, default=10, help="Multiple of a recorded day's volume")
+    parser.add_argument("--date", default="2023-04-10")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write a combined csv (name it *-combined.csv in the data directory to replay it)")
+    parser.add_argument("--raw", default=None, help="Write kalshi.csv and sp.csv dumps for parse.py into this directory")
+    args = parser.parse_args()
+
+    if args.out is None and args.raw is None:
+        parser.error("nothing to write, give --out and/or --raw")
+
+    start = time.perf_counter()
+    day = SyntheticDay(args.date, args.scale, args.seed)
+    print(f"Generated {len(day)} events ({len(day.spTimes)} S&P 500 ticks) in {time.perf_counter() - start:.2f}s")
+    if args.out is not None:
+        rows = writeCombined(day, args.out)
+        print(f"Wrote {rows} rows to {args.out}")
+    if args.raw is not None:
+        rows = writeDumps(day, args.raw)
+        print(f"Wrote {rows} dump rows to {args.raw}")